@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from accounts.models import User
+
+USER_STATE_CACHE_PREFIX = 'auth:user-state'
+REQUIRED_CLAIMS = ('role', 'school_id')
+
+
+def user_auth_state_cache_key(user_id):
+    return f'{USER_STATE_CACHE_PREFIX}:{user_id}'
+
+
+def get_user_auth_state(user_id):
+    key = user_auth_state_cache_key(user_id)
+    state = cache.get(key)
+    if state is None:
+        row = User.objects.filter(pk=user_id).values('is_active', 'role', 'school_id').first()
+        state = {'exists': row is not None, **(row or {})}
+        cache.set(key, state, settings.AUTH_USER_STATE_TIMEOUT)
+    return state
+
+
+def invalidate_user_auth_state(user_id):
+    cache.delete(user_auth_state_cache_key(user_id))
+
+
+class ClaimsUser(TokenUser):
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+    @cached_property
+    def role(self):
+        return self.token.get('role', '')
+
+    @cached_property
+    def school_id(self):
+        return self.token.get('school_id')
+
+    @cached_property
+    def full_name(self):
+        return self.token.get('full_name', '')
+
+
+class StatelessReadJWTAuthentication(JWTAuthentication):
+    def authenticate(self, request):
+        if request.method not in SAFE_METHODS:
+            return super().authenticate(request)
+
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return self.get_claims_user(validated_token), validated_token
+
+    def get_claims_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token or any(claim not in validated_token for claim in REQUIRED_CLAIMS):
+            return self.get_user(validated_token)
+
+        user = ClaimsUser(validated_token)
+        state = get_user_auth_state(user.id)
+        if not state['exists']:
+            raise AuthenticationFailed('Usuario nao encontrado.', code='user_not_found')
+        if not state['is_active']:
+            raise AuthenticationFailed('Usuario inativo.', code='user_inactive')
+        if state['role'] != user.role or state['school_id'] != user.school_id:
+            # Perfil ou escola mudaram depois da emissao do token: vale o banco.
+            return self.get_user(validated_token)
+        return user
@@ -27,3 +27,17 @@ class User(AbstractUser):
 
     def __str__(self):
         return f'{self.full_name} ({self.email})'
+
+    def save(self, *args, **kwargs):
+        from accounts.authentication import invalidate_user_auth_state
+
+        super().save(*args, **kwargs)
+        invalidate_user_auth_state(self.pk)
+
+    def delete(self, *args, **kwargs):
+        from accounts.authentication import invalidate_user_auth_state
+
+        user_id = self.pk
+        result = super().delete(*args, **kwargs)
+        invalidate_user_auth_state(user_id)
+        return result
@@ -1,9 +1,15 @@
 from django.contrib import admin
 
-from analytics_app.models import DashboardPreference
+from analytics_app.models import CoverageCubeSlice, DashboardPreference
 
 
 @admin.register(DashboardPreference)
 class DashboardPreferenceAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'updated_at')
     search_fields = ('user__email',)
+
+
+@admin.register(CoverageCubeSlice)
+class CoverageCubeSliceAdmin(admin.ModelAdmin):
+    list_display = ('snapshot_date', 'school', 'schedule_generation', 'built_at', 'dirty_at')
+    list_filter = ('snapshot_date',)
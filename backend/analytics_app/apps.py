@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AnalyticsAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analytics_app'
+
+    def ready(self):
+        from analytics_app import signals  # noqa: F401
@@ -0,0 +1,88 @@
+import hashlib
+import json
+
+from django.core.cache import caches
+
+from core.search import normalize_name
+from core.services import data_version_for_user
+from immunization.schedule import get_schedule_generation
+
+DASHBOARD_CACHE_ALIAS = 'dashboard'
+DASHBOARD_FILTER_PARAMS = ('q', 'schoolId', 'status', 'ageMin', 'ageMax', 'sex', 'vaccineId')
+STATS_KEYS = {'hits': 'dashboard:stats:hits', 'misses': 'dashboard:stats:misses'}
+
+
+def get_dashboard_cache():
+    return caches[DASHBOARD_CACHE_ALIAS]
+
+
+def normalize_dashboard_filters(query_params):
+    filters = {}
+    for name in DASHBOARD_FILTER_PARAMS:
+        value = query_params.get(name)
+        if value in (None, ''):
+            continue
+        # A chave usa exatamente o valor aplicado pelo filtro (para q, o nome normalizado de filter_by_name).
+        value = normalize_name(str(value)) if name == 'q' else str(value).strip()
+        if value:
+            filters[name] = value
+    return filters
+
+
+def dashboard_cache_key(kind, user, filters, as_of):
+    payload = json.dumps(
+        {
+            'scope': [user.role, user.school_id],
+            'filters': filters,
+            'asOf': as_of.isoformat(),
+        },
+        sort_keys=True,
+    )
+    return ':'.join(
+        [
+            'dashboard',
+            kind,
+            get_schedule_generation() or '0',
+            data_version_for_user(user),
+            hashlib.sha1(payload.encode()).hexdigest(),
+        ]
+    )
+
+
+def _count(stat):
+    backend = get_dashboard_cache()
+    if not backend.add(STATS_KEYS[stat], 1, timeout=None):
+        try:
+            backend.incr(STATS_KEYS[stat])
+        except ValueError:
+            backend.set(STATS_KEYS[stat], 1, timeout=None)
+
+
+def get_or_compute(key, compute):
+    backend = get_dashboard_cache()
+    cached = backend.get(key)
+    if cached is not None:
+        _count('hits')
+        return cached
+
+    _count('misses')
+    result = compute()
+    backend.set(key, result)
+    return result
+
+
+def get_cache_stats():
+    backend = get_dashboard_cache()
+    hits = backend.get(STATS_KEYS['hits'], 0)
+    misses = backend.get(STATS_KEYS['misses'], 0)
+    total = hits + misses
+    return {
+        'backend': f'{type(backend).__module__}.{type(backend).__name__}',
+        'hits': hits,
+        'misses': misses,
+        'hitRate': round(hits / total, 4) if total else None,
+    }
+
+
+def reset_cache_stats():
+    get_dashboard_cache().delete_many(list(STATS_KEYS.values()))
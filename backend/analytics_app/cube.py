@@ -0,0 +1,165 @@
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from accounts.permissions import is_admin, is_health_user, is_school_user
+from analytics_app.models import CoverageCube, CoverageCubeSlice, CoverageSnapshot
+from core.models import School, Student
+from core.services import age_in_months_from_birth_date
+from immunization.models import Vaccine
+from immunization.schedule import get_active_compiled_schedule, get_schedule_generation
+from immunization.services import load_record_keys
+from immunization.status_store import summarize_student_status
+
+CUBE_CHUNK_SIZE = 1000
+CUBE_INSERT_BATCH_SIZE = 2000
+NO_DATA_STATUS = 'SEM_DADOS'
+
+
+def _add_cell(cells, key, pending_count, overdue_count):
+    cell = cells.get(key)
+    if cell is None:
+        cell = cells[key] = [0, 0, 0]
+    cell[0] += 1
+    cell[1] += pending_count
+    cell[2] += overdue_count
+
+
+def compute_cube_cells(students, territory_by_school, as_of, chunk_size=CUBE_CHUNK_SIZE):
+    schedule = get_active_compiled_schedule()
+    vaccine_ids = list(Vaccine.objects.order_by('id').values_list('id', flat=True))
+    rows = students.order_by('id').values_list('id', 'school_id', 'sex', 'birth_date')
+
+    cells = {}
+    last_id = 0
+    while True:
+        chunk = list(rows.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+        record_keys = load_record_keys([row[0] for row in chunk])
+        for student_id, school_id, sex, birth_date in chunk:
+            summary = summarize_student_status(schedule, record_keys[student_id], birth_date, as_of)
+            base = (school_id, territory_by_school[school_id], sex, age_in_months_from_birth_date(birth_date, as_of))
+            _add_cell(cells, base + (None, summary['status']), summary['pending_count'], summary['overdue_count'])
+            for vaccine_id in vaccine_ids:
+                status, pending_count, overdue_count = summary['per_vaccine'].get(vaccine_id, (NO_DATA_STATUS, 0, 0))
+                _add_cell(cells, base + (vaccine_id, status), pending_count, overdue_count)
+    return cells
+
+
+def build_coverage_cube(as_of=None, school_ids=None):
+    as_of = as_of or timezone.localdate()
+    started_at = timezone.now()
+    generation = get_schedule_generation()
+
+    schools = School.objects.all()
+    if school_ids is not None:
+        schools = schools.filter(id__in=school_ids)
+    territory_by_school = dict(schools.values_list('id', 'territory_ref'))
+    cells = compute_cube_cells(Student.objects.filter(school_id__in=list(territory_by_school)), territory_by_school, as_of)
+
+    cube_rows = [
+        CoverageCube(
+            snapshot_date=as_of,
+            school_id=school_id,
+            territory_ref=territory_ref,
+            sex=sex,
+            age_months=age_months,
+            vaccine_id=vaccine_id,
+            status=status,
+            student_count=student_count,
+            pending_count=pending_count,
+            overdue_count=overdue_count,
+        )
+        for (school_id, territory_ref, sex, age_months, vaccine_id, status), (student_count, pending_count, overdue_count) in cells.items()
+    ]
+    slices = [
+        CoverageCubeSlice(snapshot_date=as_of, school_id=school_id, schedule_generation=generation, built_at=started_at)
+        for school_id in territory_by_school
+    ]
+
+    with transaction.atomic():
+        stale_rows = CoverageCube.objects.filter(snapshot_date=as_of)
+        if school_ids is not None:
+            stale_rows = stale_rows.filter(school_id__in=list(territory_by_school))
+        stale_rows.delete()
+        CoverageCube.objects.bulk_create(cube_rows, batch_size=CUBE_INSERT_BATCH_SIZE)
+        CoverageCubeSlice.objects.bulk_create(
+            slices,
+            batch_size=CUBE_INSERT_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['snapshot_date', 'school'],
+            update_fields=['schedule_generation', 'built_at'],
+        )
+    return len(cube_rows)
+
+
+def fresh_cube_slices(as_of):
+    return CoverageCubeSlice.objects.filter(
+        Q(dirty_at__isnull=True) | Q(dirty_at__lt=F('built_at')),
+        snapshot_date=as_of,
+        schedule_generation=get_schedule_generation(),
+    )
+
+
+def stale_cube_school_ids(as_of=None):
+    as_of = as_of or timezone.localdate()
+    fresh = fresh_cube_slices(as_of).values('school_id')
+    return list(School.objects.exclude(id__in=fresh).order_by('id').values_list('id', flat=True))
+
+
+def refresh_coverage_cube(as_of=None):
+    as_of = as_of or timezone.localdate()
+    school_ids = stale_cube_school_ids(as_of)
+    if school_ids:
+        build_coverage_cube(as_of, school_ids=school_ids)
+    return school_ids
+
+
+def mark_cube_dirty(school_ids=None, student_ids=None):
+    # So marca a fatia: leituras calculam escolas sujas ao vivo e `build_coverage_cube --stale` as recalcula.
+    slices = CoverageCubeSlice.objects.filter(snapshot_date__gte=timezone.localdate())
+    if student_ids is not None:
+        slices = slices.filter(school_id__in=Student.objects.filter(pk__in=[pk for pk in student_ids if pk]).values('school_id'))
+    elif school_ids is not None:
+        slices = slices.filter(school_id__in=[school_id for school_id in school_ids if school_id])
+    slices.update(dirty_at=timezone.now())
+
+
+def prune_coverage_cube(today=None):
+    # Datas passadas ja consolidadas em CoverageSnapshot nao sao mais lidas do cubo.
+    today = today or timezone.localdate()
+    snapshotted = CoverageSnapshot.objects.filter(snapshot_date__lt=today).values('snapshot_date')
+    with transaction.atomic():
+        deleted, _ = CoverageCube.objects.filter(snapshot_date__lt=today, snapshot_date__in=snapshotted).delete()
+        CoverageCubeSlice.objects.filter(snapshot_date__lt=today, snapshot_date__in=snapshotted).delete()
+    return deleted
+
+
+def cube_scope_filter(user):
+    if is_admin(user) or is_health_user(user):
+        return Q()
+    if is_school_user(user):
+        return Q(school_id=user.school_id)
+    return None
+
+
+def query_cube_rows(as_of, scope, *, school_id=None, sex=None, age_min=None, age_max=None, status=None, vaccine_id=None):
+    rows = CoverageCube.objects.filter(scope, snapshot_date=as_of, school_id__in=fresh_cube_slices(as_of).values('school_id'))
+    rows = rows.filter(vaccine_id=vaccine_id) if vaccine_id else rows.filter(vaccine__isnull=True)
+    if school_id:
+        rows = rows.filter(school_id=school_id)
+    if sex:
+        rows = rows.filter(sex=sex)
+    if age_min is not None and age_min > 0:
+        rows = rows.filter(age_months__gte=age_min)
+    if age_max is not None:
+        rows = rows.filter(age_months__lte=age_max)
+    if status:
+        rows = rows.filter(status=status)
+    return (
+        rows.values('school_id', 'age_months', 'status')
+        .annotate(students=Sum('student_count'), pending=Sum('pending_count'), overdue=Sum('overdue_count'))
+        .order_by()
+    )
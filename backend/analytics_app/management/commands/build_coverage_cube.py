@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from analytics_app.cube import build_coverage_cube, refresh_coverage_cube
+
+
+class Command(BaseCommand):
+    help = 'Monta o cubo diario de cobertura (escola x territorio x sexo x idade x vacina x status) para a data informada (padrao: hoje).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Data do snapshot no formato AAAA-MM-DD.')
+        parser.add_argument('--stale', action='store_true', help='Recalcula apenas escolas alteradas ou ainda sem snapshot.')
+
+    def handle(self, *args, **options):
+        as_of = parse_date(options['date']) if options['date'] else timezone.localdate()
+        if as_of is None:
+            raise CommandError('Data invalida. Use o formato AAAA-MM-DD.')
+
+        if options['stale']:
+            school_ids = refresh_coverage_cube(as_of)
+            self.stdout.write(self.style.SUCCESS(f'{len(school_ids)} escolas recalculadas no cubo de {as_of.isoformat()}.'))
+            return
+
+        rows = build_coverage_cube(as_of)
+        self.stdout.write(self.style.SUCCESS(f'Cubo de cobertura de {as_of.isoformat()} montado com {rows} linhas.'))
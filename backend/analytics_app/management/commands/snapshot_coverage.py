@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from analytics_app.trends import build_coverage_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Grava o snapshot diario de cobertura por escola e vacina para a data informada (padrao: hoje).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Data do snapshot no formato AAAA-MM-DD.')
+
+    def handle(self, *args, **options):
+        as_of = parse_date(options['date']) if options['date'] else timezone.localdate()
+        if as_of is None:
+            raise CommandError('Data invalida. Use o formato AAAA-MM-DD.')
+
+        rows = build_coverage_snapshot(as_of)
+        self.stdout.write(self.style.SUCCESS(f'Snapshot de cobertura de {as_of.isoformat()} gravado com {rows} linhas.'))
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics_app', '0001_initial'),
+        ('core', '0005_student_name_search'),
+        ('immunization', '0005_export_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoverageCube',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('snapshot_date', models.DateField()),
+                ('territory_ref', models.CharField(blank=True, max_length=100)),
+                ('sex', models.CharField(max_length=2)),
+                ('age_months', models.PositiveIntegerField()),
+                ('status', models.CharField(max_length=20)),
+                ('student_count', models.PositiveIntegerField(default=0)),
+                ('pending_count', models.PositiveIntegerField(default=0)),
+                ('overdue_count', models.PositiveIntegerField(default=0)),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.school')),
+                ('vaccine', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='immunization.vaccine')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['snapshot_date', 'vaccine', 'school'], name='coverage_cube_date_vac_idx'), models.Index(fields=['snapshot_date', 'territory_ref'], name='coverage_cube_territory_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CoverageCubeSlice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('snapshot_date', models.DateField()),
+                ('schedule_generation', models.CharField(blank=True, max_length=32)),
+                ('built_at', models.DateTimeField()),
+                ('dirty_at', models.DateTimeField(blank=True, null=True)),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.school')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('snapshot_date', 'school'), name='unique_cube_slice_date_school')],
+            },
+        ),
+    ]
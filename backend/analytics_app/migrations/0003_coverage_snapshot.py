@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics_app', '0002_coverage_cube'),
+        ('core', '0005_student_name_search'),
+        ('immunization', '0005_export_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoverageSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('snapshot_date', models.DateField()),
+                ('total_students', models.PositiveIntegerField(default=0)),
+                ('up_to_date_count', models.PositiveIntegerField(default=0)),
+                ('delayed_count', models.PositiveIntegerField(default=0)),
+                ('incomplete_count', models.PositiveIntegerField(default=0)),
+                ('no_data_count', models.PositiveIntegerField(default=0)),
+                ('pending_count', models.PositiveIntegerField(default=0)),
+                ('overdue_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now=True)),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coverage_snapshots', to='core.school')),
+                ('vaccine', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='immunization.vaccine')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['vaccine', 'snapshot_date'], name='coverage_snap_vac_date_idx'), models.Index(fields=['school', 'vaccine', 'snapshot_date'], name='coverage_snap_school_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('snapshot_date', 'school', 'vaccine'), name='unique_snapshot_date_school_vaccine'), models.UniqueConstraint(condition=models.Q(('vaccine__isnull', True)), fields=('snapshot_date', 'school'), name='unique_snapshot_date_school_overall')],
+            },
+        ),
+    ]
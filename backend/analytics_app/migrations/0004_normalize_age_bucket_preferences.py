@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:15
+
+from django.db import migrations
+
+# Copias congeladas de analytics_app.models/services: a migracao nao pode depender do codigo atual da aplicacao.
+DEFAULT_AGE_BUCKETS = [
+    {'label': 'Recem-nascido (0 a 28 dias)', 'minMonths': 0, 'maxMonths': 0},
+    {'label': 'Lactente (1 a 23 meses)', 'minMonths': 1, 'maxMonths': 23},
+    {'label': 'Pre-escolar (2 a 4 anos)', 'minMonths': 24, 'maxMonths': 59},
+    {'label': 'Escolar (5 a 9 anos)', 'minMonths': 60, 'maxMonths': 119},
+    {'label': 'Adolescente (10 a 19 anos)', 'minMonths': 120, 'maxMonths': 239},
+    {'label': 'Adulto (20 anos ou mais)', 'minMonths': 240, 'maxMonths': 999},
+]
+LEGACY_AGE_BUCKETS = [
+    {'label': '0-11', 'minMonths': 0, 'maxMonths': 11},
+    {'label': '12-59', 'minMonths': 12, 'maxMonths': 59},
+    {'label': '60-107', 'minMonths': 60, 'maxMonths': 107},
+    {'label': '108-179', 'minMonths': 108, 'maxMonths': 179},
+    {'label': '180+', 'minMonths': 180, 'maxMonths': 999},
+]
+
+
+def normalize_age_buckets(raw_buckets):
+    if not raw_buckets:
+        return DEFAULT_AGE_BUCKETS
+
+    normalized = []
+    for item in raw_buckets:
+        label = item.get('label')
+        min_months = item.get('minMonths')
+        max_months = item.get('maxMonths')
+
+        if not isinstance(label, str):
+            continue
+        if not isinstance(min_months, int) or not isinstance(max_months, int):
+            continue
+        if min_months < 0 or max_months < min_months:
+            continue
+
+        normalized.append({'label': label, 'minMonths': min_months, 'maxMonths': max_months})
+
+    if not normalized:
+        return DEFAULT_AGE_BUCKETS
+
+    normalized.sort(key=lambda bucket: bucket['minMonths'])
+    return normalized
+
+
+def resolve_age_buckets(raw_buckets):
+    if raw_buckets == LEGACY_AGE_BUCKETS:
+        return DEFAULT_AGE_BUCKETS
+    return normalize_age_buckets(raw_buckets)
+
+
+def normalize_preferences(apps, schema_editor):
+    DashboardPreference = apps.get_model('analytics_app', 'DashboardPreference')
+
+    for preference in DashboardPreference.objects.order_by('id').iterator(chunk_size=2000):
+        buckets = resolve_age_buckets(preference.age_buckets_json)
+        if buckets != preference.age_buckets_json:
+            preference.age_buckets_json = buckets
+            preference.save(update_fields=['age_buckets_json', 'updated_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics_app', '0003_coverage_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_preferences, migrations.RunPython.noop),
+    ]
@@ -19,3 +19,84 @@ class DashboardPreference(models.Model):
 
     def __str__(self):
         return f'Preferencias de dashboard de {self.user.email}'
+
+    def save(self, *args, **kwargs):
+        from analytics_app.services import invalidate_user_age_buckets
+
+        super().save(*args, **kwargs)
+        invalidate_user_age_buckets(self.user_id)
+
+    def delete(self, *args, **kwargs):
+        from analytics_app.services import invalidate_user_age_buckets
+
+        user_id = self.user_id
+        result = super().delete(*args, **kwargs)
+        invalidate_user_age_buckets(user_id)
+        return result
+
+
+class CoverageCube(models.Model):
+    snapshot_date = models.DateField()
+    school = models.ForeignKey('core.School', on_delete=models.CASCADE, related_name='+')
+    territory_ref = models.CharField(max_length=100, blank=True)
+    sex = models.CharField(max_length=2)
+    age_months = models.PositiveIntegerField()
+    vaccine = models.ForeignKey('immunization.Vaccine', null=True, blank=True, on_delete=models.CASCADE, related_name='+')
+    status = models.CharField(max_length=20)
+    student_count = models.PositiveIntegerField(default=0)
+    pending_count = models.PositiveIntegerField(default=0)
+    overdue_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['snapshot_date', 'vaccine', 'school'], name='coverage_cube_date_vac_idx'),
+            models.Index(fields=['snapshot_date', 'territory_ref'], name='coverage_cube_territory_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.snapshot_date} escola {self.school_id} {self.status} ({self.student_count})'
+
+
+class CoverageCubeSlice(models.Model):
+    snapshot_date = models.DateField()
+    school = models.ForeignKey('core.School', on_delete=models.CASCADE, related_name='+')
+    schedule_generation = models.CharField(max_length=32, blank=True)
+    built_at = models.DateTimeField()
+    dirty_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['snapshot_date', 'school'], name='unique_cube_slice_date_school')]
+
+    def __str__(self):
+        return f'{self.snapshot_date} escola {self.school_id}'
+
+
+class CoverageSnapshot(models.Model):
+    snapshot_date = models.DateField()
+    school = models.ForeignKey('core.School', on_delete=models.CASCADE, related_name='coverage_snapshots')
+    vaccine = models.ForeignKey('immunization.Vaccine', null=True, blank=True, on_delete=models.CASCADE, related_name='+')
+    total_students = models.PositiveIntegerField(default=0)
+    up_to_date_count = models.PositiveIntegerField(default=0)
+    delayed_count = models.PositiveIntegerField(default=0)
+    incomplete_count = models.PositiveIntegerField(default=0)
+    no_data_count = models.PositiveIntegerField(default=0)
+    pending_count = models.PositiveIntegerField(default=0)
+    overdue_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['snapshot_date', 'school', 'vaccine'], name='unique_snapshot_date_school_vaccine'),
+            models.UniqueConstraint(
+                fields=['snapshot_date', 'school'],
+                condition=models.Q(vaccine__isnull=True),
+                name='unique_snapshot_date_school_overall',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['vaccine', 'snapshot_date'], name='coverage_snap_vac_date_idx'),
+            models.Index(fields=['school', 'vaccine', 'snapshot_date'], name='coverage_snap_school_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.snapshot_date} escola {self.school_id} ({self.total_students})'
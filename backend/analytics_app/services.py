@@ -1,11 +1,25 @@
 ﻿from __future__ import annotations
 
-from typing import Iterable
+from itertools import accumulate
 
-from analytics_app.models import DEFAULT_AGE_BUCKETS, DashboardPreference
-from core.services import age_in_months_from_birth_date
-from immunization.services import build_student_immunization_status
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django.utils import timezone
 
+from analytics_app.cache import get_dashboard_cache
+from analytics_app.cube import cube_scope_filter, fresh_cube_slices, query_cube_rows
+from analytics_app.models import DEFAULT_AGE_BUCKETS, DashboardPreference
+from core.models import School, Student
+from core.services import filter_students_queryset, scope_students_for_user
+from immunization.models import Vaccine
+from immunization.services import population_cache_key, summarize_statuses
+from immunization.status_store import filter_students_by_status
+from immunization.vectorized import summarize_statuses_vectorized
+
+AGE_HISTOGRAM_MONTHS = 1000
+AGE_HISTOGRAM_OUTPUTS = {'pending': 'pendingCount', 'overdue': 'overdueCount', 'upToDate': 'upToDateCount'}
+AGE_HISTOGRAM_FIELDS = tuple(AGE_HISTOGRAM_OUTPUTS)
 LEGACY_AGE_BUCKETS = [
     {'label': '0-11', 'minMonths': 0, 'maxMonths': 11},
     {'label': '12-59', 'minMonths': 12, 'maxMonths': 59},
@@ -41,99 +55,357 @@ def normalize_age_buckets(raw_buckets: list[dict] | None):
     return normalized
 
 
+def resolve_age_buckets(raw_buckets):
+    if raw_buckets == LEGACY_AGE_BUCKETS:
+        return DEFAULT_AGE_BUCKETS
+    return normalize_age_buckets(raw_buckets)
+
+
+def age_buckets_cache_key(user_id):
+    return f'dashboard:age-buckets:{user_id}'
+
+
 def get_user_age_buckets(user):
-    preference, _ = DashboardPreference.objects.get_or_create(
-        user=user,
-        defaults={'age_buckets_json': DEFAULT_AGE_BUCKETS},
+    key = age_buckets_cache_key(user.id)
+    backend = get_dashboard_cache()
+    buckets = backend.get(key)
+    if buckets is None:
+        stored = DashboardPreference.objects.filter(user_id=user.id).values_list('age_buckets_json', flat=True).first()
+        buckets = resolve_age_buckets(stored)
+        backend.set(key, buckets, settings.DASHBOARD_PREFERENCE_CACHE_TIMEOUT)
+    return buckets
+
+
+def invalidate_user_age_buckets(user_id):
+    get_dashboard_cache().delete(age_buckets_cache_key(user_id))
+
+
+def summarize_population(students, vaccine_ids=None, as_of=None):
+    as_of = as_of or timezone.localdate()
+    cache_key = population_cache_key('summary', students, vaccine_ids, as_of)
+    summaries = cache.get(cache_key)
+    if summaries is not None:
+        return summaries
+
+    if len(students) >= settings.VECTORIZED_STATUS_THRESHOLD:
+        summaries = summarize_statuses_vectorized(students, vaccine_ids=vaccine_ids, as_of=as_of)
+    else:
+        summaries = summarize_statuses(students, vaccine_ids=vaccine_ids, as_of=as_of)
+    cache.set(cache_key, summaries, settings.STATUS_CACHE_TIMEOUT)
+    return summaries
+
+
+def new_age_histogram():
+    # Uma posicao por mes de idade (0..999) e uma ultima para idades acima disso.
+    return {name: [0] * (AGE_HISTOGRAM_MONTHS + 1) for name in AGE_HISTOGRAM_FIELDS}
+
+
+def _add_to_age_histogram(histogram, age_months, up_to_date, pending, overdue):
+    index = min(age_months, AGE_HISTOGRAM_MONTHS)
+    histogram['upToDate'][index] += up_to_date
+    histogram['pending'][index] += pending
+    histogram['overdue'][index] += overdue
+
+
+def age_histogram_prefix_sums(histogram):
+    return {name: list(accumulate(histogram[name], initial=0)) for name in AGE_HISTOGRAM_FIELDS}
+
+
+def apply_age_buckets(prefix_sums, age_buckets=None):
+    buckets = normalize_age_buckets(age_buckets)
+    distribution = {
+        bucket['label']: {
+            'ageBucket': bucket['label'],
+            'pendingCount': 0,
+            'overdueCount': 0,
+            'upToDateCount': 0,
+        }
+        for bucket in buckets
+    }
+
+    # Faixas ja vem ordenadas por minMonths: cada idade fica na primeira faixa que a contem
+    # e idades fora de todas as faixas vao para a ultima.
+    assigned = dict.fromkeys(AGE_HISTOGRAM_FIELDS, 0)
+    reach = -1
+    for bucket in buckets:
+        start = max(bucket['minMonths'], reach + 1)
+        end = min(bucket['maxMonths'], AGE_HISTOGRAM_MONTHS - 1)
+        reach = max(reach, bucket['maxMonths'])
+        if start > end:
+            continue
+        entry = distribution[bucket['label']]
+        for name, output in AGE_HISTOGRAM_OUTPUTS.items():
+            value = prefix_sums[name][end + 1] - prefix_sums[name][start]
+            entry[output] += value
+            assigned[name] += value
+
+    overflow_label = next(
+        (bucket['label'] for bucket in buckets if bucket['minMonths'] <= AGE_HISTOGRAM_MONTHS <= bucket['maxMonths']),
+        buckets[-1]['label'],
     )
+    for name, output in AGE_HISTOGRAM_OUTPUTS.items():
+        overflow = prefix_sums[name][-1] - prefix_sums[name][-2]
+        distribution[overflow_label][output] += overflow
+        distribution[buckets[-1]['label']][output] += prefix_sums[name][-2] - assigned[name]
+    return list(distribution.values())
 
-    if preference.age_buckets_json == LEGACY_AGE_BUCKETS:
-        preference.age_buckets_json = DEFAULT_AGE_BUCKETS
-        preference.save(update_fields=['age_buckets_json', 'updated_at'])
 
-    buckets = normalize_age_buckets(preference.age_buckets_json)
-    if buckets != preference.age_buckets_json:
-        preference.age_buckets_json = buckets
-        preference.save(update_fields=['age_buckets_json', 'updated_at'])
-    return buckets
+def with_age_buckets(data, age_buckets=None):
+    return {
+        'coverage': data['coverage'],
+        'ranking': data['ranking'],
+        'ageDistribution': apply_age_buckets(data['ageHistogram'], age_buckets),
+    }
 
 
-def _bucket_label(age_months: int, age_buckets: list[dict]):
-    for bucket in age_buckets:
-        if bucket['minMonths'] <= age_months <= bucket['maxMonths']:
-            return bucket['label']
-    return age_buckets[-1]['label']
+def _new_school_entry(student):
+    return {
+        'schoolId': student.school_id,
+        'schoolName': student.school.name,
+        'totalStudents': 0,
+        'EM_DIA': 0,
+        'ATRASADO': 0,
+        'INCOMPLETO': 0,
+        'SEM_DADOS': 0,
+    }
 
 
-def build_coverage_by_school(students, vaccine_id=None):
-    vaccine_ids = {int(vaccine_id)} if vaccine_id else None
-    by_school = {}
-    for student in students:
-        status_data = build_student_immunization_status(student, vaccine_ids=vaccine_ids)
-        school_name = student.school.name
-        if school_name not in by_school:
-            by_school[school_name] = {
-                'schoolId': student.school_id,
-                'schoolName': school_name,
+def _rank_schools(coverage):
+    ranking = []
+    for item in coverage:
+        total = item['totalStudents'] or 1
+        ranking.append(
+            {
+                **item,
+                'delayPercent': round((item['ATRASADO'] / total) * 100, 2),
+                'noDataPercent': round((item['SEM_DADOS'] / total) * 100, 2),
+            }
+        )
+    return sorted(ranking, key=lambda x: (x['delayPercent'], x['noDataPercent']), reverse=True)
+
+
+def rollup_coverage(coverage, group_by='territory', territory=None):
+    territory_by_school = dict(School.objects.filter(id__in=[item['schoolId'] for item in coverage]).values_list('id', 'territory_ref'))
+    schools = [{**item, 'territory': territory_by_school.get(item['schoolId'], '')} for item in coverage]
+    if territory is not None:
+        schools = [item for item in schools if item['territory'] == territory]
+    if group_by == 'school':
+        return sorted(schools, key=lambda item: (item['territory'] == '', item['territory'], item['schoolName'], item['schoolId']))
+
+    by_territory = {}
+    for item in schools:
+        entry = by_territory.get(item['territory'])
+        if entry is None:
+            entry = by_territory[item['territory']] = {
+                'territory': item['territory'],
+                'schoolCount': 0,
                 'totalStudents': 0,
                 'EM_DIA': 0,
                 'ATRASADO': 0,
                 'INCOMPLETO': 0,
                 'SEM_DADOS': 0,
             }
+        entry['schoolCount'] += 1
+        for field in ('totalStudents', 'EM_DIA', 'ATRASADO', 'INCOMPLETO', 'SEM_DADOS'):
+            entry[field] += item[field]
+
+    rollup = sorted(by_territory.values(), key=lambda item: (item['territory'] == '', item['territory']))
+    for item in rollup:
+        total = item['totalStudents'] or 1
+        item['coveragePercent'] = round((item['EM_DIA'] / total) * 100, 2)
+    return rollup
+
 
-        school_entry = by_school[school_name]
+def rollup_students(students, vaccine_id=None, as_of=None):
+    vaccine_ids = {int(vaccine_id)} if vaccine_id else None
+    statuses = summarize_population(students, vaccine_ids=vaccine_ids, as_of=as_of)
+    return [
+        {
+            'studentId': student.id,
+            'fullName': student.full_name,
+            'schoolId': student.school_id,
+            'schoolName': student.school.name,
+            'territory': student.school.territory_ref,
+            'status': statuses[student.id]['status'],
+            'ageMonths': statuses[student.id]['ageMonths'],
+            'pendingCount': statuses[student.id]['pendingCount'],
+            'overdueCount': statuses[student.id]['overdueCount'],
+        }
+        for student in students
+    ]
+
+
+def summarize_dashboard(students, vaccine_id=None, as_of=None):
+    vaccine_ids = {int(vaccine_id)} if vaccine_id else None
+    histogram = new_age_histogram()
+    by_school = {}
+
+    students = list(students)
+    statuses = summarize_population(students, vaccine_ids=vaccine_ids, as_of=as_of)
+    for student in students:
+        status_data = statuses[student.id]
+
+        school_entry = by_school.get(student.school_id)
+        if school_entry is None:
+            school_entry = by_school[student.school_id] = _new_school_entry(student)
         school_entry['totalStudents'] += 1
         school_entry[status_data['status']] += 1
 
-    for item in by_school.values():
+        _add_to_age_histogram(
+            histogram,
+            status_data['ageMonths'],
+            1 if status_data['status'] == 'EM_DIA' else 0,
+            status_data['pendingCount'],
+            status_data['overdueCount'],
+        )
+
+    # Mesma chave e ordem do caminho pelo cubo (summarize_status_rows): escolas homonimas ficam separadas.
+    coverage = sorted(by_school.values(), key=lambda item: (item['schoolName'], item['schoolId']))
+    for item in coverage:
         total = item['totalStudents'] or 1
         item['coveragePercent'] = round((item['EM_DIA'] / total) * 100, 2)
 
-    return list(by_school.values())
+    return {
+        'coverage': coverage,
+        'ranking': _rank_schools(coverage),
+        'ageHistogram': age_histogram_prefix_sums(histogram),
+    }
+
 
+def aggregate_dashboard(students, age_buckets=None, vaccine_id=None, as_of=None):
+    return with_age_buckets(summarize_dashboard(students, vaccine_id=vaccine_id, as_of=as_of), age_buckets)
 
-def build_ranking(students, vaccine_id=None):
-    coverage = build_coverage_by_school(students, vaccine_id=vaccine_id)
+
+def _optional_int(value):
+    return int(value) if value not in (None, '') else None
+
+
+def summarize_status_rows(rows):
+    histogram = new_age_histogram()
+    by_school = {}
+    for row in rows:
+        school_entry = by_school.get(row['school_id'])
+        if school_entry is None:
+            school_entry = by_school[row['school_id']] = {
+                'schoolId': row['school_id'],
+                'schoolName': '',
+                'totalStudents': 0,
+                'EM_DIA': 0,
+                'ATRASADO': 0,
+                'INCOMPLETO': 0,
+                'SEM_DADOS': 0,
+            }
+        school_entry['totalStudents'] += row['students']
+        school_entry[row['status']] += row['students']
+
+        _add_to_age_histogram(
+            histogram,
+            row['age_months'],
+            row['students'] if row['status'] == 'EM_DIA' else 0,
+            row['pending'],
+            row['overdue'],
+        )
+
+    for school_id, name in School.objects.filter(id__in=list(by_school)).values_list('id', 'name'):
+        by_school[school_id]['schoolName'] = name
+    coverage = sorted(by_school.values(), key=lambda item: (item['schoolName'], item['schoolId']))
     for item in coverage:
         total = item['totalStudents'] or 1
-        item['delayPercent'] = round((item['ATRASADO'] / total) * 100, 2)
-        item['noDataPercent'] = round((item['SEM_DADOS'] / total) * 100, 2)
+        item['coveragePercent'] = round((item['EM_DIA'] / total) * 100, 2)
 
-    return sorted(coverage, key=lambda x: (x['delayPercent'], x['noDataPercent']), reverse=True)
+    return {
+        'coverage': coverage,
+        'ranking': _rank_schools(coverage),
+        'ageHistogram': age_histogram_prefix_sums(histogram),
+    }
 
 
-def build_pending_age_distribution(students, age_buckets=None, vaccine_id=None):
-    vaccine_ids = {int(vaccine_id)} if vaccine_id else None
-    buckets = normalize_age_buckets(age_buckets)
-    distribution = {
-        bucket['label']: {
-            'ageBucket': bucket['label'],
-            'pendingCount': 0,
-            'overdueCount': 0,
-            'upToDateCount': 0,
+def _status_rows(students, statuses):
+    for student in students:
+        status_data = statuses[student.id]
+        yield {
+            'school_id': student.school_id,
+            'age_months': status_data['ageMonths'],
+            'status': status_data['status'],
+            'students': 1,
+            'pending': status_data['pendingCount'],
+            'overdue': status_data['overdueCount'],
         }
-        for bucket in buckets
-    }
 
-    for student in students:
-        age_months = age_in_months_from_birth_date(student.birth_date)
-        status_data = build_student_immunization_status(student, vaccine_ids=vaccine_ids)
-        label = _bucket_label(age_months, buckets)
 
-        if status_data['status'] == 'EM_DIA':
-            distribution[label]['upToDateCount'] += 1
+def summarize_dashboard_from_cube(user, filters, as_of=None):
+    as_of = as_of or timezone.localdate()
+    scope = cube_scope_filter(user)
+    school_id = filters.get('schoolId')
+    if filters.get('q') or scope is None or (school_id and not str(school_id).isdigit()):
+        return None
+
+    vaccine_id = _optional_int(filters.get('vaccineId'))
+    age_min = _optional_int(filters.get('ageMin'))
+    age_max = _optional_int(filters.get('ageMax'))
+    if vaccine_id and not Vaccine.objects.filter(pk=vaccine_id).exists():
+        return None
+    fresh_slices = fresh_cube_slices(as_of)
+    if not fresh_slices.filter(scope).exists():
+        return None
+
+    rows = list(
+        query_cube_rows(
+            as_of,
+            scope,
+            school_id=school_id,
+            sex=filters.get('sex'),
+            age_min=age_min,
+            age_max=age_max,
+            status=filters.get('status'),
+            vaccine_id=vaccine_id,
+        )
+    )
 
-        for pending in status_data['pending']:
-            distribution[label]['pendingCount'] += 1
-            if pending['status'] == 'ATRASADA':
-                distribution[label]['overdueCount'] += 1
+    # Escolas sem fatia atualizada (escritas recentes) sao calculadas na hora.
+    uncovered = scope_students_for_user(user, Student.objects.exclude(school_id__in=fresh_slices.values('school_id')))
+    live_students = filter_students_for_dashboard(
+        uncovered,
+        school_id=school_id,
+        status=filters.get('status'),
+        age_min=age_min,
+        age_max=age_max,
+        sex=filters.get('sex'),
+        vaccine_id=vaccine_id,
+        as_of=as_of,
+    )
+    if live_students:
+        statuses = summarize_population(live_students, vaccine_ids={vaccine_id} if vaccine_id else None, as_of=as_of)
+        rows.extend(_status_rows(live_students, statuses))
+    return summarize_status_rows(rows)
 
-    return list(distribution.values())
 
+def build_coverage_by_school(students, vaccine_id=None, as_of=None):
+    return aggregate_dashboard(students, vaccine_id=vaccine_id, as_of=as_of)['coverage']
 
-def filter_students_for_dashboard(students: Iterable, *, q=None, school_id=None, status=None, age_min=None, age_max=None, sex=None, vaccine_id=None):
-    vaccine_ids = {int(vaccine_id)} if vaccine_id else None
+
+def build_ranking(students, vaccine_id=None, as_of=None):
+    return aggregate_dashboard(students, vaccine_id=vaccine_id, as_of=as_of)['ranking']
+
+
+def build_pending_age_distribution(students, age_buckets=None, vaccine_id=None, as_of=None):
+    return aggregate_dashboard(students, age_buckets=age_buckets, vaccine_id=vaccine_id, as_of=as_of)['ageDistribution']
+
+
+def filter_students_for_dashboard(
+    students: QuerySet,
+    *,
+    q=None,
+    school_id=None,
+    status=None,
+    age_min=None,
+    age_max=None,
+    sex=None,
+    vaccine_id=None,
+    as_of=None,
+):
+    as_of = as_of or timezone.localdate()
+    vaccine_id_value = int(vaccine_id) if vaccine_id else None
     age_min_value = None
     age_max_value = None
     if age_min not in (None, ''):
@@ -141,25 +413,15 @@ def filter_students_for_dashboard(students: Iterable, *, q=None, school_id=None,
     if age_max not in (None, ''):
         age_max_value = int(age_max)
 
-    filtered = []
-    for student in students:
-        if q and q.lower() not in student.full_name.lower():
-            continue
-        if school_id and str(student.school_id) != str(school_id):
-            continue
-        if sex and student.sex != sex:
-            continue
-
-        age_months = age_in_months_from_birth_date(student.birth_date)
-        if age_min_value is not None and age_months < age_min_value:
-            continue
-        if age_max_value is not None and age_months > age_max_value:
-            continue
-
-        status_data = build_student_immunization_status(student, vaccine_ids=vaccine_ids)
-        if status and status_data['status'] != status:
-            continue
-
-        filtered.append(student)
-
-    return filtered
+    students = filter_students_queryset(
+        students,
+        q=q,
+        school_id=school_id,
+        sex=sex,
+        age_min=age_min_value,
+        age_max=age_max_value,
+        as_of=as_of,
+    )
+    if status:
+        students = filter_students_by_status(students, status, vaccine_id_value, as_of=as_of)
+    return list(students)
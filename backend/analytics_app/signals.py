@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from analytics_app.cube import mark_cube_dirty
+from core.models import School, Student
+from immunization.models import VaccinationRecord
+
+
+@receiver(post_save, sender=School)
+@receiver(post_delete, sender=School)
+def mark_school_slice_dirty(sender, instance, **kwargs):
+    mark_cube_dirty(school_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def mark_student_school_slice_dirty(sender, instance, **kwargs):
+    # _loaded_school_id ainda e a escola anterior: post_save roda antes de Student.save atualiza-lo.
+    mark_cube_dirty(school_ids=[instance.school_id, getattr(instance, '_loaded_school_id', None)])
+
+
+@receiver(post_save, sender=VaccinationRecord)
+@receiver(post_delete, sender=VaccinationRecord)
+def mark_record_school_slice_dirty(sender, instance, **kwargs):
+    mark_cube_dirty(student_ids=[instance.student_id, getattr(instance, '_loaded_student_id', None)])
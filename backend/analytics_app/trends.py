@@ -0,0 +1,131 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from analytics_app.cube import CUBE_INSERT_BATCH_SIZE, prune_coverage_cube, refresh_coverage_cube
+from analytics_app.models import CoverageCube, CoverageSnapshot
+
+STATUS_FIELDS = {
+    'EM_DIA': 'up_to_date_count',
+    'ATRASADO': 'delayed_count',
+    'INCOMPLETO': 'incomplete_count',
+    'SEM_DADOS': 'no_data_count',
+}
+SNAPSHOT_COUNT_FIELDS = ['total_students', *STATUS_FIELDS.values(), 'pending_count', 'overdue_count']
+GRANULARITIES = ('day', 'week', 'month')
+WEEKLY_AFTER_DAYS = 92
+MONTHLY_AFTER_DAYS = 366
+DEFAULT_TREND_DAYS = 90
+MAX_TREND_DAYS = 366 * 5
+
+
+def build_coverage_snapshot(as_of=None):
+    as_of = as_of or timezone.localdate()
+    refresh_coverage_cube(as_of)
+
+    snapshots = {}
+    rows = (
+        CoverageCube.objects.filter(snapshot_date=as_of)
+        .values('school_id', 'vaccine_id', 'status')
+        .annotate(students=Sum('student_count'), pending=Sum('pending_count'), overdue=Sum('overdue_count'))
+        .order_by()
+    )
+    for row in rows:
+        key = (row['school_id'], row['vaccine_id'])
+        snapshot = snapshots.get(key)
+        if snapshot is None:
+            snapshot = snapshots[key] = CoverageSnapshot(snapshot_date=as_of, school_id=key[0], vaccine_id=key[1])
+        snapshot.total_students += row['students']
+        setattr(snapshot, STATUS_FIELDS[row['status']], getattr(snapshot, STATUS_FIELDS[row['status']]) + row['students'])
+        snapshot.pending_count += row['pending']
+        snapshot.overdue_count += row['overdue']
+
+    # Reexecutar o comando para a mesma data atualiza as linhas do dia no lugar (upsert), numa so
+    # transacao: leitores nunca veem o dia vazio e execucoes concorrentes esperam o lock das linhas.
+    # Nao usamos bulk_create(update_conflicts=...) porque a linha geral (vacina vazia) so e unica
+    # pela restricao parcial, que o ON CONFLICT nao consegue inferir.
+    with transaction.atomic():
+        existing = {
+            (row.school_id, row.vaccine_id): row
+            for row in CoverageSnapshot.objects.select_for_update().filter(snapshot_date=as_of)
+        }
+        to_update = []
+        now = timezone.now()
+        for key, snapshot in snapshots.items():
+            current = existing.pop(key, None)
+            if current is not None:
+                snapshot.pk = current.pk
+                snapshot.created_at = now
+                to_update.append(snapshot)
+        to_create = [snapshot for snapshot in snapshots.values() if snapshot.pk is None]
+        if existing:
+            CoverageSnapshot.objects.filter(pk__in=[row.pk for row in existing.values()]).delete()
+        CoverageSnapshot.objects.bulk_update(to_update, [*SNAPSHOT_COUNT_FIELDS, 'created_at'], batch_size=CUBE_INSERT_BATCH_SIZE)
+        CoverageSnapshot.objects.bulk_create(to_create, batch_size=CUBE_INSERT_BATCH_SIZE)
+    prune_coverage_cube()
+    return len(snapshots)
+
+
+def resolve_granularity(date_from, date_to, granularity=None):
+    if granularity:
+        return granularity
+    days = (date_to - date_from).days
+    if days > MONTHLY_AFTER_DAYS:
+        return 'month'
+    if days > WEEKLY_AFTER_DAYS:
+        return 'week'
+    return 'day'
+
+
+def _period_start(day, granularity):
+    if granularity == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def coverage_trend(scope, date_from, date_to, *, granularity='day', school_id=None, vaccine_id=None):
+    rows = CoverageSnapshot.objects.filter(scope, snapshot_date__gte=date_from, snapshot_date__lte=date_to)
+    rows = rows.filter(vaccine_id=vaccine_id) if vaccine_id else rows.filter(vaccine__isnull=True)
+    if school_id:
+        rows = rows.filter(school_id=school_id)
+    daily = (
+        rows.values('snapshot_date')
+        .annotate(
+            total=Sum('total_students'),
+            up_to_date=Sum('up_to_date_count'),
+            delayed=Sum('delayed_count'),
+            incomplete=Sum('incomplete_count'),
+            no_data=Sum('no_data_count'),
+            pending=Sum('pending_count'),
+            overdue=Sum('overdue_count'),
+        )
+        .order_by('snapshot_date')
+    )
+
+    # Contagens sao fotos do dia: cada periodo usa o ultimo snapshot disponivel.
+    points = {}
+    for row in daily:
+        points[_period_start(row['snapshot_date'], granularity)] = row
+
+    items = []
+    for period_start, row in points.items():
+        total = row['total'] or 1
+        items.append(
+            {
+                'periodStart': period_start,
+                'snapshotDate': row['snapshot_date'],
+                'totalStudents': row['total'],
+                'EM_DIA': row['up_to_date'],
+                'ATRASADO': row['delayed'],
+                'INCOMPLETO': row['incomplete'],
+                'SEM_DADOS': row['no_data'],
+                'pendingCount': row['pending'],
+                'overdueCount': row['overdue'],
+                'coveragePercent': round((row['up_to_date'] / total) * 100, 2),
+            }
+        )
+    return items
@@ -1,44 +1,97 @@
-﻿from rest_framework import permissions
+﻿import datetime
+
+from django.utils.dateparse import parse_date
+from rest_framework import permissions
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from accounts.permissions import has_dashboard_school_access, has_health_dashboard_access, is_school_user
-from analytics_app.models import DEFAULT_AGE_BUCKETS, DashboardPreference
+from accounts.permissions import has_dashboard_school_access, has_health_dashboard_access, is_admin, is_school_user
+from analytics_app.cache import dashboard_cache_key, get_cache_stats, get_or_compute, normalize_dashboard_filters
+from analytics_app.cube import cube_scope_filter
+from analytics_app.models import DashboardPreference
 from analytics_app.services import (
-    build_coverage_by_school,
-    build_pending_age_distribution,
-    build_ranking,
     filter_students_for_dashboard,
     get_user_age_buckets,
     normalize_age_buckets,
+    rollup_coverage,
+    rollup_students,
+    summarize_dashboard,
+    summarize_dashboard_from_cube,
+    with_age_buckets,
 )
+from analytics_app.trends import DEFAULT_TREND_DAYS, GRANULARITIES, MAX_TREND_DAYS, coverage_trend, resolve_granularity
 from core.models import Student
-from core.services import scope_students_for_user
+from core.pagination import StandardPageNumberPagination
+from core.services import parse_as_of, scope_students_for_user
 
+ROLLUP_LEVELS = ('territory', 'school', 'student')
 
-class DashboardFiltersMixin:
-    def _get_filtered_students(self, request):
-        students = list(scope_students_for_user(request.user, Student.objects.select_related('school').all()))
 
+class DashboardFiltersMixin:
+    def _check_school_filter(self, request):
         school_id = request.query_params.get('schoolId')
         if school_id and is_school_user(request.user) and str(request.user.school_id) != str(school_id):
             raise PermissionDenied('Usuario de escola nao pode consultar outra escola.')
 
+    def _get_filtered_students(self, request, as_of):
+        self._check_school_filter(request)
+        students = scope_students_for_user(request.user, Student.objects.select_related('school').all())
+
         try:
             return filter_students_for_dashboard(
                 students,
                 q=request.query_params.get('q'),
-                school_id=school_id,
+                school_id=request.query_params.get('schoolId'),
                 status=request.query_params.get('status'),
                 age_min=request.query_params.get('ageMin'),
                 age_max=request.query_params.get('ageMax'),
                 sex=request.query_params.get('sex'),
                 vaccine_id=request.query_params.get('vaccineId'),
+                as_of=as_of,
             )
         except (TypeError, ValueError):
             raise ValidationError({'detail': 'ageMin, ageMax e vaccineId devem ser valores numéricos válidos.'})
 
+    def _summary(self, request):
+        self._check_school_filter(request)
+        as_of = parse_as_of(request.query_params)
+        key = dashboard_cache_key('aggregate', request.user, normalize_dashboard_filters(request.query_params), as_of)
+        return get_or_compute(key, lambda: self._compute_aggregate(request, as_of))
+
+    def _aggregate(self, request, age_buckets=None):
+        # A faixa etaria e aplicada depois do cache: usuarios com faixas diferentes compartilham o calculo.
+        return with_age_buckets(self._summary(request), age_buckets)
+
+    def _compute_aggregate(self, request, as_of):
+        try:
+            data = summarize_dashboard_from_cube(request.user, normalize_dashboard_filters(request.query_params), as_of=as_of)
+        except (TypeError, ValueError):
+            raise ValidationError({'detail': 'ageMin, ageMax e vaccineId devem ser valores numéricos válidos.'})
+        if data is not None:
+            return data
+        return summarize_dashboard(
+            self._get_filtered_students(request, as_of),
+            vaccine_id=request.query_params.get('vaccineId'),
+            as_of=as_of,
+        )
+
+
+class DashboardSummaryView(DashboardFiltersMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        if not has_dashboard_school_access(request.user):
+            raise PermissionDenied('Sem permissao para dashboard.')
+
+        if not has_health_dashboard_access(request.user):
+            data = self._aggregate(request)
+            return Response({'coverage': data['coverage']})
+
+        age_buckets = get_user_age_buckets(request.user)
+        data = self._aggregate(request, age_buckets=age_buckets)
+        return Response({**data, 'ageBuckets': age_buckets})
+
 
 class SchoolCoverageDashboardView(DashboardFiltersMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -47,11 +100,7 @@ class SchoolCoverageDashboardView(DashboardFiltersMixin, APIView):
         if not has_dashboard_school_access(request.user):
             raise PermissionDenied('Sem permissao para dashboard de cobertura.')
 
-        data = build_coverage_by_school(
-            self._get_filtered_students(request),
-            vaccine_id=request.query_params.get('vaccineId'),
-        )
-        return Response({'items': data})
+        return Response({'items': self._aggregate(request)['coverage']})
 
 
 class SchoolRankingDashboardView(DashboardFiltersMixin, APIView):
@@ -61,11 +110,7 @@ class SchoolRankingDashboardView(DashboardFiltersMixin, APIView):
         if not has_health_dashboard_access(request.user):
             raise PermissionDenied('Sem permissao para dashboard de ranking.')
 
-        data = build_ranking(
-            self._get_filtered_students(request),
-            vaccine_id=request.query_params.get('vaccineId'),
-        )
-        return Response({'items': data})
+        return Response({'items': self._aggregate(request)['ranking']})
 
 
 class AgeDistributionDashboardView(DashboardFiltersMixin, APIView):
@@ -76,12 +121,110 @@ class AgeDistributionDashboardView(DashboardFiltersMixin, APIView):
             raise PermissionDenied('Sem permissao para dashboard de faixa etaria.')
 
         age_buckets = get_user_age_buckets(request.user)
-        data = build_pending_age_distribution(
-            self._get_filtered_students(request),
-            age_buckets=age_buckets,
-            vaccine_id=request.query_params.get('vaccineId'),
+        data = self._aggregate(request, age_buckets=age_buckets)
+        return Response({'items': data['ageDistribution'], 'ageBuckets': age_buckets})
+
+
+class TerritoryRollupDashboardView(DashboardFiltersMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        if not has_health_dashboard_access(request.user):
+            raise PermissionDenied('Sem permissao para dashboard de territorios.')
+
+        group_by = request.query_params.get('groupBy') or 'territory'
+        if group_by not in ROLLUP_LEVELS:
+            raise ValidationError({'groupBy': 'Use territory, school ou student.'})
+        territory = request.query_params.get('territory')
+        territory = territory.strip() if territory is not None else None
+
+        as_of = parse_as_of(request.query_params)
+        if group_by == 'student':
+            return self._students(request, territory, as_of)
+        filters = {**normalize_dashboard_filters(request.query_params), 'territory': territory}
+        key = dashboard_cache_key(f'rollup:{group_by}', request.user, filters, as_of)
+        items = get_or_compute(key, lambda: rollup_coverage(self._summary(request)['coverage'], group_by, territory))
+        return Response({'groupBy': group_by, 'territory': territory, 'items': items})
+
+    def _students(self, request, territory, as_of):
+        # Ultimo nivel da descida: exige a escola e e paginado; so a pagina pedida tem o status
+        # calculado, entao nao passa pelo cache de dashboards.
+        if not request.query_params.get('schoolId'):
+            raise ValidationError({'schoolId': 'Informe schoolId para listar estudantes.'})
+        students = self._get_filtered_students(request, as_of)
+        if territory is not None:
+            students = [student for student in students if student.school.territory_ref == territory]
+        students.sort(key=lambda student: (student.full_name, student.id))
+
+        paginator = StandardPageNumberPagination()
+        page = paginator.paginate_queryset(students, request, view=self)
+        return Response(
+            {
+                'groupBy': 'student',
+                'territory': territory,
+                'count': paginator.page.paginator.count,
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+                'items': rollup_students(page, vaccine_id=request.query_params.get('vaccineId'), as_of=as_of),
+            }
+        )
+
+
+class DashboardTrendsView(DashboardFiltersMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def _parse_date_param(self, name):
+        raw_value = self.request.query_params.get(name)
+        if raw_value in (None, ''):
+            return None
+        try:
+            parsed = parse_date(raw_value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({name: 'Data invalida. Use o formato AAAA-MM-DD.'})
+        return parsed
+
+    def get(self, request):
+        if not has_dashboard_school_access(request.user):
+            raise PermissionDenied('Sem permissao para dashboard de tendencias.')
+        self._check_school_filter(request)
+
+        date_to = self._parse_date_param('dateTo') or parse_as_of(request.query_params)
+        date_from = self._parse_date_param('dateFrom') or date_to - datetime.timedelta(days=DEFAULT_TREND_DAYS - 1)
+        if date_from > date_to:
+            raise ValidationError({'dateFrom': 'dateFrom deve ser anterior ou igual a dateTo.'})
+        if (date_to - date_from).days > MAX_TREND_DAYS:
+            raise ValidationError({'dateFrom': f'Periodo maximo de {MAX_TREND_DAYS} dias.'})
+
+        granularity = request.query_params.get('granularity') or None
+        if granularity is not None and granularity not in GRANULARITIES:
+            raise ValidationError({'granularity': 'Use day, week ou month.'})
+        granularity = resolve_granularity(date_from, date_to, granularity)
+
+        school_id = request.query_params.get('schoolId')
+        vaccine_id = request.query_params.get('vaccineId')
+        if (school_id and not school_id.isdigit()) or (vaccine_id and not vaccine_id.isdigit()):
+            raise ValidationError({'detail': 'schoolId e vaccineId devem ser valores numéricos válidos.'})
+
+        items = coverage_trend(
+            cube_scope_filter(request.user),
+            date_from,
+            date_to,
+            granularity=granularity,
+            school_id=school_id,
+            vaccine_id=vaccine_id,
         )
-        return Response({'items': data, 'ageBuckets': age_buckets})
+        return Response({'dateFrom': date_from, 'dateTo': date_to, 'granularity': granularity, 'items': items})
+
+
+class DashboardCacheStatsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        if not is_admin(request.user):
+            raise PermissionDenied('Sem permissao para estatisticas de cache.')
+        return Response(get_cache_stats())
 
 
 class DashboardAgeBucketsPreferenceView(APIView):
@@ -111,10 +254,5 @@ class DashboardAgeBucketsPreferenceView(APIView):
             if current['minMonths'] <= previous['maxMonths']:
                 raise ValidationError({'ageBuckets': 'Faixas etarias nao podem se sobrepor.'})
 
-        preference, _ = DashboardPreference.objects.get_or_create(
-            user=request.user,
-            defaults={'age_buckets_json': DEFAULT_AGE_BUCKETS},
-        )
-        preference.age_buckets_json = normalized
-        preference.save(update_fields=['age_buckets_json', 'updated_at'])
+        DashboardPreference.objects.update_or_create(user_id=request.user.id, defaults={'age_buckets_json': normalized})
         return Response({'ageBuckets': normalized})
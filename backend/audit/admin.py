@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from audit.models import AuditLog, ErrorLog
+from audit.models import AuditLog, ErrorGroup, ErrorLog, SqlProfile
 
 
 @admin.register(AuditLog)
@@ -10,8 +10,22 @@ class AuditLogAdmin(admin.ModelAdmin):
     search_fields = ('entity_id', 'action', 'entity_type', 'actor__email')
 
 
+@admin.register(ErrorGroup)
+class ErrorGroupAdmin(admin.ModelAdmin):
+    list_display = ('id', 'last_seen', 'status_code', 'method', 'path_template', 'occurrence_count')
+    list_filter = ('status_code', 'method')
+    search_fields = ('path_template', 'message_template', 'last_trace_id')
+
+
 @admin.register(ErrorLog)
 class ErrorLogAdmin(admin.ModelAdmin):
     list_display = ('id', 'timestamp', 'status_code', 'method', 'path', 'actor', 'trace_id')
     list_filter = ('status_code', 'method')
     search_fields = ('path', 'message', 'trace_id', 'actor__email')
+
+
+@admin.register(SqlProfile)
+class SqlProfileAdmin(admin.ModelAdmin):
+    list_display = ('id', 'created_at', 'method', 'path', 'query_count', 'n_plus_one_count', 'trace_id')
+    list_filter = ('method', 'trigger')
+    search_fields = ('path', 'trace_id', 'actor__email')
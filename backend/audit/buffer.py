@@ -0,0 +1,171 @@
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class AuditLogBuffer:
+    def __init__(self):
+        self._entries = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._failures = 0
+        self._retry_after = 0.0
+        self.background_enabled = True
+
+    @property
+    def max_size(self):
+        return settings.AUDIT_BUFFER_MAX_SIZE
+
+    @property
+    def max_retries(self):
+        return settings.AUDIT_BUFFER_MAX_RETRIES
+
+    @property
+    def flush_interval(self):
+        return settings.AUDIT_BUFFER_FLUSH_INTERVAL
+
+    def pending(self):
+        with self._lock:
+            return len(self._entries)
+
+    def add(self, entry):
+        if transaction.get_connection().in_atomic_block:
+            # Eventos gerados dentro de transacao so existem se ela confirmar,
+            # e sao gravados imediatamente no commit.
+            transaction.on_commit(lambda: self._enqueue(entry, flush=True))
+        else:
+            self._enqueue(entry)
+
+    def _enqueue(self, entry, flush=False):
+        with self._lock:
+            self._entries.append((entry, 0))
+            full = len(self._entries) >= self.max_size
+        # Depois de uma falha, so a thread de fundo tenta de novo (com espera crescente),
+        # para nao repetir a gravacao em toda requisicao enquanto o banco estiver fora.
+        if (flush or full) and not self._backing_off():
+            self.flush()
+        else:
+            self._ensure_thread()
+
+    def _backing_off(self):
+        return time.monotonic() < self._retry_after
+
+    def clear(self):
+        with self._lock:
+            self._entries = []
+        self._failures = 0
+        self._retry_after = 0.0
+
+    def flush(self):
+        from audit.models import AuditLog
+
+        with self._flush_lock:
+            with self._lock:
+                pending, self._entries = self._entries, []
+            if not pending:
+                return 0
+            try:
+                with transaction.atomic():
+                    AuditLog.objects.bulk_create([entry for entry, _ in pending], batch_size=self.max_size)
+                self._failures = 0
+                self._retry_after = 0.0
+                return len(pending)
+            except Exception:
+                logger.exception('Falha ao gravar lote de auditoria; tentando evento a evento.')
+
+            # Nunca propaga erro para a requisicao: grava o que for possivel e devolve o resto para a fila.
+            written = 0
+            retry = []
+            for entry, attempts in pending:
+                try:
+                    with transaction.atomic():
+                        AuditLog.objects.bulk_create([entry])
+                    written += 1
+                except Exception:
+                    attempts += 1
+                    if attempts < self.max_retries:
+                        logger.exception(
+                            'Falha ao gravar evento de auditoria %s %s #%s (tentativa %s de %s).',
+                            entry.action,
+                            entry.entity_type,
+                            entry.entity_id,
+                            attempts,
+                            self.max_retries,
+                        )
+                        retry.append((entry, attempts))
+                    else:
+                        logger.critical(
+                            'EVENTO DE AUDITORIA PERDIDO apos %s tentativas: acao=%s entidade=%s #%s ator=%s em=%s detalhes=%s',
+                            attempts,
+                            entry.action,
+                            entry.entity_type,
+                            entry.entity_id,
+                            entry.actor_id,
+                            entry.timestamp.isoformat() if entry.timestamp else None,
+                            entry.details_json,
+                            exc_info=True,
+                        )
+            if retry:
+                with self._lock:
+                    self._entries[:0] = retry
+                self._failures += 1
+                self._retry_after = time.monotonic() + self.flush_interval * 2 ** min(self._failures, 5)
+                self._ensure_thread()
+            return written
+
+    def _ensure_thread(self):
+        if not self.background_enabled or (self._thread and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-log-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            if self._backing_off():
+                continue
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Falha inesperada no flush de auditoria.')
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self._stopped.set()
+        thread = self._thread
+        if thread and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=self.flush_interval + 1)
+        self._thread = None
+
+    def shutdown(self):
+        self.stop()
+        return self.flush()
+
+    def _reset_after_fork(self):
+        self._entries = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._failures = 0
+        self._retry_after = 0.0
+
+
+audit_buffer = AuditLogBuffer()
+atexit.register(audit_buffer.shutdown)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=audit_buffer._reset_after_fork)
@@ -0,0 +1,38 @@
+import hashlib
+import re
+
+UUID_PATTERN = re.compile(r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}')
+HEX_TOKEN_PATTERN = re.compile(r'^[0-9a-fA-F]{16,}$')
+NUMBER_PATTERN = re.compile(r'\d+')
+QUOTED_PATTERN = re.compile(r'"[^"]*"|\'[^\']*\'')
+
+PATH_TEMPLATE_MAX_LEN = 255
+MESSAGE_TEMPLATE_MAX_LEN = 500
+
+
+def normalize_path(path):
+    segments = []
+    for segment in (path or '').split('/'):
+        if UUID_PATTERN.fullmatch(segment):
+            segments.append('{uuid}')
+        elif segment.isdigit():
+            segments.append('{id}')
+        elif HEX_TOKEN_PATTERN.match(segment):
+            segments.append('{token}')
+        else:
+            segments.append(segment)
+    return '/'.join(segments)[:PATH_TEMPLATE_MAX_LEN]
+
+
+def message_template(message):
+    template = UUID_PATTERN.sub('{uuid}', message or '')
+    template = QUOTED_PATTERN.sub('{valor}', template)
+    template = NUMBER_PATTERN.sub('{n}', template)
+    return ' '.join(template.split())[:MESSAGE_TEMPLATE_MAX_LEN]
+
+
+def error_fingerprint(status_code, method, path, message):
+    path_template = normalize_path(path)
+    template = message_template(message)
+    digest = hashlib.sha256(f'{status_code}|{method.upper()}|{path_template}|{template}'.encode()).hexdigest()
+    return digest, path_template, template
@@ -0,0 +1,128 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:54
+
+import hashlib
+import re
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+CHUNK_SIZE = 2000
+
+# Copia congelada de audit.fingerprint: a migracao nao pode depender do codigo atual da aplicacao.
+UUID_PATTERN = re.compile(r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}')
+HEX_TOKEN_PATTERN = re.compile(r'^[0-9a-fA-F]{16,}$')
+NUMBER_PATTERN = re.compile(r'\d+')
+QUOTED_PATTERN = re.compile(r'"[^"]*"|\'[^\']*\'')
+
+PATH_TEMPLATE_MAX_LEN = 255
+MESSAGE_TEMPLATE_MAX_LEN = 500
+
+
+def normalize_path(path):
+    segments = []
+    for segment in (path or '').split('/'):
+        if UUID_PATTERN.fullmatch(segment):
+            segments.append('{uuid}')
+        elif segment.isdigit():
+            segments.append('{id}')
+        elif HEX_TOKEN_PATTERN.match(segment):
+            segments.append('{token}')
+        else:
+            segments.append(segment)
+    return '/'.join(segments)[:PATH_TEMPLATE_MAX_LEN]
+
+
+def message_template(message):
+    template = UUID_PATTERN.sub('{uuid}', message or '')
+    template = QUOTED_PATTERN.sub('{valor}', template)
+    template = NUMBER_PATTERN.sub('{n}', template)
+    return ' '.join(template.split())[:MESSAGE_TEMPLATE_MAX_LEN]
+
+
+def error_fingerprint(status_code, method, path, message):
+    path_template = normalize_path(path)
+    template = message_template(message)
+    digest = hashlib.sha256(f'{status_code}|{method.upper()}|{path_template}|{template}'.encode()).hexdigest()
+    return digest, path_template, template
+
+
+def group_existing_errors(apps, schema_editor):
+    ErrorGroup = apps.get_model('audit', 'ErrorGroup')
+    ErrorLog = apps.get_model('audit', 'ErrorLog')
+
+    groups = {}
+    logs = ErrorLog.objects.order_by('timestamp', 'id').values_list(
+        'id', 'status_code', 'method', 'path', 'message', 'timestamp', 'trace_id'
+    )
+    chunk = []
+    for row in logs.iterator(chunk_size=CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            _assign_groups(ErrorGroup, ErrorLog, groups, chunk)
+            chunk = []
+    if chunk:
+        _assign_groups(ErrorGroup, ErrorLog, groups, chunk)
+
+    ErrorGroup.objects.bulk_update(
+        groups.values(), ['occurrence_count', 'last_seen', 'last_trace_id'], batch_size=CHUNK_SIZE
+    )
+
+
+def _assign_groups(ErrorGroup, ErrorLog, groups, chunk):
+    # Um UPDATE por fingerprint presente no lote, em vez de um save por linha.
+    log_ids = {}
+    for log_id, status_code, method, path, message, timestamp, trace_id in chunk:
+        fingerprint, path_template, template = error_fingerprint(status_code, method, path, message)
+        group = groups.get(fingerprint)
+        if group is None:
+            group = groups[fingerprint] = ErrorGroup.objects.create(
+                fingerprint=fingerprint,
+                status_code=status_code,
+                method=method,
+                path_template=path_template,
+                message_template=template,
+                first_seen=timestamp,
+            )
+        group.occurrence_count += 1
+        group.last_seen = timestamp
+        group.last_trace_id = trace_id
+        log_ids.setdefault(group.id, []).append(log_id)
+
+    for group_id, ids in log_ids.items():
+        ErrorLog.objects.filter(id__in=ids).update(group_id=group_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0004_auditlog_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ErrorGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=64, unique=True)),
+                ('status_code', models.PositiveIntegerField()),
+                ('method', models.CharField(max_length=10)),
+                ('path_template', models.CharField(max_length=255)),
+                ('message_template', models.CharField(max_length=500)),
+                ('occurrence_count', models.PositiveBigIntegerField(default=0)),
+                ('first_seen', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_seen', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_trace_id', models.CharField(blank=True, max_length=64)),
+            ],
+            options={
+                'ordering': ['-last_seen'],
+                'indexes': [models.Index(fields=['-last_seen', 'id'], name='errorgroup_last_seen_id_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='errorlog',
+            name='group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='audit.errorgroup'),
+        ),
+        migrations.RunPython(group_existing_errors, migrations.RunPython.noop),
+    ]
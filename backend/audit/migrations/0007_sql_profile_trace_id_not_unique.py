@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0006_sql_profile'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sqlprofile',
+            name='trace_id',
+            field=models.CharField(db_index=True, max_length=64),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
 class AuditLog(models.Model):
@@ -7,17 +8,38 @@ class AuditLog(models.Model):
     action = models.CharField(max_length=120)
     entity_type = models.CharField(max_length=120)
     entity_id = models.CharField(max_length=120)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     details_json = models.JSONField(default=dict, blank=True)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [models.Index(fields=['-timestamp', 'id'], name='auditlog_timestamp_id_idx')]
 
     def __str__(self):
         return f'{self.action} {self.entity_type}#{self.entity_id}'
 
 
+class ErrorGroup(models.Model):
+    fingerprint = models.CharField(max_length=64, unique=True)
+    status_code = models.PositiveIntegerField()
+    method = models.CharField(max_length=10)
+    path_template = models.CharField(max_length=255)
+    message_template = models.CharField(max_length=500)
+    occurrence_count = models.PositiveBigIntegerField(default=0)
+    first_seen = models.DateTimeField(default=timezone.now)
+    last_seen = models.DateTimeField(default=timezone.now)
+    last_trace_id = models.CharField(max_length=64, blank=True)
+
+    class Meta:
+        ordering = ['-last_seen']
+        indexes = [models.Index(fields=['-last_seen', 'id'], name='errorgroup_last_seen_id_idx')]
+
+    def __str__(self):
+        return f'{self.status_code} {self.method} {self.path_template} (x{self.occurrence_count})'
+
+
 class ErrorLog(models.Model):
+    group = models.ForeignKey(ErrorGroup, null=True, blank=True, on_delete=models.CASCADE, related_name='occurrences')
     actor = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         null=True,
@@ -35,6 +57,36 @@ class ErrorLog(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [models.Index(fields=['-timestamp', 'id'], name='errorlog_timestamp_id_idx')]
 
     def __str__(self):
         return f'{self.status_code} {self.method} {self.path} ({self.trace_id})'
+
+
+class SqlProfile(models.Model):
+    trace_id = models.CharField(max_length=64, db_index=True)
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='sql_profiles',
+    )
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=255)
+    view_name = models.CharField(max_length=120, blank=True)
+    status_code = models.PositiveIntegerField()
+    trigger = models.CharField(max_length=20)
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    query_time_ms = models.FloatField()
+    n_plus_one_count = models.PositiveIntegerField(default=0)
+    report_json = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['-created_at', 'id'], name='sqlprofile_created_id_idx')]
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.trace_id})'
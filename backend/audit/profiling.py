@@ -0,0 +1,126 @@
+import random
+import re
+import time
+import traceback
+
+from django.conf import settings
+from django.utils import timezone
+
+PROFILE_HEADER = 'X-Sql-Profile'
+TRIGGER_HEADER = 'header'
+TRIGGER_SAMPLE = 'sample'
+STACK_DEPTH = 8
+PLACEHOLDER_LIST_PATTERN = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+_IGNORED_STACK_PARTS = ('site-packages', 'dist-packages', '/django/', '/rest_framework/', __file__)
+
+
+def profiling_trigger(request):
+    if request.headers.get(PROFILE_HEADER, '').lower() in ('1', 'true') and _requested_by_admin(request):
+        return TRIGGER_HEADER
+    rate = settings.SQL_PROFILE_SAMPLE_RATE
+    if rate > 0 and random.random() < rate:
+        return TRIGGER_SAMPLE
+    return None
+
+
+def _requested_by_admin(request):
+    # O middleware roda antes da autenticacao do DRF: valida o JWT aqui para instrumentar so ADMIN.
+    from rest_framework.exceptions import APIException
+
+    from accounts.authentication import StatelessReadJWTAuthentication
+    from accounts.permissions import is_admin
+
+    try:
+        authenticated = StatelessReadJWTAuthentication().authenticate(request)
+    except APIException:
+        return False
+    return authenticated is not None and is_admin(authenticated[0])
+
+
+def normalize_sql(sql):
+    template = PLACEHOLDER_LIST_PATTERN.sub('(%s, ...)', sql)
+    return WHITESPACE_PATTERN.sub(' ', template).strip()
+
+
+def _call_site():
+    frames = []
+    for frame in traceback.extract_stack()[:-2]:
+        if frame.filename.startswith(str(settings.BASE_DIR)) and not any(part in frame.filename for part in _IGNORED_STACK_PARTS):
+            frames.append(f'{frame.filename[len(str(settings.BASE_DIR)) + 1:]}:{frame.lineno} in {frame.name}')
+    return frames[-STACK_DEPTH:]
+
+
+class SqlProfiler:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.statements.append(
+                {
+                    'sql': sql,
+                    'durationMs': round((time.perf_counter() - started) * 1000, 3),
+                    'many': many,
+                    'stack': _call_site(),
+                }
+            )
+
+    def report(self):
+        threshold = settings.SQL_PROFILE_N_PLUS_ONE_THRESHOLD
+        groups = {}
+        for statement in self.statements:
+            template = normalize_sql(statement['sql'])
+            group = groups.get(template)
+            if group is None:
+                group = groups[template] = {
+                    'sql': template,
+                    'count': 0,
+                    'totalMs': 0.0,
+                    'stack': statement['stack'],
+                }
+            group['count'] += 1
+            group['totalMs'] = round(group['totalMs'] + statement['durationMs'], 3)
+
+        ordered = sorted(groups.values(), key=lambda group: (-group['count'], -group['totalMs']))
+        for group in ordered:
+            group['nPlusOne'] = group['count'] >= threshold and group['sql'].upper().startswith('SELECT')
+
+        return {
+            'groups': ordered,
+            'statements': self.statements[: settings.SQL_PROFILE_MAX_STATEMENTS],
+            'truncated': len(self.statements) > settings.SQL_PROFILE_MAX_STATEMENTS,
+        }
+
+    @property
+    def total_ms(self):
+        return round(sum(statement['durationMs'] for statement in self.statements), 3)
+
+
+def store_sql_profile(request, response, profiler, trigger, duration):
+    from audit.models import SqlProfile
+
+    report = profiler.report()
+    match = getattr(request, 'resolver_match', None)
+    user = request.user if getattr(request, 'user', None) and request.user.is_authenticated else None
+    # O trace_id pode vir do cliente (X-Trace-Id): cada requisicao grava uma linha nova,
+    # identificada pelo id gerado no servidor.
+    return SqlProfile.objects.create(
+        trace_id=(getattr(request, 'trace_id', '') or 'n/a')[:64],
+        actor_id=user.id if user else None,
+        method=request.method,
+        path=request.path[:255],
+        view_name=(match.view_name if match else '')[:120],
+        status_code=response.status_code,
+        trigger=trigger,
+        duration_ms=round(duration * 1000, 3),
+        query_count=len(profiler.statements),
+        query_time_ms=profiler.total_ms,
+        n_plus_one_count=sum(1 for group in report['groups'] if group['nPlusOne']),
+        report_json=report,
+        created_at=timezone.now(),
+    )
@@ -1,6 +1,6 @@
 ﻿from rest_framework import serializers
 
-from audit.models import AuditLog, ErrorLog
+from audit.models import AuditLog, ErrorGroup, ErrorLog, SqlProfile
 
 
 class AuditLogSerializer(serializers.ModelSerializer):
@@ -28,6 +28,7 @@ class ErrorLogSerializer(serializers.ModelSerializer):
         model = ErrorLog
         fields = [
             'id',
+            'group',
             'actor',
             'actor_email',
             'method',
@@ -39,3 +40,49 @@ class ErrorLogSerializer(serializers.ModelSerializer):
             'timestamp',
         ]
         read_only_fields = fields
+
+
+class ErrorGroupSerializer(serializers.ModelSerializer):
+    sample_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = ErrorGroup
+        fields = [
+            'id',
+            'fingerprint',
+            'status_code',
+            'method',
+            'path_template',
+            'message_template',
+            'occurrence_count',
+            'sample_count',
+            'first_seen',
+            'last_seen',
+            'last_trace_id',
+        ]
+        read_only_fields = fields
+
+
+class SqlProfileSerializer(serializers.ModelSerializer):
+    actor_email = serializers.CharField(source='actor.email', read_only=True)
+
+    class Meta:
+        model = SqlProfile
+        fields = [
+            'id',
+            'trace_id',
+            'actor',
+            'actor_email',
+            'method',
+            'path',
+            'view_name',
+            'status_code',
+            'trigger',
+            'duration_ms',
+            'query_count',
+            'query_time_ms',
+            'n_plus_one_count',
+            'report_json',
+            'created_at',
+        ]
+        read_only_fields = fields
@@ -1,19 +1,67 @@
-from audit.models import AuditLog, ErrorLog
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from audit.buffer import audit_buffer
+from audit.fingerprint import error_fingerprint
+from audit.models import AuditLog, ErrorGroup, ErrorLog
 
 
 def create_audit_log(actor, action, entity_type, entity_id, details=None):
-    return AuditLog.objects.create(
-        actor=actor,
+    entry = AuditLog(
+        actor_id=actor.id if actor else None,
         action=action,
         entity_type=entity_type,
         entity_id=str(entity_id),
+        timestamp=timezone.now(),
         details_json=details or {},
     )
+    audit_buffer.add(entry)
+    return entry
+
+
+def flush_audit_logs():
+    return audit_buffer.flush()
+
+
+def should_sample_error(status_code, occurrence_count):
+    if status_code >= 500 or occurrence_count <= settings.ERROR_SAMPLE_FIRST:
+        return True
+    return occurrence_count % settings.ERROR_SAMPLE_EVERY == 0
+
+
+def _touch_error_group(fingerprint, status_code, method, path_template, template, trace_id, now):
+    groups = ErrorGroup.objects.filter(fingerprint=fingerprint)
+    if not groups.update(occurrence_count=F('occurrence_count') + 1, last_seen=now, last_trace_id=trace_id):
+        try:
+            with transaction.atomic():
+                return ErrorGroup.objects.create(
+                    fingerprint=fingerprint,
+                    status_code=status_code,
+                    method=method,
+                    path_template=path_template,
+                    message_template=template,
+                    occurrence_count=1,
+                    first_seen=now,
+                    last_seen=now,
+                    last_trace_id=trace_id,
+                )
+        except IntegrityError:
+            groups.update(occurrence_count=F('occurrence_count') + 1, last_seen=now, last_trace_id=trace_id)
+    return groups.only('id', 'occurrence_count').get()
 
 
 def create_error_log(actor, method, path, status_code, message, trace_id, details=None):
+    fingerprint, path_template, template = error_fingerprint(status_code, method, path, message)
+    now = timezone.now()
+    group = _touch_error_group(fingerprint, status_code, method, path_template, template, trace_id, now)
+    if not should_sample_error(status_code, group.occurrence_count):
+        return None
+
     return ErrorLog.objects.create(
-        actor=actor,
+        group=group,
+        actor_id=actor.id if actor else None,
         method=method,
         path=path,
         status_code=status_code,
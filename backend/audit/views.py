@@ -1,11 +1,18 @@
-﻿from django.db.models import Q
+﻿from django.db.models import Count, Q
+from django.http import HttpResponse
 from django.utils import timezone
 from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import permissions, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from accounts.permissions import is_admin
-from audit.models import AuditLog, ErrorLog
-from audit.serializers import AuditLogSerializer, ErrorLogSerializer
+from audit.models import AuditLog, ErrorGroup, ErrorLog, SqlProfile
+from audit.serializers import AuditLogSerializer, ErrorGroupSerializer, ErrorLogSerializer, SqlProfileSerializer
+from audit.services import flush_audit_logs
+from config.metrics import metrics_registry, render_prometheus
+from core.pagination import CursorPaginationMixin
 
 
 class IsAdminRole(permissions.BasePermission):
@@ -24,12 +31,16 @@ def _parse_dt(value):
     return None
 
 
-class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
+class AuditLogViewSet(CursorPaginationMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = AuditLogSerializer
     permission_classes = [IsAdminRole]
+    cursor_ordering = ('-timestamp', 'id')
     queryset = AuditLog.objects.select_related('actor').all().order_by('-timestamp')
 
     def get_queryset(self):
+        # O buffer e por processo: isto grava so os pendentes deste worker (no maximo um lote).
+        # Eventos de outros workers aparecem em ate AUDIT_BUFFER_FLUSH_INTERVAL segundos.
+        flush_audit_logs()
         qs = self.queryset
         action = self.request.query_params.get('action')
         entity_type = self.request.query_params.get('entityType')
@@ -63,11 +74,17 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
         return qs
 
 
-class ErrorLogViewSet(viewsets.ReadOnlyModelViewSet):
+class ErrorLogViewSet(CursorPaginationMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = ErrorLogSerializer
     permission_classes = [IsAdminRole]
+    cursor_ordering = ('-timestamp', 'id')
     queryset = ErrorLog.objects.select_related('actor').all().order_by('-timestamp')
 
+    def get_cursor_ordering(self):
+        if self.action == 'groups':
+            return ('-last_seen', 'id')
+        return self.cursor_ordering
+
     def get_queryset(self):
         qs = self.queryset
         status_code = self.request.query_params.get('statusCode')
@@ -75,7 +92,10 @@ class ErrorLogViewSet(viewsets.ReadOnlyModelViewSet):
         date_from = self.request.query_params.get('dateFrom')
         date_to = self.request.query_params.get('dateTo')
         q = self.request.query_params.get('q')
+        group_id = self.request.query_params.get('groupId')
 
+        if group_id:
+            qs = qs.filter(group_id=group_id) if group_id.isdigit() else qs.none()
         if status_code:
             qs = qs.filter(status_code=status_code)
         if path:
@@ -97,3 +117,74 @@ class ErrorLogViewSet(viewsets.ReadOnlyModelViewSet):
             )
 
         return qs
+
+    def get_groups_queryset(self):
+        qs = ErrorGroup.objects.annotate(sample_count=Count('occurrences')).order_by('-last_seen', 'id')
+        status_code = self.request.query_params.get('statusCode')
+        method = self.request.query_params.get('method')
+        path = self.request.query_params.get('path')
+        date_from = self.request.query_params.get('dateFrom')
+        date_to = self.request.query_params.get('dateTo')
+        q = self.request.query_params.get('q')
+
+        if status_code:
+            qs = qs.filter(status_code=status_code)
+        if method:
+            qs = qs.filter(method=method.upper())
+        if path:
+            qs = qs.filter(path_template__icontains=path)
+        if date_from:
+            parsed = _parse_dt(date_from)
+            if parsed:
+                qs = qs.filter(last_seen__gte=parsed)
+        if date_to:
+            parsed = _parse_dt(date_to)
+            if parsed:
+                qs = qs.filter(first_seen__lte=parsed)
+        if q:
+            qs = qs.filter(
+                Q(message_template__icontains=q)
+                | Q(path_template__icontains=q)
+                | Q(last_trace_id__icontains=q)
+            )
+
+        return qs
+
+    @action(detail=False, methods=['get'], url_path='groups')
+    def groups(self, request):
+        queryset = self.get_groups_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(ErrorGroupSerializer(page, many=True).data)
+        return Response(ErrorGroupSerializer(queryset, many=True).data)
+
+
+class SqlProfileViewSet(CursorPaginationMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = SqlProfileSerializer
+    permission_classes = [IsAdminRole]
+    cursor_ordering = ('-created_at', 'id')
+    queryset = SqlProfile.objects.select_related('actor').all().order_by('-created_at')
+
+    def get_queryset(self):
+        qs = self.queryset
+        path = self.request.query_params.get('path')
+        n_plus_one = self.request.query_params.get('nPlusOne')
+        trace_id = self.request.query_params.get('traceId')
+
+        if trace_id:
+            qs = qs.filter(trace_id=trace_id)
+        if path:
+            qs = qs.filter(path__icontains=path)
+        if str(n_plus_one).lower() == 'true':
+            qs = qs.filter(n_plus_one_count__gt=0)
+        return qs
+
+
+class MetricsView(APIView):
+    permission_classes = [IsAdminRole]
+
+    def perform_content_negotiation(self, request, force=False):
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request):
+        return HttpResponse(render_prometheus(metrics_registry.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
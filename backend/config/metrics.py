@@ -0,0 +1,205 @@
+import atexit
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SNAPSHOT_PREFIX = 'metrics_'
+UNMATCHED_VIEW = 'unmatched'
+
+logger = logging.getLogger(__name__)
+
+
+def _empty_series():
+    return {
+        'count': 0,
+        'statusClasses': {},
+        'latencyBuckets': [0] * len(LATENCY_BUCKETS),
+        'latencySum': 0.0,
+        'queries': 0,
+        'dbSeconds': 0.0,
+        'responseBytes': 0,
+    }
+
+
+def _merge_series(target, source):
+    target['count'] += source['count']
+    for status_class, count in source['statusClasses'].items():
+        target['statusClasses'][status_class] = target['statusClasses'].get(status_class, 0) + count
+    target['latencyBuckets'] = [left + right for left, right in zip(target['latencyBuckets'], source['latencyBuckets'])]
+    target['latencySum'] += source['latencySum']
+    target['queries'] += source['queries']
+    target['dbSeconds'] += source['dbSeconds']
+    target['responseBytes'] += source['responseBytes']
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+        self._last_write = 0.0
+        self._process = None
+
+    def observe(self, view, method, status_code, duration, queries, db_seconds, response_bytes):
+        status_class = f'{status_code // 100}xx'
+        with self._lock:
+            series = self._series.setdefault(f'{view} {method}', _empty_series())
+            series['count'] += 1
+            series['statusClasses'][status_class] = series['statusClasses'].get(status_class, 0) + 1
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    series['latencyBuckets'][index] += 1
+                    break
+            series['latencySum'] += duration
+            series['queries'] += queries
+            series['dbSeconds'] += db_seconds
+            series['responseBytes'] += response_bytes
+            now = time.monotonic()
+            due = bool(settings.METRICS_DIR) and now - self._last_write >= settings.METRICS_WRITE_INTERVAL
+            if due:
+                self._last_write = now
+        if due:
+            self.write_snapshot()
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(json.dumps(self._series))
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+
+    def _snapshot_path(self):
+        # O horario de inicio evita que um PID reutilizado sobrescreva o arquivo de outro processo;
+        # o host permite podar arquivos de processos mortos sem tocar nos de outras maquinas.
+        pid = os.getpid()
+        if self._process is None or self._process[0] != pid:
+            self._process = (pid, time.time_ns())
+        return Path(settings.METRICS_DIR) / f'{SNAPSHOT_PREFIX}{_hostname()}_{pid}_{self._process[1]}.json'
+
+    def remove_snapshot(self):
+        if not settings.METRICS_DIR or self._process is None or self._process[0] != os.getpid():
+            return
+        try:
+            self._snapshot_path().unlink(missing_ok=True)
+        except OSError:
+            logger.exception('Falha ao remover snapshot de metricas.')
+
+    def write_snapshot(self):
+        with self._lock:
+            self._last_write = time.monotonic()
+        path = self._snapshot_path()
+        temp_path = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            handle, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.stem}_', suffix='.tmp')
+            with os.fdopen(handle, 'w', encoding='utf-8') as target:
+                json.dump(self.snapshot(), target)
+            os.replace(temp_path, path)
+        except OSError:
+            logger.exception('Falha ao gravar snapshot de metricas em %s.', path)
+            if temp_path:
+                Path(temp_path).unlink(missing_ok=True)
+
+    def collect(self):
+        if not settings.METRICS_DIR:
+            return self.snapshot()
+
+        self.write_snapshot()
+        merged = {}
+        for path in sorted(Path(settings.METRICS_DIR).glob(f'{SNAPSHOT_PREFIX}*.json')):
+            if _is_dead_local_snapshot(path):
+                path.unlink(missing_ok=True)
+                continue
+            try:
+                process_series = json.loads(path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                continue
+            for key, series in process_series.items():
+                _merge_series(merged.setdefault(key, _empty_series()), series)
+        return merged
+
+
+def _hostname():
+    return socket.gethostname().replace('_', '-')
+
+
+def _pid_is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _is_dead_local_snapshot(path):
+    # Arquivo de um processo deste host que ja terminou sem passar pelo atexit (kill -9, OOM).
+    parts = path.stem[len(SNAPSHOT_PREFIX):].rsplit('_', 2)
+    if len(parts) != 3 or parts[0] != _hostname() or not parts[1].isdigit():
+        return False
+    return not _pid_is_alive(int(parts[1]))
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(view, method, **extra):
+    pairs = {'view': view, 'method': method, **extra}
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in pairs.items()) + '}'
+
+
+def render_prometheus(series_by_key):
+    lines = {
+        'requests': [
+            '# HELP http_requests_total Requisicoes atendidas por view, metodo e classe de status.',
+            '# TYPE http_requests_total counter',
+        ],
+        'latency': [
+            '# HELP http_request_duration_seconds Latencia das requisicoes.',
+            '# TYPE http_request_duration_seconds histogram',
+        ],
+        'queries': [
+            '# HELP http_request_db_queries_total Consultas SQL executadas durante as requisicoes.',
+            '# TYPE http_request_db_queries_total counter',
+        ],
+        'db': [
+            '# HELP http_request_db_seconds_total Tempo gasto no banco durante as requisicoes.',
+            '# TYPE http_request_db_seconds_total counter',
+        ],
+        'size': [
+            '# HELP http_response_size_bytes_total Bytes enviados nas respostas.',
+            '# TYPE http_response_size_bytes_total counter',
+        ],
+    }
+    for key in sorted(series_by_key):
+        series = series_by_key[key]
+        view, method = key.rsplit(' ', 1)
+        for status_class in sorted(series['statusClasses']):
+            lines['requests'].append(
+                f'http_requests_total{_labels(view, method, status_class=status_class)} {series["statusClasses"][status_class]}'
+            )
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, series['latencyBuckets']):
+            cumulative += count
+            lines['latency'].append(f'http_request_duration_seconds_bucket{_labels(view, method, le=bound)} {cumulative}')
+        lines['latency'].append(f'http_request_duration_seconds_bucket{_labels(view, method, le="+Inf")} {series["count"]}')
+        lines['latency'].append(f'http_request_duration_seconds_sum{_labels(view, method)} {series["latencySum"]:.6f}')
+        lines['latency'].append(f'http_request_duration_seconds_count{_labels(view, method)} {series["count"]}')
+        lines['queries'].append(f'http_request_db_queries_total{_labels(view, method)} {series["queries"]}')
+        lines['db'].append(f'http_request_db_seconds_total{_labels(view, method)} {series["dbSeconds"]:.6f}')
+        lines['size'].append(f'http_response_size_bytes_total{_labels(view, method)} {series["responseBytes"]}')
+    return '\n'.join(line for group in lines.values() for line in group) + '\n'
+
+
+metrics_registry = MetricsRegistry()
+atexit.register(metrics_registry.remove_snapshot)
@@ -1,9 +1,13 @@
-﻿import traceback
+﻿import time
+import traceback
 import uuid
 
+from django.db import connection
 from django.utils.deprecation import MiddlewareMixin
 
+from audit.profiling import PROFILE_HEADER, SqlProfiler, profiling_trigger, store_sql_profile
 from audit.services import create_error_log
+from config.metrics import UNMATCHED_VIEW, metrics_registry
 
 
 class TraceIdMiddleware(MiddlewareMixin):
@@ -18,6 +22,71 @@ class TraceIdMiddleware(MiddlewareMixin):
         return response
 
 
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        if response.streaming:
+            response_bytes = int(response.get('Content-Length') or 0)
+        else:
+            response_bytes = len(response.content)
+        metrics_registry.observe(
+            view=match.view_name if match and match.view_name else UNMATCHED_VIEW,
+            method=request.method,
+            status_code=response.status_code,
+            duration=duration,
+            queries=recorder.count,
+            db_seconds=recorder.seconds,
+            response_bytes=response_bytes,
+        )
+        return response
+
+
+class SqlProfilerMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trigger = profiling_trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        profiler = SqlProfiler()
+        started = time.perf_counter()
+        with connection.execute_wrapper(profiler):
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        try:
+            profile = store_sql_profile(request, response, profiler, trigger, duration)
+            response[PROFILE_HEADER] = str(profile.pk)
+        except Exception:
+            pass
+        return response
+
+
 class UnhandledExceptionLoggingMiddleware(MiddlewareMixin):
     def process_exception(self, request, exception):
         trace_id = getattr(request, 'trace_id', uuid.uuid4().hex)
@@ -36,6 +36,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'config.middleware.TraceIdMiddleware',
+    'config.middleware.RequestMetricsMiddleware',
+    'config.middleware.SqlProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -97,27 +99,31 @@ USE_I18N = True
 USE_TZ = True
 
 STATIC_URL = 'static/'
+MEDIA_ROOT = Path(os.getenv('MEDIA_ROOT', BASE_DIR / 'media'))
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'accounts.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.StatelessReadJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'EXCEPTION_HANDLER': 'config.exceptions.custom_exception_handler',
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.StandardPageNumberPagination',
     'PAGE_SIZE': 10,
 }
 
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '100'))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
+AUTH_USER_STATE_TIMEOUT = int(os.getenv('AUTH_USER_STATE_TIMEOUT', '15'))
 
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Vacina Escola API',
@@ -127,3 +133,46 @@ SPECTACULAR_SETTINGS = {
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
+
+DASHBOARD_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dashboard-cache',
+    },
+    'database': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'dashboard_cache',
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'dashboard': {
+        **DASHBOARD_CACHE_BACKENDS[os.getenv('DASHBOARD_CACHE_BACKEND', 'locmem')],
+        'TIMEOUT': int(os.getenv('DASHBOARD_CACHE_TIMEOUT', '3600')),
+    },
+}
+
+# A invalidacao ao salvar so alcanca outros workers com backend compartilhado; com locmem vale o TTL curto.
+DASHBOARD_PREFERENCE_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_PREFERENCE_CACHE_TIMEOUT', '15'))
+
+VECTORIZED_STATUS_THRESHOLD = int(os.getenv('VECTORIZED_STATUS_THRESHOLD', '2000'))
+STATUS_CACHE_TIMEOUT = int(os.getenv('STATUS_CACHE_TIMEOUT', '3600'))
+STATUS_CACHE_MAX_STUDENTS = int(os.getenv('STATUS_CACHE_MAX_STUDENTS', '5000'))
+EXPORT_JOB_REUSE_SECONDS = int(os.getenv('EXPORT_JOB_REUSE_SECONDS', '600'))
+EXPORT_JOB_STALE_SECONDS = int(os.getenv('EXPORT_JOB_STALE_SECONDS', '300'))
+EXPORT_JOB_RETENTION_HOURS = int(os.getenv('EXPORT_JOB_RETENTION_HOURS', '24'))
+AUDIT_BUFFER_MAX_SIZE = int(os.getenv('AUDIT_BUFFER_MAX_SIZE', '200'))
+AUDIT_BUFFER_MAX_RETRIES = int(os.getenv('AUDIT_BUFFER_MAX_RETRIES', '5'))
+AUDIT_BUFFER_FLUSH_INTERVAL = float(os.getenv('AUDIT_BUFFER_FLUSH_INTERVAL', '2'))
+ERROR_SAMPLE_FIRST = int(os.getenv('ERROR_SAMPLE_FIRST', '10'))
+ERROR_SAMPLE_EVERY = int(os.getenv('ERROR_SAMPLE_EVERY', '100'))
+if ERROR_SAMPLE_EVERY < 1:
+    raise ImproperlyConfigured('ERROR_SAMPLE_EVERY deve ser maior ou igual a 1.')
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_WRITE_INTERVAL = float(os.getenv('METRICS_WRITE_INTERVAL', '5'))
+SQL_PROFILE_SAMPLE_RATE = float(os.getenv('SQL_PROFILE_SAMPLE_RATE', '0'))
+SQL_PROFILE_N_PLUS_ONE_THRESHOLD = int(os.getenv('SQL_PROFILE_N_PLUS_ONE_THRESHOLD', '5'))
+SQL_PROFILE_MAX_STATEMENTS = int(os.getenv('SQL_PROFILE_MAX_STATEMENTS', '500'))
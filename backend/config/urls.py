@@ -9,12 +9,17 @@ from accounts.views import UserViewSet
 from analytics_app.views import (
     AgeDistributionDashboardView,
     DashboardAgeBucketsPreferenceView,
+    DashboardCacheStatsView,
+    DashboardSummaryView,
+    DashboardTrendsView,
     SchoolCoverageDashboardView,
     SchoolRankingDashboardView,
+    TerritoryRollupDashboardView,
 )
-from audit.views import AuditLogViewSet, ErrorLogViewSet
+from audit.views import AuditLogViewSet, ErrorLogViewSet, MetricsView, SqlProfileViewSet
 from core.views import SchoolViewSet, StudentViewSet
 from immunization.views import (
+    ExportJobViewSet,
     ExportStudentsPendingCsvView,
     ScheduleRuleDetailView,
     ScheduleRulesView,
@@ -32,8 +37,10 @@ router.register(r'vaccinations', VaccinationRecordViewSet, basename='vaccination
 router.register(r'vaccines', VaccineViewSet, basename='vaccines')
 router.register(r'schedules', VaccineScheduleVersionViewSet, basename='schedules')
 router.register(r'schedule-rules', VaccineDoseRuleViewSet, basename='schedule-rules')
+router.register(r'exports/jobs', ExportJobViewSet, basename='export-jobs')
 router.register(r'audit-logs', AuditLogViewSet, basename='audit-logs')
 router.register(r'error-logs', ErrorLogViewSet, basename='error-logs')
+router.register(r'sql-profiles', SqlProfileViewSet, basename='sql-profiles')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -44,9 +51,14 @@ urlpatterns = [
     path('api/', include(router.urls)),
     path('api/schedules/<int:schedule_id>/rules/', ScheduleRulesView.as_view(), name='schedule-rules-list'),
     path('api/schedules/<int:schedule_id>/rules/<int:rule_id>/', ScheduleRuleDetailView.as_view(), name='schedule-rules-detail'),
+    path('api/dashboards/cache-stats/', DashboardCacheStatsView.as_view(), name='dashboard-cache-stats'),
+    path('api/dashboards/summary/', DashboardSummaryView.as_view(), name='dashboard-summary'),
     path('api/dashboards/schools/coverage/', SchoolCoverageDashboardView.as_view(), name='dashboard-school-coverage'),
     path('api/dashboards/schools/ranking/', SchoolRankingDashboardView.as_view(), name='dashboard-school-ranking'),
     path('api/dashboards/age-distribution/', AgeDistributionDashboardView.as_view(), name='dashboard-age-distribution'),
+    path('api/dashboards/trends/', DashboardTrendsView.as_view(), name='dashboard-trends'),
+    path('api/dashboards/territories/', TerritoryRollupDashboardView.as_view(), name='dashboard-territories'),
     path('api/dashboards/preferences/age-buckets/', DashboardAgeBucketsPreferenceView.as_view(), name='dashboard-age-buckets-preferences'),
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
     path('api/exports/students-pending.csv', ExportStudentsPendingCsvView.as_view(), name='export-students-pending'),
 ]
@@ -1,7 +1,25 @@
 import pytest
+from django.core.cache import caches
 from rest_framework.test import APIClient
 
+from audit.buffer import audit_buffer
+
 
 @pytest.fixture
 def api_client():
     return APIClient()
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    yield
+    for cache in caches.all():
+        cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def audit_buffer_without_thread():
+    audit_buffer.background_enabled = False
+    yield
+    audit_buffer.stop()
+    audit_buffer.clear()
@@ -1,6 +1,8 @@
 from django.contrib import admin
+from django.db import transaction
 
-from core.models import School, Student
+from core.models import School, SchoolDataVersion, Student
+from immunization.status_store import refresh_student_statuses
 
 
 @admin.register(School)
@@ -8,9 +10,27 @@ class SchoolAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'inep_code', 'territory_ref')
     search_fields = ('name', 'inep_code')
 
+    def delete_queryset(self, request, queryset):
+        school_ids = set(queryset.values_list('id', flat=True))
+        with transaction.atomic():
+            super().delete_queryset(request, queryset)
+            SchoolDataVersion.bump(school_ids)
+
 
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
     list_display = ('id', 'full_name', 'school', 'birth_date', 'sex')
     list_filter = ('school', 'sex')
     search_fields = ('full_name',)
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            if not change or 'birth_date' in form.changed_data:
+                refresh_student_statuses([obj.id])
+
+    def delete_queryset(self, request, queryset):
+        school_ids = set(queryset.values_list('school_id', flat=True))
+        with transaction.atomic():
+            super().delete_queryset(request, queryset)
+            SchoolDataVersion.bump(school_ids)
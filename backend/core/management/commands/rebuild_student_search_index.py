@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Student
+from core.search import index_student_names, normalize_name
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o nome normalizado e o indice de trigramas da busca de estudantes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Quantidade de estudantes por lote.')
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        processed = 0
+        last_id = 0
+        while True:
+            students = list(Student.objects.filter(id__gt=last_id).order_by('id').only('id', 'full_name')[:chunk_size])
+            if not students:
+                break
+            last_id = students[-1].id
+            for student in students:
+                student.normalized_name = normalize_name(student.full_name)
+            with transaction.atomic():
+                Student.objects.bulk_update(students, ['normalized_name'])
+                index_student_names(students)
+            processed += len(students)
+            self.stdout.write(f'{processed} estudantes indexados')
+
+        self.stdout.write(self.style.SUCCESS(f'Indice de busca recalculado para {processed} estudantes.'))
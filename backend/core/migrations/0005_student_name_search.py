@@ -0,0 +1,101 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:40
+
+import unicodedata
+
+import django.db.models.deletion
+from django.db import DatabaseError, migrations, models, transaction
+
+CHUNK_SIZE = 2000
+TRIGRAM_SIZE = 3
+
+
+# Copias congeladas de core.search: a migracao nao pode depender do codigo atual da aplicacao.
+def normalize_name(value):
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+def name_trigrams(normalized):
+    trigrams = set()
+    for word in normalized.split():
+        padded = f'  {word} '
+        trigrams.update(padded[index:index + TRIGRAM_SIZE] for index in range(len(padded) - TRIGRAM_SIZE + 1))
+    return trigrams
+
+
+def enable_pg_trgm(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            schema_editor.execute(
+                'CREATE INDEX IF NOT EXISTS student_normalized_name_trgm_idx '
+                'ON core_student USING gin (normalized_name gin_trgm_ops)'
+            )
+    except DatabaseError:
+        pass
+
+
+def disable_pg_trgm(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS student_normalized_name_trgm_idx')
+
+
+def populate_search_index(apps, schema_editor):
+    Student = apps.get_model('core', 'Student')
+    StudentNameTrigram = apps.get_model('core', 'StudentNameTrigram')
+    connection = schema_editor.connection
+    with_side_table = connection.vendor != 'postgresql'
+    if not with_side_table:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            with_side_table = cursor.fetchone() is None
+
+    last_id = 0
+    while True:
+        students = list(Student.objects.filter(id__gt=last_id).order_by('id').only('id', 'full_name')[:CHUNK_SIZE])
+        if not students:
+            break
+        last_id = students[-1].id
+        for student in students:
+            student.normalized_name = normalize_name(student.full_name)
+        Student.objects.bulk_update(students, ['normalized_name'])
+        if with_side_table:
+            StudentNameTrigram.objects.bulk_create(
+                [
+                    StudentNameTrigram(student_id=student.id, trigram=trigram)
+                    for student in students
+                    for trigram in sorted(name_trigrams(student.normalized_name))
+                ]
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='normalized_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.CreateModel(
+            name='StudentNameTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='name_trigrams', to='core.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['trigram', 'student'], name='student_trigram_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'trigram'), name='unique_student_trigram')],
+            },
+        ),
+        migrations.RunPython(enable_pg_trgm, disable_pg_trgm),
+        migrations.RunPython(populate_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_student_name_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchoolDataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('school_id', models.PositiveIntegerField(unique=True)),
+                ('counter', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -1,5 +1,10 @@
+import uuid
+
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Sum
+
+from core.search import index_student_names, normalize_name
 
 
 class AuditStampedModel(models.Model):
@@ -24,12 +29,76 @@ class AuditStampedModel(models.Model):
         abstract = True
 
 
+class CacheVersion(models.Model):
+    SCHEDULE = 'schedule'
+
+    name = models.CharField(max_length=50, unique=True)
+    token = models.CharField(max_length=32)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def current(cls, name):
+        return cls.objects.filter(name=name).values_list('token', flat=True).first() or ''
+
+    @classmethod
+    def bump(cls, name):
+        token = uuid.uuid4().hex
+        cls.objects.update_or_create(name=name, defaults={'token': token})
+        return token
+
+    def __str__(self):
+        return f'{self.name} @ {self.token}'
+
+
+class SchoolDataVersion(models.Model):
+    # Sem FK para a escola: o contador precisa sobreviver a exclusao para nunca voltar atras.
+    school_id = models.PositiveIntegerField(unique=True)
+    counter = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def current(cls, school_id=None):
+        if school_id:
+            return str(cls.objects.filter(school_id=school_id).values_list('counter', flat=True).first() or 0)
+        return str(cls.objects.aggregate(total=Sum('counter'))['total'] or 0)
+
+    @classmethod
+    def for_schools(cls, school_ids):
+        # Versao restrita as escolas envolvidas: uma busca indexada em vez da soma global.
+        school_ids = sorted({school_id for school_id in school_ids if school_id})
+        counters = dict(cls.objects.filter(school_id__in=school_ids).values_list('school_id', 'counter'))
+        return ','.join(f'{school_id}.{counters.get(school_id, 0)}' for school_id in school_ids)
+
+    @classmethod
+    def bump(cls, school_ids):
+        for school_id in sorted({school_id for school_id in school_ids if school_id}):
+            if cls.objects.filter(school_id=school_id).update(counter=F('counter') + 1):
+                continue
+            try:
+                with transaction.atomic():
+                    cls.objects.create(school_id=school_id, counter=1)
+            except IntegrityError:
+                cls.objects.filter(school_id=school_id).update(counter=F('counter') + 1)
+
+    def __str__(self):
+        return f'escola {self.school_id} @ {self.counter}'
+
+
 class School(AuditStampedModel):
     name = models.CharField(max_length=255)
     inep_code = models.CharField(max_length=20, blank=True)
     address = models.CharField(max_length=255, blank=True)
     territory_ref = models.CharField(max_length=100, blank=True)
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        SchoolDataVersion.bump([self.pk])
+
+    def delete(self, *args, **kwargs):
+        school_id = self.pk
+        result = super().delete(*args, **kwargs)
+        SchoolDataVersion.bump([school_id])
+        return result
+
     def __str__(self):
         return self.name
 
@@ -42,6 +111,7 @@ class Student(AuditStampedModel):
 
     school = models.ForeignKey(School, on_delete=models.CASCADE, related_name='students')
     full_name = models.CharField(max_length=255)
+    normalized_name = models.CharField(max_length=255, editable=False, db_index=True, default='')
     birth_date = models.DateField()
     sex = models.CharField(max_length=2, choices=SexChoices.choices, default=SexChoices.NOT_INFORMED)
     guardian_name = models.CharField(max_length=255, blank=True)
@@ -49,6 +119,53 @@ class Student(AuditStampedModel):
 
     class Meta:
         ordering = ['full_name']
+        indexes = [
+            models.Index(fields=['full_name', 'id'], name='student_name_id_idx'),
+            models.Index(fields=['school', 'full_name', 'id'], name='student_school_name_id_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._indexed_name = instance.__dict__.get('normalized_name')
+        instance._loaded_school_id = instance.__dict__.get('school_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_name(self.full_name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'full_name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'normalized_name'}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if getattr(self, '_indexed_name', None) != self.normalized_name:
+                index_student_names([self])
+                self._indexed_name = self.normalized_name
+        SchoolDataVersion.bump([self.school_id, getattr(self, '_loaded_school_id', None)])
+        self._loaded_school_id = self.school_id
+
+    def delete(self, *args, **kwargs):
+        school_id = self.school_id
+        result = super().delete(*args, **kwargs)
+        SchoolDataVersion.bump([school_id])
+        return result
 
     def __str__(self):
         return self.full_name
+
+
+class StudentNameTrigram(models.Model):
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='name_trigrams')
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['student', 'trigram'], name='unique_student_trigram')]
+        indexes = [models.Index(fields=['trigram', 'student'], name='student_trigram_idx')]
+
+    def __str__(self):
+        return f'{self.student_id}:{self.trigram}'
+
+
+def bump_student_school_versions(student_ids):
+    school_ids = Student.objects.filter(pk__in=[pk for pk in student_ids if pk]).values_list('school_id', flat=True)
+    SchoolDataVersion.bump(list(school_ids))
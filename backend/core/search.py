@@ -0,0 +1,100 @@
+import unicodedata
+
+from django.db import connection
+from django.db.models import Case, Count, IntegerField, Value, When
+from django.db.models.functions import Length
+
+TRIGRAM_SIZE = 3
+SEARCH_RESULT_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
+
+_pg_trgm_available = None
+
+
+def normalize_name(value):
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+def name_trigrams(normalized):
+    trigrams = set()
+    for word in normalized.split():
+        padded = f'  {word} '
+        trigrams.update(padded[index:index + TRIGRAM_SIZE] for index in range(len(padded) - TRIGRAM_SIZE + 1))
+    return trigrams
+
+
+def query_trigrams(normalized):
+    trigrams = set()
+    for word in normalized.split():
+        trigrams.update(word[index:index + TRIGRAM_SIZE] for index in range(len(word) - TRIGRAM_SIZE + 1))
+    return trigrams
+
+
+def uses_pg_trgm():
+    global _pg_trgm_available
+    if connection.vendor != 'postgresql':
+        return False
+    if _pg_trgm_available is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _pg_trgm_available = cursor.fetchone() is not None
+    return _pg_trgm_available
+
+
+def index_student_names(students):
+    from core.models import StudentNameTrigram
+
+    students = list(students)
+    StudentNameTrigram.objects.filter(student_id__in=[student.id for student in students]).delete()
+    if uses_pg_trgm():
+        return
+    StudentNameTrigram.objects.bulk_create(
+        [
+            StudentNameTrigram(student_id=student.id, trigram=trigram)
+            for student in students
+            for trigram in sorted(name_trigrams(student.normalized_name))
+        ]
+    )
+
+
+def filter_by_name(queryset, q):
+    from core.models import StudentNameTrigram
+
+    normalized = normalize_name(q)
+    if not normalized:
+        return queryset
+
+    trigrams = query_trigrams(normalized)
+    if trigrams and not uses_pg_trgm():
+        candidates = (
+            StudentNameTrigram.objects.filter(trigram__in=trigrams)
+            .values('student_id')
+            .annotate(matched=Count('trigram', distinct=True))
+            .filter(matched=len(trigrams))
+            .values('student_id')
+        )
+        queryset = queryset.filter(id__in=candidates)
+    return queryset.filter(normalized_name__contains=normalized)
+
+
+def search_students(queryset, q, limit=SEARCH_RESULT_LIMIT):
+    normalized = normalize_name(q)
+    if not normalized:
+        return queryset.none()
+
+    ranked = filter_by_name(queryset, q).annotate(
+        match_rank=Case(
+            When(normalized_name__startswith=normalized, then=Value(0)),
+            When(normalized_name__contains=f' {normalized}', then=Value(1)),
+            default=Value(2),
+            output_field=IntegerField(),
+        )
+    )
+    if uses_pg_trgm():
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        ranked = ranked.annotate(similarity=TrigramSimilarity('normalized_name', normalized))
+        return ranked.order_by('match_rank', '-similarity', 'full_name', 'id')[:limit]
+    return ranked.order_by('match_rank', Length('normalized_name'), 'full_name', 'id')[:limit]
@@ -58,10 +58,18 @@ class StudentSerializer(serializers.ModelSerializer):
         return attrs
 
     def get_age_months(self, obj):
-        return age_in_months_from_birth_date(obj.birth_date)
+        return age_in_months_from_birth_date(obj.birth_date, self.context.get('as_of'))
 
     def get_current_status(self, obj):
         status_cache = self.context.get('status_cache')
         if status_cache and obj.id in status_cache:
-            return status_cache[obj.id]['status']
+            return status_cache[obj.id]
         return build_student_immunization_status(obj)['status']
+
+
+class StudentSearchSerializer(serializers.ModelSerializer):
+    school_name = serializers.CharField(source='school.name', read_only=True)
+
+    class Meta:
+        model = Student
+        fields = ['id', 'school', 'school_name', 'full_name', 'birth_date']
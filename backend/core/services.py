@@ -1,18 +1,62 @@
+import calendar
+import datetime
+
 from django.db.models import QuerySet
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
 
 from accounts.permissions import is_admin, is_health_user, is_school_user
-from core.models import Student
+from core.models import SchoolDataVersion, Student
+from core.search import filter_by_name
 
 
-def age_in_months_from_birth_date(birth_date):
-    today = timezone.localdate()
+def age_in_months_from_birth_date(birth_date, as_of=None):
+    today = as_of or timezone.localdate()
     months = (today.year - birth_date.year) * 12 + (today.month - birth_date.month)
     if today.day < birth_date.day:
         months -= 1
     return max(months, 0)
 
 
+def latest_birth_date_for_age(age_months, as_of):
+    year, month_index = divmod(as_of.year * 12 + as_of.month - 1 - age_months, 12)
+    month = month_index + 1
+    return datetime.date(year, month, min(as_of.day, calendar.monthrange(year, month)[1]))
+
+
+def filter_students_queryset(queryset: QuerySet, *, q=None, school_id=None, sex=None, age_min=None, age_max=None, as_of=None) -> QuerySet:
+    as_of = as_of or timezone.localdate()
+    if q:
+        queryset = filter_by_name(queryset, q)
+    if school_id:
+        if not str(school_id).isdigit():
+            return queryset.none()
+        queryset = queryset.filter(school_id=school_id)
+    if sex:
+        queryset = queryset.filter(sex=sex)
+    if age_min is not None and age_min > 0:
+        queryset = queryset.filter(birth_date__lte=latest_birth_date_for_age(age_min, as_of))
+    if age_max is not None:
+        if age_max < 0:
+            return queryset.none()
+        queryset = queryset.filter(birth_date__gt=latest_birth_date_for_age(age_max + 1, as_of))
+    return queryset
+
+
+def parse_as_of(query_params):
+    raw_value = query_params.get('asOf')
+    if raw_value in (None, ''):
+        return timezone.localdate()
+    try:
+        parsed = parse_date(raw_value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({'asOf': 'Data invalida. Use o formato AAAA-MM-DD.'})
+    return parsed
+
+
 def scope_students_for_user(user, queryset: QuerySet | None = None) -> QuerySet:
     qs = queryset if queryset is not None else Student.objects.all()
     if is_admin(user) or is_health_user(user):
@@ -20,3 +64,10 @@ def scope_students_for_user(user, queryset: QuerySet | None = None) -> QuerySet:
     if is_school_user(user):
         return qs.filter(school_id=user.school_id)
     return qs.none()
+
+
+def data_version_for_user(user):
+    # Usuario de escola so enxerga a propria escola: escritas em outras escolas nao invalidam seu cache.
+    if is_school_user(user):
+        return SchoolDataVersion.current(user.school_id)
+    return SchoolDataVersion.current()
@@ -1,4 +1,6 @@
-﻿from rest_framework import status, viewsets
+﻿from django.db import transaction
+from django.utils import timezone
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
@@ -6,11 +8,18 @@ from rest_framework.response import Response
 from accounts.permissions import is_school_user
 from audit.services import create_audit_log
 from core.models import School, Student
+from core.pagination import CursorPaginationMixin
 from core.permissions import SchoolPermission, StudentPermission
-from core.serializers import SchoolSerializer, StudentSerializer
-from core.services import age_in_months_from_birth_date, scope_students_for_user
+from core.search import SEARCH_MAX_LIMIT, SEARCH_RESULT_LIMIT, search_students
+from core.serializers import SchoolSerializer, StudentSearchSerializer, StudentSerializer
+from core.services import filter_students_queryset, parse_as_of, scope_students_for_user
 from immunization.serializers import VaccinationRecordSerializer
 from immunization.services import build_student_immunization_status
+from immunization.status_store import (
+    filter_students_by_status,
+    get_materialized_statuses,
+    refresh_student_statuses,
+)
 
 
 class SchoolViewSet(viewsets.ModelViewSet):
@@ -27,15 +36,16 @@ class SchoolViewSet(viewsets.ModelViewSet):
         create_audit_log(self.request.user, 'school_updated', 'School', instance.id, {'name': instance.name})
 
 
-class StudentViewSet(viewsets.ModelViewSet):
+class StudentViewSet(CursorPaginationMixin, viewsets.ModelViewSet):
     queryset = Student.objects.select_related('school').all()
     serializer_class = StudentSerializer
     permission_classes = [StudentPermission]
+    cursor_ordering = ('full_name', 'id')
 
     def get_queryset(self):
         return scope_students_for_user(self.request.user, self.queryset)
 
-    def _apply_filters(self, students):
+    def _apply_filters(self, queryset):
         q = self.request.query_params.get('q')
         school_id = self.request.query_params.get('schoolId')
         status_filter = self.request.query_params.get('status')
@@ -44,67 +54,67 @@ class StudentViewSet(viewsets.ModelViewSet):
         sex_filter = self.request.query_params.get('sex')
         vaccine_id = self.request.query_params.get('vaccineId')
 
-        if q:
-            students = [student for student in students if q.lower() in student.full_name.lower()]
-
-        if school_id:
-            if is_school_user(self.request.user) and str(self.request.user.school_id) != str(school_id):
-                return [], {}
-            students = [student for student in students if str(student.school_id) == str(school_id)]
+        if school_id and is_school_user(self.request.user) and str(self.request.user.school_id) != str(school_id):
+            return queryset.none(), None, None
 
         try:
-            age_min_value = int(age_min) if age_min is not None else None
-            age_max_value = int(age_max) if age_max is not None else None
+            age_min_value = int(age_min) if age_min not in (None, '') else None
+            age_max_value = int(age_max) if age_max not in (None, '') else None
             vaccine_id_value = int(vaccine_id) if vaccine_id not in (None, '') else None
         except (TypeError, ValueError):
             raise ValidationError({'detail': 'ageMin, ageMax e vaccineId devem ser valores numericos validos.'})
 
-        status_cache = {}
-        filtered_students = []
-
-        for student in students:
-            age_months = age_in_months_from_birth_date(student.birth_date)
-            if age_min_value is not None and age_months < age_min_value:
-                continue
-            if age_max_value is not None and age_months > age_max_value:
-                continue
-            if sex_filter and student.sex != sex_filter:
-                continue
-
-            status_data = build_student_immunization_status(
-                student,
-                vaccine_ids={vaccine_id_value} if vaccine_id_value else None,
-            )
-            status_cache[student.id] = status_data
-            if status_filter and status_data['status'] != status_filter:
-                continue
-            filtered_students.append(student)
-
-        return filtered_students, status_cache
+        as_of = timezone.localdate()
+        queryset = filter_students_queryset(
+            queryset,
+            q=q,
+            school_id=school_id,
+            sex=sex_filter,
+            age_min=age_min_value,
+            age_max=age_max_value,
+            as_of=as_of,
+        )
+        if status_filter:
+            queryset = filter_students_by_status(queryset, status_filter, vaccine_id_value, as_of=as_of)
+        return queryset.order_by('full_name', 'id'), vaccine_id_value, as_of
+
+    def _page_context(self, students, vaccine_id, as_of):
+        student_ids = [student.id for student in students]
+        return {
+            'request': self.request,
+            'status_cache': get_materialized_statuses(student_ids, vaccine_id, as_of=as_of),
+            'as_of': as_of,
+        }
 
     def list(self, request, *args, **kwargs):
-        students = list(self.get_queryset())
-        filtered_students, status_cache = self._apply_filters(students)
-        page = self.paginate_queryset(filtered_students)
+        queryset, vaccine_id, as_of = self._apply_filters(self.get_queryset())
+        page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.get_serializer(page, many=True, context={'request': request, 'status_cache': status_cache})
+            serializer = self.get_serializer(page, many=True, context=self._page_context(page, vaccine_id, as_of))
             return self.get_paginated_response(serializer.data)
 
-        serializer = self.get_serializer(filtered_students, many=True, context={'request': request, 'status_cache': status_cache})
+        students = list(queryset)
+        serializer = self.get_serializer(students, many=True, context=self._page_context(students, vaccine_id, as_of))
         return Response(serializer.data)
 
     def perform_create(self, serializer):
         school = serializer.validated_data.get('school')
         if is_school_user(self.request.user) and school.id != self.request.user.school_id:
             raise PermissionDenied('Usuario de escola so pode criar estudante na propria escola.')
-        instance = serializer.save(created_by=self.request.user, updated_by=self.request.user)
+        with transaction.atomic():
+            instance = serializer.save(created_by=self.request.user, updated_by=self.request.user)
+            refresh_student_statuses([instance.id])
         create_audit_log(self.request.user, 'student_created', 'Student', instance.id, {'full_name': instance.full_name})
 
     def perform_update(self, serializer):
         instance = serializer.instance
         if is_school_user(self.request.user) and instance.school_id != self.request.user.school_id:
             raise PermissionDenied('Usuario de escola so pode editar estudante da propria escola.')
-        updated = serializer.save(updated_by=self.request.user)
+        previous_birth_date = instance.birth_date
+        with transaction.atomic():
+            updated = serializer.save(updated_by=self.request.user)
+            if updated.birth_date != previous_birth_date:
+                refresh_student_statuses([updated.id])
         create_audit_log(self.request.user, 'student_updated', 'Student', updated.id, {'full_name': updated.full_name})
 
     def perform_destroy(self, instance):
@@ -113,10 +123,21 @@ class StudentViewSet(viewsets.ModelViewSet):
         create_audit_log(self.request.user, 'student_deleted', 'Student', instance.id, {'full_name': instance.full_name})
         instance.delete()
 
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        try:
+            limit = int(request.query_params.get('limit') or SEARCH_RESULT_LIMIT)
+        except (TypeError, ValueError):
+            raise ValidationError({'limit': 'Informe um numero inteiro.'})
+        limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+
+        students = search_students(self.get_queryset(), request.query_params.get('q', ''), limit=limit)
+        return Response({'results': StudentSearchSerializer(students, many=True).data})
+
     @action(detail=True, methods=['get'], url_path='immunization-status')
     def immunization_status(self, request, pk=None):
         student = self.get_object()
-        data = build_student_immunization_status(student)
+        data = build_student_immunization_status(student, as_of=parse_as_of(request.query_params))
         return Response(data)
 
     @action(detail=True, methods=['get', 'post'], url_path='vaccinations')
@@ -134,7 +155,9 @@ class StudentViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         if is_school_user(request.user) and student.school_id != request.user.school_id:
             return Response({'detail': 'Acesso negado para outra escola.'}, status=status.HTTP_403_FORBIDDEN)
-        record = serializer.save(student=student, created_by=request.user, updated_by=request.user)
+        with transaction.atomic():
+            record = serializer.save(student=student, created_by=request.user, updated_by=request.user)
+            refresh_student_statuses([student.id])
         create_audit_log(
             request.user,
             'vaccination_record_created',
@@ -1,6 +1,16 @@
 from django.contrib import admin
+from django.db import transaction
 
-from immunization.models import Vaccine, VaccineDoseRule, VaccineScheduleVersion, VaccinationRecord
+from core.models import CacheVersion, bump_student_school_versions
+from immunization.models import (
+    ExportJob,
+    StudentImmunizationStatus,
+    Vaccine,
+    VaccineDoseRule,
+    VaccineScheduleVersion,
+    VaccinationRecord,
+)
+from immunization.status_store import refresh_student_statuses
 
 
 @admin.register(Vaccine)
@@ -8,6 +18,11 @@ class VaccineAdmin(admin.ModelAdmin):
     list_display = ('id', 'code', 'name')
     search_fields = ('code', 'name')
 
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            super().delete_queryset(request, queryset)
+            CacheVersion.bump(CacheVersion.SCHEDULE)
+
 
 @admin.register(VaccineScheduleVersion)
 class VaccineScheduleVersionAdmin(admin.ModelAdmin):
@@ -15,6 +30,11 @@ class VaccineScheduleVersionAdmin(admin.ModelAdmin):
     list_filter = ('is_active',)
     search_fields = ('code', 'name')
 
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            super().delete_queryset(request, queryset)
+            CacheVersion.bump(CacheVersion.SCHEDULE)
+
 
 @admin.register(VaccineDoseRule)
 class VaccineDoseRuleAdmin(admin.ModelAdmin):
@@ -28,9 +48,45 @@ class VaccineDoseRuleAdmin(admin.ModelAdmin):
     )
     list_filter = ('schedule_version', 'vaccine')
 
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            super().delete_queryset(request, queryset)
+            CacheVersion.bump(CacheVersion.SCHEDULE)
+
 
 @admin.register(VaccinationRecord)
 class VaccinationRecordAdmin(admin.ModelAdmin):
     list_display = ('id', 'student', 'vaccine', 'dose_number', 'application_date', 'source')
     list_filter = ('source', 'vaccine')
     search_fields = ('student__full_name',)
+
+    def save_model(self, request, obj, form, change):
+        student_ids = {form.initial['student']} if change and form.initial.get('student') else set()
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            refresh_student_statuses(student_ids | {obj.student_id})
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            refresh_student_statuses([obj.student_id])
+
+    def delete_queryset(self, request, queryset):
+        student_ids = set(queryset.values_list('student_id', flat=True))
+        with transaction.atomic():
+            super().delete_queryset(request, queryset)
+            bump_student_school_versions(student_ids)
+            refresh_student_statuses(student_ids)
+
+
+@admin.register(StudentImmunizationStatus)
+class StudentImmunizationStatusAdmin(admin.ModelAdmin):
+    list_display = ('student', 'status', 'pending_count', 'overdue_count', 'computed_for')
+    list_filter = ('status', 'computed_for')
+    search_fields = ('student__full_name',)
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'scope_role', 'scope_school', 'progress_percent', 'rows_written', 'created_at')
+    list_filter = ('status',)
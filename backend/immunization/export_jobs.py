@@ -0,0 +1,187 @@
+import csv
+import datetime
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from accounts.models import User
+from core.services import data_version_for_user
+from immunization.exports import EXPORT_CHUNK_SIZE, EXPORT_COLUMNS, export_students_queryset, iter_pending_export_rows
+from immunization.models import ExportJob
+from immunization.schedule import get_schedule_generation
+
+EXPORT_JOB_DIR = 'exports'
+
+
+def export_filters_hash(user, filters, as_of):
+    payload = json.dumps(
+        {
+            'scope': [user.role, user.school_id],
+            'filters': filters,
+            'asOf': as_of.isoformat(),
+            'schedule': get_schedule_generation(),
+            'data': data_version_for_user(user),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def request_export_job(user, filters, as_of=None):
+    as_of = as_of or timezone.localdate()
+    filters_hash = export_filters_hash(user, filters, as_of)
+    now = timezone.now()
+    window_start = now - datetime.timedelta(seconds=settings.EXPORT_JOB_REUSE_SECONDS)
+    # Job em processamento sem heartbeat recente pertence a um worker que morreu: nao reutilizar.
+    stale_cutoff = now - datetime.timedelta(seconds=settings.EXPORT_JOB_STALE_SECONDS)
+    existing = (
+        ExportJob.objects.filter(filters_hash=filters_hash, created_at__gte=window_start)
+        .exclude(status=ExportJob.StatusChoices.ERRO)
+        .exclude(
+            Q(status=ExportJob.StatusChoices.PROCESSANDO)
+            & (Q(heartbeat_at__isnull=True) | Q(heartbeat_at__lt=stale_cutoff))
+        )
+        .order_by('-created_at')
+        .first()
+    )
+    if existing:
+        return existing, False
+
+    job = ExportJob.objects.create(
+        requested_by=user,
+        scope_role=user.role,
+        scope_school_id=user.school_id,
+        filters_json=filters,
+        filters_hash=filters_hash,
+        as_of=as_of,
+    )
+    return job, True
+
+
+def claim_next_job():
+    pending = ExportJob.objects.filter(status=ExportJob.StatusChoices.PENDENTE).order_by('created_at')
+    for job_id in pending.values_list('id', flat=True)[:10]:
+        now = timezone.now()
+        claimed = ExportJob.objects.filter(pk=job_id, status=ExportJob.StatusChoices.PENDENTE).update(
+            status=ExportJob.StatusChoices.PROCESSANDO,
+            started_at=now,
+            heartbeat_at=now,
+        )
+        if claimed:
+            return ExportJob.objects.get(pk=job_id)
+    return None
+
+
+def recover_stale_jobs():
+    # Job em PROCESSANDO sem heartbeat recente ficou orfao (worker morto): marca como erro para que
+    # um novo pedido crie outro job. Nao recoloca na fila para nao repetir um job que derruba o worker.
+    stale_cutoff = timezone.now() - datetime.timedelta(seconds=settings.EXPORT_JOB_STALE_SECONDS)
+    stale = ExportJob.objects.filter(status=ExportJob.StatusChoices.PROCESSANDO).filter(
+        Q(heartbeat_at__isnull=True) | Q(heartbeat_at__lt=stale_cutoff)
+    )
+    stale_ids = list(stale.values_list('id', flat=True))
+    for job_id in stale_ids:
+        _job_temp_path(job_id).unlink(missing_ok=True)
+    return stale.filter(id__in=stale_ids).update(
+        status=ExportJob.StatusChoices.ERRO,
+        error_message='Exportacao interrompida: o worker parou de responder.',
+        finished_at=timezone.now(),
+    )
+
+
+def purge_expired_exports():
+    cutoff = timezone.now() - datetime.timedelta(hours=settings.EXPORT_JOB_RETENTION_HOURS)
+    expired = ExportJob.objects.filter(
+        status__in=[ExportJob.StatusChoices.CONCLUIDO, ExportJob.StatusChoices.ERRO],
+        finished_at__lt=cutoff,
+    )
+    for job in expired.only('id', 'file_path'):
+        if job.file_path:
+            export_job_path(job).unlink(missing_ok=True)
+    deleted, _ = expired.delete()
+
+    # Arquivos sem job (temporarios de workers interrompidos, jobs apagados pelo admin).
+    export_dir = Path(settings.MEDIA_ROOT) / EXPORT_JOB_DIR
+    if export_dir.is_dir():
+        known = set(ExportJob.objects.exclude(file_path='').values_list('file_path', flat=True))
+        cutoff_ts = cutoff.timestamp()
+        for path in export_dir.iterdir():
+            if not path.is_file() or f'{EXPORT_JOB_DIR}/{path.name}' in known:
+                continue
+            try:
+                if path.stat().st_mtime < cutoff_ts:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+    return deleted
+
+
+def _job_relative_path(job_id):
+    return f'{EXPORT_JOB_DIR}/students_pending_{job_id}.csv.gz'
+
+
+def _job_temp_path(job_id):
+    final_path = Path(settings.MEDIA_ROOT) / _job_relative_path(job_id)
+    return final_path.with_name(final_path.name + '.tmp')
+
+
+def export_job_path(job):
+    return Path(settings.MEDIA_ROOT) / job.file_path
+
+
+def run_export_job(job, chunk_size=EXPORT_CHUNK_SIZE):
+    relative_path = _job_relative_path(job.pk)
+    final_path = Path(settings.MEDIA_ROOT) / relative_path
+    temp_path = _job_temp_path(job.pk)
+    progress = {'students': 0, 'rows': 0, 'total': 0}
+
+    def report(batch_size):
+        progress['students'] += batch_size
+        total = progress['total']
+        ExportJob.objects.filter(pk=job.pk).update(
+            processed_students=progress['students'],
+            rows_written=progress['rows'],
+            progress_percent=min(99, progress['students'] * 100 // total) if total else 0,
+            heartbeat_at=timezone.now(),
+        )
+
+    try:
+        scope_user = User(role=job.scope_role, school_id=job.scope_school_id)
+        students = export_students_queryset(scope_user, job.filters_json, job.as_of)
+        progress['total'] = students.count()
+        ExportJob.objects.filter(pk=job.pk).update(total_students=progress['total'], heartbeat_at=timezone.now())
+
+        final_path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(temp_path, 'wt', encoding='utf-8', newline='') as handle:
+            writer = csv.writer(handle, delimiter=';')
+            writer.writerow(EXPORT_COLUMNS)
+            for row in iter_pending_export_rows(students, job.filters_json, as_of=job.as_of, chunk_size=chunk_size, on_batch=report):
+                writer.writerow(row)
+                progress['rows'] += 1
+        os.replace(temp_path, final_path)
+    except Exception as exc:
+        temp_path.unlink(missing_ok=True)
+        ExportJob.objects.filter(pk=job.pk).update(
+            status=ExportJob.StatusChoices.ERRO,
+            error_message=str(exc),
+            finished_at=timezone.now(),
+        )
+        raise
+
+    ExportJob.objects.filter(pk=job.pk).update(
+        status=ExportJob.StatusChoices.CONCLUIDO,
+        processed_students=progress['students'],
+        rows_written=progress['rows'],
+        progress_percent=100,
+        file_path=relative_path,
+        file_size=final_path.stat().st_size,
+        finished_at=timezone.now(),
+    )
+    job.refresh_from_db()
+    return job
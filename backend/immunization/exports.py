@@ -0,0 +1,173 @@
+import csv
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.utils import timezone
+from rest_framework.serializers import ValidationError
+
+from core.models import Student
+from core.services import filter_students_queryset, scope_students_for_user
+from immunization.schedule import get_active_compiled_schedule
+from immunization.services import build_statuses_for_students
+from immunization.status_store import filter_students_by_status
+
+EXPORT_CHUNK_SIZE = 1000
+CSV_ROWS_PER_WRITE = 500
+PARQUET_ROW_GROUP_SIZE = 50000
+EXPORT_COLUMNS = [
+    'student_id',
+    'student_name',
+    'school',
+    'status',
+    'age_months',
+    'vaccine_code',
+    'vaccine_name',
+    'dose_number',
+    'pending_status',
+]
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def parse_export_filters(query_params):
+    age_min = query_params.get('ageMin')
+    age_max = query_params.get('ageMax')
+    vaccine_id = query_params.get('vaccineId')
+    try:
+        age_min_value = int(age_min) if age_min not in (None, '') else None
+        age_max_value = int(age_max) if age_max not in (None, '') else None
+        vaccine_id_value = int(vaccine_id) if vaccine_id not in (None, '') else None
+    except (TypeError, ValueError):
+        raise ValidationError({'detail': 'ageMin, ageMax e vaccineId devem ser valores numéricos válidos.'})
+
+    return {
+        'q': query_params.get('q') or None,
+        'schoolId': query_params.get('schoolId') or None,
+        'status': query_params.get('status') or None,
+        'ageMin': age_min_value,
+        'ageMax': age_max_value,
+        'sex': query_params.get('sex') or None,
+        'vaccineId': vaccine_id_value,
+        'anonymized': str(query_params.get('anonymized', 'false')).lower() == 'true',
+    }
+
+
+def export_students_queryset(user, filters, as_of):
+    students = scope_students_for_user(user, Student.objects.select_related('school').all())
+    students = filter_students_queryset(
+        students,
+        q=filters['q'],
+        school_id=filters['schoolId'],
+        sex=filters['sex'],
+        age_min=filters['ageMin'],
+        age_max=filters['ageMax'],
+        as_of=as_of,
+    )
+    if filters['status']:
+        students = filter_students_by_status(students, filters['status'], filters['vaccineId'], as_of=as_of)
+    return students
+
+
+def anonymize_name_to_initials(full_name: str):
+    parts = [chunk for chunk in (full_name or '').strip().split() if chunk]
+    if not parts:
+        return ''
+    return '.'.join(part[0].upper() for part in parts)
+
+
+def _pending_rows(batch, schedule, vaccine_ids, as_of, anonymized):
+    statuses = build_statuses_for_students(batch, schedule=schedule, vaccine_ids=vaccine_ids, as_of=as_of)
+    for student in batch:
+        status_data = statuses[student.id]
+        for pending in status_data['pending']:
+            yield [
+                student.id,
+                anonymize_name_to_initials(student.full_name) if anonymized else student.full_name,
+                student.school.name,
+                status_data['status'],
+                status_data['ageMonths'],
+                pending['vaccineCode'],
+                pending['vaccineName'],
+                pending['doseNumber'],
+                pending['status'],
+            ]
+
+
+def iter_pending_export_rows(students, filters, as_of=None, chunk_size=EXPORT_CHUNK_SIZE, on_batch=None):
+    as_of = as_of or timezone.localdate()
+    schedule = get_active_compiled_schedule()
+    vaccine_ids = {filters['vaccineId']} if filters['vaccineId'] else None
+
+    batch = []
+    for student in students.iterator(chunk_size=chunk_size):
+        batch.append(student)
+        if len(batch) >= chunk_size:
+            yield from _pending_rows(batch, schedule, vaccine_ids, as_of, filters['anonymized'])
+            if on_batch:
+                on_batch(len(batch))
+            batch = []
+    if batch:
+        yield from _pending_rows(batch, schedule, vaccine_ids, as_of, filters['anonymized'])
+        if on_batch:
+            on_batch(len(batch))
+
+
+def iter_pending_export_csv(students, filters, as_of=None, chunk_size=EXPORT_CHUNK_SIZE):
+    writer = csv.writer(Echo(), delimiter=';')
+    yield writer.writerow(EXPORT_COLUMNS)
+    buffered = []
+    for row in iter_pending_export_rows(students, filters, as_of=as_of, chunk_size=chunk_size):
+        buffered.append(writer.writerow(row))
+        if len(buffered) >= CSV_ROWS_PER_WRITE:
+            yield ''.join(buffered)
+            buffered = []
+    if buffered:
+        yield ''.join(buffered)
+
+
+def parquet_export_schema():
+    def dictionary(index_type):
+        return pa.dictionary(index_type, pa.string())
+
+    return pa.schema(
+        [
+            ('student_id', pa.int64()),
+            ('student_name', pa.string()),
+            ('school', dictionary(pa.int32())),
+            ('status', dictionary(pa.int8())),
+            ('age_months', pa.int16()),
+            ('vaccine_code', dictionary(pa.int16())),
+            ('vaccine_name', dictionary(pa.int16())),
+            ('dose_number', pa.int16()),
+            ('pending_status', dictionary(pa.int8())),
+        ]
+    )
+
+
+def write_pending_export_parquet(students, filters, target, as_of=None, chunk_size=EXPORT_CHUNK_SIZE, row_group_size=PARQUET_ROW_GROUP_SIZE):
+    schema = parquet_export_schema()
+    columns = [[] for _ in EXPORT_COLUMNS]
+    written = 0
+
+    def flush(writer):
+        table = pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema,
+        )
+        writer.write_table(table)
+        for values in columns:
+            values.clear()
+
+    with pq.ParquetWriter(target, schema, compression='zstd') as writer:
+        for row in iter_pending_export_rows(students, filters, as_of=as_of, chunk_size=chunk_size):
+            for values, value in zip(columns, row):
+                values.append(value)
+            written += 1
+            if len(columns[0]) >= row_group_size:
+                flush(writer)
+        if columns[0] or not written:
+            flush(writer)
+    return written
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Student
+from immunization.status_store import REFRESH_CHUNK_SIZE, refresh_student_statuses
+
+
+class Command(BaseCommand):
+    help = 'Recalcula a tabela materializada de status vacinal de todos os estudantes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=REFRESH_CHUNK_SIZE, help='Quantidade de estudantes por lote.')
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        student_ids = list(Student.objects.order_by('id').values_list('id', flat=True))
+
+        processed = 0
+        for offset in range(0, len(student_ids), chunk_size):
+            chunk = student_ids[offset:offset + chunk_size]
+            refresh_student_statuses(chunk)
+            processed += len(chunk)
+            self.stdout.write(f'{processed}/{len(student_ids)} estudantes processados')
+
+        self.stdout.write(self.style.SUCCESS(f'Status vacinal recalculado para {processed} estudantes.'))
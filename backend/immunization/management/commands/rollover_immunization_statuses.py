@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from immunization.status_store import REFRESH_CHUNK_SIZE, refresh_student_statuses, stale_student_ids
+
+
+class Command(BaseCommand):
+    help = 'Recalcula apenas os estudantes cujo status vacinal muda na data informada (padrao: hoje).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Data de referencia no formato AAAA-MM-DD.')
+        parser.add_argument('--chunk-size', type=int, default=REFRESH_CHUNK_SIZE, help='Quantidade de estudantes por lote.')
+
+    def handle(self, *args, **options):
+        as_of = parse_date(options['date']) if options['date'] else timezone.localdate()
+        if as_of is None:
+            raise CommandError('Data invalida. Use o formato AAAA-MM-DD.')
+        chunk_size = max(1, options['chunk_size'])
+        student_ids = stale_student_ids(as_of)
+
+        for offset in range(0, len(student_ids), chunk_size):
+            refresh_student_statuses(student_ids[offset:offset + chunk_size], as_of=as_of)
+
+        self.stdout.write(self.style.SUCCESS(f'{len(student_ids)} estudantes recalculados para {as_of.isoformat()}.'))
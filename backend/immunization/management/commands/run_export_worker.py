@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from immunization.export_jobs import claim_next_job, purge_expired_exports, recover_stale_jobs, run_export_job
+from immunization.exports import EXPORT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Processa a fila de exportacoes (ExportJob) gerando arquivos CSV compactados no diretorio de midia.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Processa os jobs pendentes e encerra.')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Segundos entre consultas a fila.')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='Quantidade de estudantes por lote.')
+        parser.add_argument(
+            '--maintenance-interval',
+            type=float,
+            default=60.0,
+            help='Segundos entre a recuperacao de jobs orfaos e a limpeza de arquivos expirados.',
+        )
+
+    def maintain(self):
+        recovered = recover_stale_jobs()
+        if recovered:
+            self.stderr.write(self.style.WARNING(f'{recovered} exportacoes orfas marcadas como erro.'))
+        purged = purge_expired_exports()
+        if purged:
+            self.stdout.write(f'{purged} exportacoes expiradas removidas.')
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        processed = 0
+        next_maintenance = 0.0
+        while True:
+            if time.monotonic() >= next_maintenance:
+                self.maintain()
+                next_maintenance = time.monotonic() + options['maintenance_interval']
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            try:
+                job = run_export_job(job, chunk_size=chunk_size)
+            except Exception as exc:
+                self.stderr.write(self.style.ERROR(f'Exportacao #{job.pk} falhou: {exc}'))
+                continue
+            processed += 1
+            self.stdout.write(f'Exportacao #{job.pk} concluida: {job.rows_written} linhas ({job.file_size} bytes).')
+
+        self.stdout.write(self.style.SUCCESS(f'{processed} exportacoes processadas.'))
@@ -7,7 +7,7 @@ from faker import Faker
 from accounts.models import User
 from core.models import School, Student
 from immunization.models import Vaccine, VaccineDoseRule, VaccineScheduleVersion, VaccinationRecord
-from immunization.services import build_student_immunization_status
+from immunization.status_store import refresh_student_statuses
 
 
 class Command(BaseCommand):
@@ -102,8 +102,7 @@ class Command(BaseCommand):
             self._seed_student_records(student, schedule, admin_user, profile)
 
         status_totals = {'EM_DIA': 0, 'ATRASADO': 0, 'INCOMPLETO': 0, 'SEM_DADOS': 0}
-        for student in students:
-            status = build_student_immunization_status(student)['status']
+        for status in refresh_student_statuses([student.id for student in students]).values():
             status_totals[status] += 1
 
         self.stdout.write(self.style.SUCCESS('Seed concluido com sucesso.'))
@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core.models import Student
+from immunization.models import VaccineScheduleVersion
+from immunization.simulation import SIMULATION_CHUNK_SIZE, SIMULATION_STATUSES, simulate_schedule_change
+
+
+class Command(BaseCommand):
+    help = 'Simula o impacto de um calendario vacinal candidato (inativo) sobre todos os estudantes, sem ativa-lo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('schedule_code', help='Codigo do calendario candidato.')
+        parser.add_argument('--date', help='Data de referencia no formato AAAA-MM-DD.')
+        parser.add_argument('--school-id', type=int, help='Restringe a simulacao a uma escola.')
+        parser.add_argument('--chunk-size', type=int, default=SIMULATION_CHUNK_SIZE, help='Quantidade de estudantes por lote.')
+        parser.add_argument('--json', action='store_true', help='Imprime o resultado completo em JSON.')
+
+    def handle(self, *args, **options):
+        as_of = parse_date(options['date']) if options['date'] else timezone.localdate()
+        if as_of is None:
+            raise CommandError('Data invalida. Use o formato AAAA-MM-DD.')
+
+        schedule = VaccineScheduleVersion.objects.filter(code=options['schedule_code']).first()
+        if schedule is None:
+            raise CommandError(f'Calendario {options["schedule_code"]} nao encontrado.')
+        if schedule.is_active:
+            raise CommandError('O calendario ja esta ativo; informe um calendario candidato inativo.')
+
+        students = Student.objects.all()
+        if options['school_id']:
+            students = students.filter(school_id=options['school_id'])
+
+        result = simulate_schedule_change(
+            students,
+            schedule,
+            as_of=as_of,
+            chunk_size=options['chunk_size'],
+            on_chunk=lambda processed: self.stderr.write(f'{processed} estudantes avaliados'),
+        )
+
+        if options['json']:
+            self.stdout.write(json.dumps(result, cls=DjangoJSONEncoder, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(f'Atual: {result["currentScheduleCode"] or "-"} | Candidato: {result["candidateScheduleCode"]}')
+        self.stdout.write('de \\ para;' + ';'.join(SIMULATION_STATUSES))
+        for source in SIMULATION_STATUSES:
+            self.stdout.write(source + ';' + ';'.join(str(result['transitions'][source][target]) for target in SIMULATION_STATUSES))
+        for school in result['schools']:
+            deltas = ', '.join(f'{label} {value:+d}' for label, value in school['delta'].items())
+            self.stdout.write(f'{school["schoolName"]}: {deltas}')
+        self.stdout.write(self.style.SUCCESS(f'Simulacao concluida para {result["totalStudents"]} estudantes.'))
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_cacheversion'),
+        ('immunization', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentImmunizationStatus',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='immunization_status', serialize=False, to='core.student')),
+                ('status', models.CharField(choices=[('EM_DIA', 'Em dia'), ('INCOMPLETO', 'Incompleto'), ('ATRASADO', 'Atrasado'), ('SEM_DADOS', 'Sem dados')], db_index=True, max_length=20)),
+                ('pending_count', models.PositiveIntegerField(default=0)),
+                ('overdue_count', models.PositiveIntegerField(default=0)),
+                ('future_count', models.PositiveIntegerField(default=0)),
+                ('schedule_generation', models.CharField(blank=True, max_length=32)),
+                ('computed_for', models.DateField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('schedule_version', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='immunization.vaccinescheduleversion')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['computed_for', 'schedule_generation'], name='imm_status_freshness_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StudentVaccineStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('EM_DIA', 'Em dia'), ('INCOMPLETO', 'Incompleto'), ('ATRASADO', 'Atrasado'), ('SEM_DADOS', 'Sem dados')], max_length=20)),
+                ('pending_count', models.PositiveIntegerField(default=0)),
+                ('overdue_count', models.PositiveIntegerField(default=0)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vaccine_statuses', to='core.student')),
+                ('vaccine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_statuses', to='immunization.vaccine')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['vaccine', 'status'], name='imm_vaccine_status_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'vaccine'), name='unique_student_vaccine_status')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immunization', '0002_student_immunization_status'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='studentimmunizationstatus',
+            name='imm_status_freshness_idx',
+        ),
+        migrations.AddField(
+            model_name='studentimmunizationstatus',
+            name='next_change_date',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+    ]
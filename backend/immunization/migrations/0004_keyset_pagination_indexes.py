@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_keyset_pagination_indexes'),
+        ('immunization', '0003_status_next_change_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vaccinationrecord',
+            index=models.Index(fields=['-application_date', 'id'], name='vaccination_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_school_data_version'),
+        ('immunization', '0005_export_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusFilterMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=32)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'student'], name='status_filter_token_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:07
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immunization', '0007_export_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='StatusFilterMatch',
+        ),
+    ]
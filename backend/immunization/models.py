@@ -1,11 +1,24 @@
 from django.conf import settings
 from django.db import models, transaction
 
+from core.models import CacheVersion, bump_student_school_versions
+
 
 class Vaccine(models.Model):
     code = models.CharField(max_length=50, unique=True)
     name = models.CharField(max_length=255)
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            CacheVersion.bump(CacheVersion.SCHEDULE)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            CacheVersion.bump(CacheVersion.SCHEDULE)
+        return result
+
     def __str__(self):
         return self.name
 
@@ -35,6 +48,13 @@ class VaccineScheduleVersion(models.Model):
             if self.is_active:
                 VaccineScheduleVersion.objects.exclude(pk=self.pk).filter(is_active=True).update(is_active=False)
             super().save(*args, **kwargs)
+            CacheVersion.bump(CacheVersion.SCHEDULE)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            CacheVersion.bump(CacheVersion.SCHEDULE)
+        return result
 
     def __str__(self):
         return f'{self.code} - {self.name}'
@@ -72,6 +92,17 @@ class VaccineDoseRule(models.Model):
         ]
         ordering = ['vaccine__name', 'dose_number']
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            CacheVersion.bump(CacheVersion.SCHEDULE)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            CacheVersion.bump(CacheVersion.SCHEDULE)
+        return result
+
     def __str__(self):
         return f'{self.schedule_version.code} - {self.vaccine.code} dose {self.dose_number}'
 
@@ -112,6 +143,116 @@ class VaccinationRecord(models.Model):
             )
         ]
         ordering = ['-application_date']
+        indexes = [models.Index(fields=['-application_date', 'id'], name='vaccination_date_id_idx')]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_student_id = instance.__dict__.get('student_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        bump_student_school_versions([self.student_id, getattr(self, '_loaded_student_id', None)])
+        self._loaded_student_id = self.student_id
+
+    def delete(self, *args, **kwargs):
+        student_id = self.student_id
+        result = super().delete(*args, **kwargs)
+        bump_student_school_versions([student_id])
+        return result
 
     def __str__(self):
         return f'{self.student.full_name} - {self.vaccine.code} dose {self.dose_number}'
+
+
+class ImmunizationStatusChoices(models.TextChoices):
+    EM_DIA = 'EM_DIA', 'Em dia'
+    INCOMPLETO = 'INCOMPLETO', 'Incompleto'
+    ATRASADO = 'ATRASADO', 'Atrasado'
+    SEM_DADOS = 'SEM_DADOS', 'Sem dados'
+
+
+class StudentImmunizationStatus(models.Model):
+    student = models.OneToOneField(
+        'core.Student',
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='immunization_status',
+    )
+    status = models.CharField(max_length=20, choices=ImmunizationStatusChoices.choices, db_index=True)
+    pending_count = models.PositiveIntegerField(default=0)
+    overdue_count = models.PositiveIntegerField(default=0)
+    future_count = models.PositiveIntegerField(default=0)
+    schedule_version = models.ForeignKey(
+        VaccineScheduleVersion,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+    )
+    schedule_generation = models.CharField(max_length=32, blank=True)
+    computed_for = models.DateField()
+    next_change_date = models.DateField(null=True, blank=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.student_id} - {self.status} ({self.computed_for})'
+
+
+class StudentVaccineStatus(models.Model):
+    student = models.ForeignKey('core.Student', on_delete=models.CASCADE, related_name='vaccine_statuses')
+    vaccine = models.ForeignKey(Vaccine, on_delete=models.CASCADE, related_name='student_statuses')
+    status = models.CharField(max_length=20, choices=ImmunizationStatusChoices.choices)
+    pending_count = models.PositiveIntegerField(default=0)
+    overdue_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'vaccine'], name='unique_student_vaccine_status'),
+        ]
+        indexes = [
+            models.Index(fields=['vaccine', 'status'], name='imm_vaccine_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.student_id} - {self.vaccine_id} {self.status}'
+
+
+class ExportJob(models.Model):
+    class StatusChoices(models.TextChoices):
+        PENDENTE = 'PENDENTE', 'Pendente'
+        PROCESSANDO = 'PROCESSANDO', 'Processando'
+        CONCLUIDO = 'CONCLUIDO', 'Concluido'
+        ERRO = 'ERRO', 'Erro'
+
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='export_jobs',
+    )
+    scope_role = models.CharField(max_length=20)
+    scope_school = models.ForeignKey('core.School', null=True, blank=True, on_delete=models.CASCADE, related_name='+')
+    filters_json = models.JSONField(default=dict, blank=True)
+    filters_hash = models.CharField(max_length=64, db_index=True)
+    as_of = models.DateField()
+    status = models.CharField(max_length=20, choices=StatusChoices.choices, default=StatusChoices.PENDENTE, db_index=True)
+    total_students = models.PositiveIntegerField(default=0)
+    processed_students = models.PositiveIntegerField(default=0)
+    rows_written = models.PositiveIntegerField(default=0)
+    progress_percent = models.PositiveSmallIntegerField(default=0)
+    file_path = models.CharField(max_length=255, blank=True)
+    file_size = models.PositiveBigIntegerField(default=0)
+    error_message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'ExportJob #{self.pk} ({self.status})'
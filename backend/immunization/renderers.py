@@ -0,0 +1,32 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class ExportFileRenderer(BaseRenderer):
+    # O arquivo e gerado pela view; o renderer so participa da negociacao e devolve erros em JSON.
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = JSONRenderer.media_type
+        return JSONRenderer().render(data)
+
+
+class CsvExportRenderer(ExportFileRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+
+class ParquetExportRenderer(ExportFileRenderer):
+    media_type = 'application/vnd.apache.parquet'
+    format = 'parquet'
+    charset = None
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    def filter_renderers(self, renderers, format):
+        renderers = [renderer for renderer in renderers if renderer.format == format]
+        if not renderers:
+            raise ValidationError({'format': 'Formato de exportacao invalido. Use csv ou parquet.'})
+        return renderers
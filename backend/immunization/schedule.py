@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import sys
+import threading
+from bisect import bisect_right
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+
+from core.models import CacheVersion
+from immunization.models import VaccineScheduleVersion
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledRule:
+    vaccine_id: int
+    dose_number: int
+    vaccine_code: str
+    vaccine_name: str
+    min_age_months: int
+    max_age_months: int
+    position: int
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledSchedule:
+    id: int
+    code: str
+    generation: str
+    rules: tuple[CompiledRule, ...]
+    min_ages: tuple[int, ...]
+    rule_index: Mapping[tuple[int, int], CompiledRule]
+    vaccine_ids: frozenset[int]
+
+    def due_rules(self, age_months):
+        return self.rules[:bisect_right(self.min_ages, age_months)]
+
+    def restricted_to(self, vaccine_id_set):
+        if not vaccine_id_set:
+            return self
+        return _build_compiled(
+            self.id,
+            self.code,
+            self.generation,
+            [rule for rule in self.rules if rule.vaccine_id in vaccine_id_set],
+        )
+
+
+def _build_compiled(schedule_id, code, generation, rules):
+    ordered = sorted(rules, key=lambda rule: (rule.min_age_months, rule.position))
+    return CompiledSchedule(
+        id=schedule_id,
+        code=code,
+        generation=generation,
+        rules=tuple(ordered),
+        min_ages=tuple(rule.min_age_months for rule in ordered),
+        rule_index=MappingProxyType({(rule.vaccine_id, rule.dose_number): rule for rule in ordered}),
+        vaccine_ids=frozenset(rule.vaccine_id for rule in ordered),
+    )
+
+
+def compile_schedule(schedule_version, generation=''):
+    if isinstance(schedule_version, CompiledSchedule):
+        return schedule_version
+
+    rules = []
+    for position, rule in enumerate(schedule_version.rules.select_related('vaccine').order_by('vaccine__name', 'dose_number')):
+        rules.append(
+            CompiledRule(
+                vaccine_id=rule.vaccine_id,
+                dose_number=rule.dose_number,
+                vaccine_code=sys.intern(rule.vaccine.code),
+                vaccine_name=sys.intern(rule.vaccine.name),
+                min_age_months=rule.recommended_min_age_months,
+                max_age_months=rule.recommended_max_age_months,
+                position=position,
+            )
+        )
+    return _build_compiled(schedule_version.id, schedule_version.code, generation, rules)
+
+
+_active_lock = threading.Lock()
+_active_cache: tuple[str, CompiledSchedule | None] | None = None
+
+
+def get_schedule_generation():
+    return CacheVersion.current(CacheVersion.SCHEDULE)
+
+
+def bump_schedule_generation():
+    return CacheVersion.bump(CacheVersion.SCHEDULE)
+
+
+def get_active_compiled_schedule():
+    global _active_cache
+
+    generation = get_schedule_generation()
+    cached = _active_cache
+    if cached is not None and cached[0] == generation:
+        return cached[1]
+
+    with _active_lock:
+        cached = _active_cache
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        version = VaccineScheduleVersion.objects.filter(is_active=True).order_by('-created_at').first()
+        compiled = compile_schedule(version, generation) if version else None
+        _active_cache = (generation, compiled)
+        return compiled
@@ -1,6 +1,7 @@
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 
-from immunization.models import Vaccine, VaccineDoseRule, VaccineScheduleVersion, VaccinationRecord
+from immunization.models import ExportJob, Vaccine, VaccineDoseRule, VaccineScheduleVersion, VaccinationRecord
 
 
 class VaccineSerializer(serializers.ModelSerializer):
@@ -99,3 +100,32 @@ class VaccinationRecordSerializer(serializers.ModelSerializer):
         extra_kwargs = {
             'student': {'required': False},
         }
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = [
+            'id',
+            'status',
+            'filters_json',
+            'as_of',
+            'total_students',
+            'processed_students',
+            'rows_written',
+            'progress_percent',
+            'file_size',
+            'error_message',
+            'download_url',
+            'created_at',
+            'started_at',
+            'finished_at',
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != ExportJob.StatusChoices.CONCLUIDO:
+            return None
+        return reverse('export-jobs-download', args=[obj.pk], request=self.context.get('request'))
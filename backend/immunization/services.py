@@ -1,81 +1,183 @@
+import calendar
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 
+from core.models import SchoolDataVersion
 from core.services import age_in_months_from_birth_date
-from immunization.models import VaccineScheduleVersion
+from immunization.models import VaccinationRecord
+from immunization.schedule import compile_schedule, get_active_compiled_schedule, get_schedule_generation
+
+RECORDS_QUERY_CHUNK_SIZE = 500
+
+
+def normalize_vaccine_ids(vaccine_ids):
+    return {int(item) for item in vaccine_ids} if vaccine_ids else None
 
 
-def get_active_schedule_version():
-    return (
-        VaccineScheduleVersion.objects.filter(is_active=True)
-        .prefetch_related('rules__vaccine')
-        .order_by('-created_at')
-        .first()
+def load_record_keys(student_ids, vaccine_id_set=None):
+    record_keys = {student_id: set() for student_id in student_ids}
+    for offset in range(0, len(student_ids), RECORDS_QUERY_CHUNK_SIZE):
+        chunk = student_ids[offset:offset + RECORDS_QUERY_CHUNK_SIZE]
+        records_query = VaccinationRecord.objects.filter(student_id__in=chunk)
+        if vaccine_id_set:
+            records_query = records_query.filter(vaccine_id__in=vaccine_id_set)
+        for student_id, vaccine_id, dose_number in records_query.order_by().values_list('student_id', 'vaccine_id', 'dose_number'):
+            record_keys[student_id].add((vaccine_id, dose_number))
+    return record_keys
+
+
+def classify_rules(schedule, record_keys, age_months):
+    if not schedule:
+        return [], []
+    due_rules = schedule.due_rules(age_months)
+    pending_rules = sorted(
+        (rule for rule in due_rules if (rule.vaccine_id, rule.dose_number) not in record_keys),
+        key=lambda rule: rule.position,
     )
+    future_rules = sorted(
+        (rule for rule in schedule.rules[len(due_rules):] if (rule.vaccine_id, rule.dose_number) not in record_keys),
+        key=lambda rule: rule.position,
+    )
+    return pending_rules, future_rules
+
 
+def derive_status(has_records, pending_rules, age_months):
+    if not has_records:
+        return 'SEM_DADOS'
+    if not pending_rules:
+        return 'EM_DIA'
+    if any(age_months > rule.max_age_months for rule in pending_rules):
+        return 'ATRASADO'
+    return 'INCOMPLETO'
 
-def build_student_immunization_status(student, schedule_version=None, vaccine_ids=None):
-    schedule = schedule_version or get_active_schedule_version()
-    age_months = age_in_months_from_birth_date(student.birth_date)
-    vaccine_id_set = {int(item) for item in vaccine_ids} if vaccine_ids else None
-
-    records_query = student.vaccination_records.select_related('vaccine').all()
-    if vaccine_id_set:
-        records_query = records_query.filter(vaccine_id__in=vaccine_id_set)
-    records = list(records_query)
-    records_map = {(record.vaccine_id, record.dose_number): record for record in records}
-
-    pending_items = []
-    future_items = []
-    if schedule:
-        for rule in schedule.rules.all():
-            if vaccine_id_set and rule.vaccine_id not in vaccine_id_set:
-                continue
-            key = (rule.vaccine_id, rule.dose_number)
-            if key in records_map:
-                continue
-
-            if age_months < rule.recommended_min_age_months:
-                future_items.append(
-                    {
-                        'vaccineCode': rule.vaccine.code,
-                        'vaccineName': rule.vaccine.name,
-                        'doseNumber': rule.dose_number,
-                        'recommendedMinAgeMonths': rule.recommended_min_age_months,
-                        'recommendedMaxAgeMonths': rule.recommended_max_age_months,
-                        'monthsUntilDue': rule.recommended_min_age_months - age_months,
-                        'status': 'FUTURA',
-                    }
-                )
-                continue
-
-            pending_status = 'ATRASADA' if age_months > rule.recommended_max_age_months else 'PENDENTE'
-            pending_items.append(
-                {
-                    'vaccineCode': rule.vaccine.code,
-                    'vaccineName': rule.vaccine.name,
-                    'doseNumber': rule.dose_number,
-                    'recommendedMinAgeMonths': rule.recommended_min_age_months,
-                    'recommendedMaxAgeMonths': rule.recommended_max_age_months,
-                    'status': pending_status,
-                }
-            )
-
-    if len(records) == 0:
-        status = 'SEM_DADOS'
-    elif not pending_items:
-        status = 'EM_DIA'
-    elif any(item['status'] == 'ATRASADA' for item in pending_items):
-        status = 'ATRASADO'
-    else:
-        status = 'INCOMPLETO'
+
+def date_when_age_reaches(birth_date, age_months):
+    year, month_index = divmod(birth_date.year * 12 + birth_date.month - 1 + age_months, 12)
+    month = month_index + 1
+    if birth_date.day <= calendar.monthrange(year, month)[1]:
+        return datetime.date(year, month, birth_date.day)
+    if month == 12:
+        return datetime.date(year + 1, 1, 1)
+    return datetime.date(year, month + 1, 1)
+
+
+def next_status_change_date(birth_date, age_months, pending_rules, future_rules):
+    thresholds = [rule.min_age_months for rule in future_rules]
+    thresholds.extend(rule.max_age_months + 1 for rule in pending_rules if age_months <= rule.max_age_months)
+    if not thresholds:
+        return None
+    return date_when_age_reaches(birth_date, min(thresholds))
+
+
+def _evaluate_student(student, schedule, record_keys, as_of):
+    age_months = age_in_months_from_birth_date(student.birth_date, as_of)
+    pending_rules, future_rules = classify_rules(schedule, record_keys, age_months)
+
+    pending_items = [
+        {
+            'vaccineCode': rule.vaccine_code,
+            'vaccineName': rule.vaccine_name,
+            'doseNumber': rule.dose_number,
+            'recommendedMinAgeMonths': rule.min_age_months,
+            'recommendedMaxAgeMonths': rule.max_age_months,
+            'status': 'ATRASADA' if age_months > rule.max_age_months else 'PENDENTE',
+        }
+        for rule in pending_rules
+    ]
+    future_items = [
+        {
+            'vaccineCode': rule.vaccine_code,
+            'vaccineName': rule.vaccine_name,
+            'doseNumber': rule.dose_number,
+            'recommendedMinAgeMonths': rule.min_age_months,
+            'recommendedMaxAgeMonths': rule.max_age_months,
+            'monthsUntilDue': rule.min_age_months - age_months,
+            'status': 'FUTURA',
+        }
+        for rule in future_rules
+    ]
 
     return {
         'studentId': student.id,
         'studentName': student.full_name,
         'ageMonths': age_months,
-        'status': status,
-        'asOfDate': timezone.localdate(),
+        'status': derive_status(bool(record_keys), pending_rules, age_months),
+        'asOfDate': as_of,
         'activeScheduleCode': schedule.code if schedule else None,
         'pending': pending_items,
         'future': future_items,
+        'nextChangeDate': next_status_change_date(student.birth_date, age_months, pending_rules, future_rules),
     }
+
+
+def population_cache_key(kind, students, vaccine_ids, as_of):
+    digest = hashlib.sha1(','.join(str(item) for item in sorted(student.id for student in students)).encode()).hexdigest()
+    versions = SchoolDataVersion.for_schools(student.school_id for student in students)
+    vaccine_id_set = normalize_vaccine_ids(vaccine_ids)
+    vaccine_key = '-'.join(str(item) for item in sorted(vaccine_id_set)) if vaccine_id_set else 'all'
+    return ':'.join(
+        [
+            'immunization',
+            kind,
+            get_schedule_generation() or '0',
+            hashlib.sha1(versions.encode()).hexdigest(),
+            as_of.isoformat(),
+            vaccine_key,
+            digest,
+        ]
+    )
+
+
+def resolve_schedule(schedule=None):
+    if schedule is None:
+        return get_active_compiled_schedule()
+    return compile_schedule(schedule)
+
+
+def build_statuses_for_students(students, schedule=None, vaccine_ids=None, as_of=None):
+    students = list(students)
+    as_of = as_of or timezone.localdate()
+    vaccine_id_set = normalize_vaccine_ids(vaccine_ids)
+
+    cache_key = None
+    if schedule is None and len(students) <= settings.STATUS_CACHE_MAX_STUDENTS:
+        cache_key = population_cache_key('statuses', students, vaccine_id_set, as_of)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    compiled = resolve_schedule(schedule)
+    if compiled:
+        compiled = compiled.restricted_to(vaccine_id_set)
+
+    record_keys = load_record_keys([student.id for student in students], vaccine_id_set)
+    statuses = {
+        student.id: _evaluate_student(student, compiled, record_keys[student.id], as_of)
+        for student in students
+    }
+    if cache_key:
+        cache.set(cache_key, statuses, settings.STATUS_CACHE_TIMEOUT)
+    return statuses
+
+
+def summarize_statuses(students, schedule=None, vaccine_ids=None, as_of=None):
+    statuses = build_statuses_for_students(students, schedule=schedule, vaccine_ids=vaccine_ids, as_of=as_of)
+    return {
+        student_id: {
+            'status': status_data['status'],
+            'ageMonths': status_data['ageMonths'],
+            'pendingCount': len(status_data['pending']),
+            'overdueCount': sum(1 for item in status_data['pending'] if item['status'] == 'ATRASADA'),
+            'futureCount': len(status_data['future']),
+        }
+        for student_id, status_data in statuses.items()
+    }
+
+
+def build_student_immunization_status(student, schedule_version=None, vaccine_ids=None, as_of=None):
+    statuses = build_statuses_for_students([student], schedule=schedule_version, vaccine_ids=vaccine_ids, as_of=as_of)
+    return statuses[student.id]
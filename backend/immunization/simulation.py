@@ -0,0 +1,121 @@
+import numpy as np
+from django.utils import timezone
+
+from immunization.schedule import compile_schedule, get_active_compiled_schedule
+from immunization.services import load_record_keys
+from immunization.vectorized import STATUS_LABELS, ages_in_months, build_dose_arrays, evaluate_population
+
+SIMULATION_CHUNK_SIZE = 5000
+SIMULATION_STATUSES = ('EM_DIA', 'INCOMPLETO', 'ATRASADO', 'SEM_DADOS')
+_LABEL_INDEX = {label: index for index, label in enumerate(STATUS_LABELS.tolist())}
+
+
+def _evaluate_chunk(student_ids, birth_dates, record_keys, schedule, as_of):
+    ages = ages_in_months(birth_dates, as_of)
+    dose_matrix, has_records, min_ages, max_ages = build_dose_arrays(student_ids, record_keys, schedule)
+    return evaluate_population(ages, dose_matrix, has_records, min_ages, max_ages)['status']
+
+
+def _status_counts(counts):
+    return {label: int(counts[_LABEL_INDEX[label]]) for label in SIMULATION_STATUSES}
+
+
+def _transition_counts(matrix):
+    return {
+        source: {target: int(matrix[_LABEL_INDEX[source], _LABEL_INDEX[target]]) for target in SIMULATION_STATUSES}
+        for source in SIMULATION_STATUSES
+    }
+
+
+def _school_row(school_id, name, current, candidate):
+    current_counts = _status_counts(current)
+    candidate_counts = _status_counts(candidate)
+    return {
+        'schoolId': school_id,
+        'schoolName': name,
+        'totalStudents': int(current.sum()),
+        'current': current_counts,
+        'candidate': candidate_counts,
+        'delta': {label: candidate_counts[label] - current_counts[label] for label in SIMULATION_STATUSES},
+    }
+
+
+def iter_schedule_simulation(students, candidate, as_of=None, chunk_size=SIMULATION_CHUNK_SIZE):
+    as_of = as_of or timezone.localdate()
+    chunk_size = max(1, chunk_size)
+    current = get_active_compiled_schedule()
+    compiled_candidate = compile_schedule(candidate)
+    label_count = len(STATUS_LABELS)
+
+    transitions = np.zeros((label_count, label_count), dtype=np.int64)
+    schools = {}
+    processed = 0
+    last_id = 0
+    rows = students.order_by('id').values_list('id', 'birth_date', 'school_id', 'school__name')
+
+    while True:
+        chunk = list(rows.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+        student_ids = [row[0] for row in chunk]
+        birth_dates = [row[1] for row in chunk]
+        record_keys = load_record_keys(student_ids)
+
+        before = _evaluate_chunk(student_ids, birth_dates, record_keys, current, as_of).astype(np.int64)
+        after = _evaluate_chunk(student_ids, birth_dates, record_keys, compiled_candidate, as_of).astype(np.int64)
+        chunk_transitions = np.bincount(before * label_count + after, minlength=label_count * label_count).reshape(label_count, label_count)
+        transitions += chunk_transitions
+
+        school_keys, inverse = np.unique(np.array([row[2] for row in chunk], dtype=np.int64), return_inverse=True)
+        before_by_school = np.zeros((len(school_keys), label_count), dtype=np.int64)
+        after_by_school = np.zeros((len(school_keys), label_count), dtype=np.int64)
+        np.add.at(before_by_school, (inverse, before), 1)
+        np.add.at(after_by_school, (inverse, after), 1)
+
+        school_names = {row[2]: row[3] for row in chunk}
+        chunk_schools = []
+        for index, school_id in enumerate(school_keys.tolist()):
+            entry = schools.setdefault(
+                school_id,
+                {
+                    'name': school_names[school_id],
+                    'current': np.zeros(label_count, dtype=np.int64),
+                    'candidate': np.zeros(label_count, dtype=np.int64),
+                },
+            )
+            entry['current'] += before_by_school[index]
+            entry['candidate'] += after_by_school[index]
+            chunk_schools.append(_school_row(school_id, school_names[school_id], before_by_school[index], after_by_school[index]))
+
+        processed += len(chunk)
+        yield {
+            'type': 'chunk',
+            'processed': processed,
+            'transitions': _transition_counts(chunk_transitions),
+            'schools': chunk_schools,
+        }
+
+    yield {
+        'type': 'summary',
+        'asOfDate': as_of,
+        'currentScheduleCode': current.code if current else None,
+        'candidateScheduleCode': compiled_candidate.code,
+        'totalStudents': processed,
+        'transitions': _transition_counts(transitions),
+        'current': _status_counts(transitions.sum(axis=1)),
+        'candidate': _status_counts(transitions.sum(axis=0)),
+        'schools': [
+            _school_row(school_id, entry['name'], entry['current'], entry['candidate'])
+            for school_id, entry in sorted(schools.items(), key=lambda item: item[1]['name'])
+        ],
+    }
+
+
+def simulate_schedule_change(students, candidate, as_of=None, chunk_size=SIMULATION_CHUNK_SIZE, on_chunk=None):
+    for event in iter_schedule_simulation(students, candidate, as_of=as_of, chunk_size=chunk_size):
+        if event['type'] == 'chunk':
+            if on_chunk:
+                on_chunk(event['processed'])
+            continue
+        return {key: value for key, value in event.items() if key != 'type'}
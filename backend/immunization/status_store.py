@@ -0,0 +1,186 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from core.models import Student
+from core.services import age_in_months_from_birth_date
+from immunization.models import StudentImmunizationStatus, StudentVaccineStatus
+from immunization.schedule import get_active_compiled_schedule, get_schedule_generation
+from immunization.services import (
+    classify_rules,
+    derive_status,
+    load_record_keys,
+    next_status_change_date,
+    summarize_statuses,
+)
+
+REFRESH_CHUNK_SIZE = 1000
+
+
+def summarize_student_status(schedule, record_keys, birth_date, as_of):
+    age_months = age_in_months_from_birth_date(birth_date, as_of)
+    pending_rules, future_rules = classify_rules(schedule, record_keys, age_months)
+    overdue_count = sum(1 for rule in pending_rules if age_months > rule.max_age_months)
+
+    vaccine_ids = {vaccine_id for vaccine_id, _ in record_keys}
+    if schedule:
+        vaccine_ids |= schedule.vaccine_ids
+
+    per_vaccine = {}
+    for vaccine_id in vaccine_ids:
+        vaccine_pending = [rule for rule in pending_rules if rule.vaccine_id == vaccine_id]
+        has_records = any(key[0] == vaccine_id for key in record_keys)
+        per_vaccine[vaccine_id] = (
+            derive_status(has_records, vaccine_pending, age_months),
+            len(vaccine_pending),
+            sum(1 for rule in vaccine_pending if age_months > rule.max_age_months),
+        )
+
+    return {
+        'status': derive_status(bool(record_keys), pending_rules, age_months),
+        'pending_count': len(pending_rules),
+        'overdue_count': overdue_count,
+        'future_count': len(future_rules),
+        'next_change_date': next_status_change_date(birth_date, age_months, pending_rules, future_rules),
+        'per_vaccine': per_vaccine,
+    }
+
+
+def _refresh_chunk(student_rows, schedule, generation, as_of):
+    student_ids = [student_id for student_id, _ in student_rows]
+    record_keys = load_record_keys(student_ids)
+
+    status_rows = []
+    vaccine_rows = []
+    result = {}
+    for student_id, birth_date in student_rows:
+        summary = summarize_student_status(schedule, record_keys[student_id], birth_date, as_of)
+        result[student_id] = summary['status']
+        status_rows.append(
+            StudentImmunizationStatus(
+                student_id=student_id,
+                status=summary['status'],
+                pending_count=summary['pending_count'],
+                overdue_count=summary['overdue_count'],
+                future_count=summary['future_count'],
+                schedule_version_id=schedule.id if schedule else None,
+                schedule_generation=generation,
+                computed_for=as_of,
+                next_change_date=summary['next_change_date'],
+            )
+        )
+        vaccine_rows.extend(
+            StudentVaccineStatus(
+                student_id=student_id,
+                vaccine_id=vaccine_id,
+                status=status,
+                pending_count=pending_count,
+                overdue_count=overdue_count,
+            )
+            for vaccine_id, (status, pending_count, overdue_count) in summary['per_vaccine'].items()
+        )
+
+    with transaction.atomic():
+        StudentImmunizationStatus.objects.bulk_create(
+            status_rows,
+            update_conflicts=True,
+            unique_fields=['student'],
+            update_fields=[
+                'status',
+                'pending_count',
+                'overdue_count',
+                'future_count',
+                'schedule_version',
+                'schedule_generation',
+                'computed_for',
+                'next_change_date',
+                'updated_at',
+            ],
+        )
+        StudentVaccineStatus.objects.filter(student_id__in=student_ids).delete()
+        StudentVaccineStatus.objects.bulk_create(vaccine_rows)
+    return result
+
+
+def refresh_student_statuses(student_ids, as_of=None):
+    as_of = as_of or timezone.localdate()
+    schedule = get_active_compiled_schedule()
+    generation = schedule.generation if schedule else get_schedule_generation()
+    student_ids = sorted(set(student_ids))
+
+    result = {}
+    for offset in range(0, len(student_ids), REFRESH_CHUNK_SIZE):
+        chunk = student_ids[offset:offset + REFRESH_CHUNK_SIZE]
+        student_rows = list(Student.objects.filter(id__in=chunk).order_by().values_list('id', 'birth_date'))
+        result.update(_refresh_chunk(student_rows, schedule, generation, as_of))
+    return result
+
+
+def _needs_refresh(as_of, generation):
+    # Linha ausente, vencida (next_change_date), de outra geracao do calendario ou calculada para data futura.
+    return (
+        Q(immunization_status__isnull=True)
+        | Q(immunization_status__next_change_date__lte=as_of)
+        | ~Q(immunization_status__schedule_generation=generation)
+        | Q(immunization_status__computed_for__gt=as_of)
+    )
+
+
+def stale_student_ids(as_of=None, queryset=None):
+    as_of = as_of or timezone.localdate()
+    queryset = Student.objects.all() if queryset is None else queryset
+    stale = queryset.filter(_needs_refresh(as_of, get_schedule_generation()))
+    return sorted(set(stale.order_by().values_list('id', flat=True)))
+
+
+def ensure_status_rows(queryset, as_of=None):
+    stale_ids = stale_student_ids(as_of, queryset)
+    if stale_ids:
+        refresh_student_statuses(stale_ids, as_of=as_of)
+    return len(stale_ids)
+
+
+def _filter_by_computed_status(queryset, status, vaccine_id, as_of):
+    # Datas passadas nao tem status materializado: calculamos em lotes, guardando so os ids que casam
+    # (leitura nao grava nada no banco).
+    vaccine_ids = {vaccine_id} if vaccine_id else None
+    matched_ids = []
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id).order_by('id')[:REFRESH_CHUNK_SIZE])
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+        statuses = summarize_statuses(chunk, vaccine_ids=vaccine_ids, as_of=as_of)
+        matched_ids.extend(student_id for student_id, data in statuses.items() if data['status'] == status)
+    return queryset.filter(id__in=matched_ids)
+
+
+def filter_students_by_status(queryset, status, vaccine_id=None, as_of=None):
+    if as_of and as_of != timezone.localdate():
+        return _filter_by_computed_status(queryset, status, vaccine_id, as_of)
+
+    ensure_status_rows(queryset, as_of=as_of)
+    if not vaccine_id:
+        return queryset.filter(immunization_status__status=status)
+
+    vaccine_rows = StudentVaccineStatus.objects.filter(student_id=OuterRef('pk'), vaccine_id=vaccine_id)
+    matching = Exists(vaccine_rows.filter(status=status))
+    if status == 'SEM_DADOS':
+        return queryset.filter(matching | ~Exists(vaccine_rows))
+    return queryset.filter(matching)
+
+
+def get_materialized_statuses(student_ids, vaccine_id=None, as_of=None):
+    student_ids = list(student_ids)
+    statuses = {}
+    for offset in range(0, len(student_ids), REFRESH_CHUNK_SIZE):
+        chunk = student_ids[offset:offset + REFRESH_CHUNK_SIZE]
+        ensure_status_rows(Student.objects.filter(id__in=chunk), as_of=as_of)
+        if not vaccine_id:
+            rows = StudentImmunizationStatus.objects.filter(student_id__in=chunk)
+        else:
+            statuses.update({student_id: 'SEM_DADOS' for student_id in chunk})
+            rows = StudentVaccineStatus.objects.filter(student_id__in=chunk, vaccine_id=vaccine_id)
+        statuses.update(rows.values_list('student_id', 'status'))
+    return statuses
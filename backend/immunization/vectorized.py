@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import numpy as np
+from django.utils import timezone
+
+from immunization.services import load_record_keys, normalize_vaccine_ids, resolve_schedule
+
+STATUS_LABELS = np.array(['SEM_DADOS', 'EM_DIA', 'INCOMPLETO', 'ATRASADO'])
+SEM_DADOS, EM_DIA, INCOMPLETO, ATRASADO = range(4)
+
+
+def ages_in_months(birth_dates, as_of):
+    years = np.fromiter((item.year for item in birth_dates), dtype=np.int64, count=len(birth_dates))
+    months = np.fromiter((item.month for item in birth_dates), dtype=np.int64, count=len(birth_dates))
+    days = np.fromiter((item.day for item in birth_dates), dtype=np.int64, count=len(birth_dates))
+    ages = (as_of.year - years) * 12 + (as_of.month - months)
+    ages -= (as_of.day < days).astype(np.int64)
+    return np.maximum(ages, 0)
+
+
+def evaluate_population(ages, dose_matrix, has_records, min_ages, max_ages):
+    missing = ~dose_matrix
+    due = ages[:, None] >= min_ages[None, :]
+    pending = missing & due
+    overdue = pending & (ages[:, None] > max_ages[None, :])
+
+    pending_count = pending.sum(axis=1)
+    overdue_count = overdue.sum(axis=1)
+    future_count = (missing & ~due).sum(axis=1)
+
+    status = np.full(len(ages), INCOMPLETO, dtype=np.int8)
+    status[overdue_count > 0] = ATRASADO
+    status[pending_count == 0] = EM_DIA
+    status[~has_records] = SEM_DADOS
+    return {
+        'status': status,
+        'pending_count': pending_count,
+        'overdue_count': overdue_count,
+        'future_count': future_count,
+    }
+
+
+def build_dose_arrays(student_ids, record_keys, schedule):
+    rules = schedule.rules if schedule else ()
+    rule_positions = {(rule.vaccine_id, rule.dose_number): index for index, rule in enumerate(rules)}
+
+    dose_matrix = np.zeros((len(student_ids), len(rules)), dtype=bool)
+    has_records = np.zeros(len(student_ids), dtype=bool)
+    for row, student_id in enumerate(student_ids):
+        keys = record_keys[student_id]
+        if not keys:
+            continue
+        has_records[row] = True
+        columns = [rule_positions[key] for key in keys if key in rule_positions]
+        dose_matrix[row, columns] = True
+
+    min_ages = np.fromiter((rule.min_age_months for rule in rules), dtype=np.int64, count=len(rules))
+    max_ages = np.fromiter((rule.max_age_months for rule in rules), dtype=np.int64, count=len(rules))
+    return dose_matrix, has_records, min_ages, max_ages
+
+
+def build_population_arrays(student_ids, schedule, vaccine_id_set=None):
+    return build_dose_arrays(student_ids, load_record_keys(student_ids, vaccine_id_set), schedule)
+
+
+def summarize_statuses_vectorized(students, schedule=None, vaccine_ids=None, as_of=None):
+    students = list(students)
+    as_of = as_of or timezone.localdate()
+    vaccine_id_set = normalize_vaccine_ids(vaccine_ids)
+    compiled = resolve_schedule(schedule)
+    if compiled:
+        compiled = compiled.restricted_to(vaccine_id_set)
+
+    student_ids = [student.id for student in students]
+    ages = ages_in_months([student.birth_date for student in students], as_of)
+    dose_matrix, has_records, min_ages, max_ages = build_population_arrays(student_ids, compiled, vaccine_id_set)
+    result = evaluate_population(ages, dose_matrix, has_records, min_ages, max_ages)
+
+    labels = STATUS_LABELS[result['status']]
+    return {
+        student_id: {
+            'status': str(labels[row]),
+            'ageMonths': int(ages[row]),
+            'pendingCount': int(result['pending_count'][row]),
+            'overdueCount': int(result['overdue_count'][row]),
+            'futureCount': int(result['future_count'][row]),
+        }
+        for row, student_id in enumerate(student_ids)
+    }
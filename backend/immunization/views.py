@@ -1,8 +1,14 @@
-import csv
-
-from django.http import HttpResponse
+import json
+import re
+import tempfile
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
 from django.shortcuts import get_object_or_404
-from rest_framework import permissions, status, viewsets
+from rest_framework import mixins, permissions, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.serializers import ValidationError
 from rest_framework.response import Response
@@ -12,15 +18,26 @@ from accounts.models import User
 from accounts.permissions import is_admin, is_health_user, is_school_user
 from audit.services import create_audit_log
 from core.models import Student
-from core.services import age_in_months_from_birth_date, scope_students_for_user
-from immunization.models import Vaccine, VaccineDoseRule, VaccineScheduleVersion, VaccinationRecord
+from core.pagination import CursorPaginationMixin
+from core.services import parse_as_of, scope_students_for_user
+from immunization.export_jobs import export_job_path, request_export_job
+from immunization.exports import (
+    export_students_queryset,
+    iter_pending_export_csv,
+    parse_export_filters,
+    write_pending_export_parquet,
+)
+from immunization.models import ExportJob, Vaccine, VaccineDoseRule, VaccineScheduleVersion, VaccinationRecord
+from immunization.renderers import CsvExportRenderer, ExportContentNegotiation, ParquetExportRenderer
 from immunization.serializers import (
+    ExportJobSerializer,
     VaccineDoseRuleSerializer,
     VaccineScheduleVersionSerializer,
     VaccineSerializer,
     VaccinationRecordSerializer,
 )
-from immunization.services import build_student_immunization_status
+from immunization.simulation import iter_schedule_simulation, simulate_schedule_change
+from immunization.status_store import refresh_student_statuses
 
 
 class IsAdminRole(permissions.BasePermission):
@@ -51,6 +68,29 @@ class VaccineScheduleVersionViewSet(viewsets.ModelViewSet):
         instance = serializer.save(updated_by=self.request.user)
         create_audit_log(self.request.user, 'schedule_updated', 'VaccineScheduleVersion', instance.id, {'code': instance.code})
 
+    @action(detail=True, methods=['get'], url_path='simulation')
+    def simulation(self, request, pk=None):
+        schedule = self.get_object()
+        if schedule.is_active:
+            raise ValidationError({'detail': 'O calendario ja esta ativo; selecione um calendario candidato inativo.'})
+
+        students = scope_students_for_user(request.user, Student.objects.all())
+        school_id = request.query_params.get('schoolId')
+        if school_id:
+            if not school_id.isdigit():
+                raise ValidationError({'schoolId': 'schoolId deve ser um valor numerico valido.'})
+            students = students.filter(school_id=school_id)
+        as_of = parse_as_of(request.query_params)
+
+        if request.query_params.get('stream') in ('1', 'true'):
+            # Uma linha JSON por lote (matriz parcial e deltas por escola) e uma linha final com o resumo.
+            events = iter_schedule_simulation(students, schedule, as_of=as_of)
+            return StreamingHttpResponse(
+                (json.dumps(event, cls=DjangoJSONEncoder) + '\n' for event in events),
+                content_type='application/x-ndjson',
+            )
+        return Response(simulate_schedule_change(students, schedule, as_of=as_of))
+
 
 class VaccineDoseRuleViewSet(viewsets.ModelViewSet):
     queryset = VaccineDoseRule.objects.select_related('vaccine', 'schedule_version').all()
@@ -78,9 +118,10 @@ class VaccineDoseRuleViewSet(viewsets.ModelViewSet):
         )
 
 
-class VaccinationRecordViewSet(viewsets.ModelViewSet):
+class VaccinationRecordViewSet(CursorPaginationMixin, viewsets.ModelViewSet):
     queryset = VaccinationRecord.objects.select_related('student', 'vaccine', 'student__school').all()
     serializer_class = VaccinationRecordSerializer
+    cursor_ordering = ('-application_date', 'id')
 
     def get_permissions(self):
         return [permissions.IsAuthenticated()]
@@ -100,7 +141,9 @@ class VaccinationRecordViewSet(viewsets.ModelViewSet):
             raise ValidationError({'student': 'Este campo e obrigatorio.'})
         if is_school_user(self.request.user) and student.school_id != self.request.user.school_id:
             raise PermissionDenied('Acesso negado para estudante de outra escola.')
-        instance = serializer.save(created_by=self.request.user, updated_by=self.request.user)
+        with transaction.atomic():
+            instance = serializer.save(created_by=self.request.user, updated_by=self.request.user)
+            refresh_student_statuses([instance.student_id])
         create_audit_log(
             self.request.user,
             'vaccination_record_created',
@@ -113,7 +156,10 @@ class VaccinationRecordViewSet(viewsets.ModelViewSet):
         record = serializer.instance
         if is_school_user(self.request.user) and record.student.school_id != self.request.user.school_id:
             raise PermissionDenied('Acesso negado para estudante de outra escola.')
-        instance = serializer.save(updated_by=self.request.user)
+        previous_student_id = record.student_id
+        with transaction.atomic():
+            instance = serializer.save(updated_by=self.request.user)
+            refresh_student_statuses({previous_student_id, instance.student_id})
         create_audit_log(
             self.request.user,
             'vaccination_record_updated',
@@ -132,7 +178,9 @@ class VaccinationRecordViewSet(viewsets.ModelViewSet):
             instance.id,
             {'student_id': instance.student_id, 'vaccine_id': instance.vaccine_id, 'dose_number': instance.dose_number},
         )
-        instance.delete()
+        with transaction.atomic():
+            instance.delete()
+            refresh_student_statuses([instance.student_id])
 
 
 class ScheduleRulesView(APIView):
@@ -191,101 +239,116 @@ class ScheduleRuleDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-def _filter_students_for_export(request, students):
-    q = request.query_params.get('q')
-    school_id = request.query_params.get('schoolId')
-    status_filter = request.query_params.get('status')
-    age_min = request.query_params.get('ageMin')
-    age_max = request.query_params.get('ageMax')
-    sex = request.query_params.get('sex')
-    vaccine_id = request.query_params.get('vaccineId')
-
-    try:
-        age_min_value = int(age_min) if age_min is not None else None
-        age_max_value = int(age_max) if age_max is not None else None
-        vaccine_id_value = int(vaccine_id) if vaccine_id not in (None, '') else None
-    except (TypeError, ValueError):
-        raise ValidationError({'detail': 'ageMin, ageMax e vaccineId devem ser valores numéricos válidos.'})
-
-    result = []
-    for student in students:
-        if q and q.lower() not in student.full_name.lower():
-            continue
-        if school_id and str(student.school_id) != str(school_id):
-            continue
-
-        age_months = age_in_months_from_birth_date(student.birth_date)
-        if age_min_value is not None and age_months < age_min_value:
-            continue
-        if age_max_value is not None and age_months > age_max_value:
-            continue
-        if sex and student.sex != sex:
-            continue
-
-        status_data = build_student_immunization_status(
-            student,
-            vaccine_ids={vaccine_id_value} if vaccine_id_value else None,
-        )
-        if status_filter and status_data['status'] != status_filter:
-            continue
-
-        result.append((student, status_data))
-
-    return result
-
-
-def _anonymize_name_to_initials(full_name: str):
-    parts = [chunk for chunk in (full_name or '').strip().split() if chunk]
-    if not parts:
-        return ''
-    return '.'.join(part[0].upper() for part in parts)
-
-
 class ExportStudentsPendingCsvView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    # ?format=csv|parquet (ou o Accept) escolhe o renderer e, com ele, o arquivo gerado.
+    renderer_classes = [CsvExportRenderer, ParquetExportRenderer]
+    content_negotiation_class = ExportContentNegotiation
 
     def get(self, request):
         user = request.user
         if not (is_admin(user) or is_health_user(user) or is_school_user(user)):
             raise PermissionDenied('Sem permissao para exportacao.')
 
-        students = scope_students_for_user(user, Student.objects.select_related('school').all())
-        rows = _filter_students_for_export(request, students)
-        anonymized = str(request.query_params.get('anonymized', 'false')).lower() == 'true'
+        filters = parse_export_filters(request.query_params)
+        as_of = timezone.localdate()
+        students = export_students_queryset(user, filters, as_of)
 
-        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        if request.accepted_renderer.format == ParquetExportRenderer.format:
+            return self._parquet_response(students, filters, as_of)
+
+        response = StreamingHttpResponse(iter_pending_export_csv(students, filters, as_of=as_of), content_type='text/csv; charset=utf-8')
         response['Content-Disposition'] = 'attachment; filename="students_pending.csv"'
-        writer = csv.writer(response, delimiter=';')
-        writer.writerow(
-            [
-                'student_id',
-                'student_name',
-                'school',
-                'status',
-                'age_months',
-                'vaccine_code',
-                'vaccine_name',
-                'dose_number',
-                'pending_status',
-            ]
+        return response
+
+    def _parquet_response(self, students, filters, as_of):
+        # Arquivo anonimo: o sistema operacional o remove quando o FileResponse fecha o handle.
+        handle = tempfile.TemporaryFile(suffix='.parquet')
+        try:
+            write_pending_export_parquet(students, filters, handle, as_of=as_of)
+            handle.seek(0)
+        except Exception:
+            handle.close()
+            raise
+        return FileResponse(
+            handle,
+            as_attachment=True,
+            filename='students_pending.parquet',
+            content_type='application/vnd.apache.parquet',
         )
 
-        for student, status_data in rows:
-            if not status_data['pending']:
-                continue
-            for pending in status_data['pending']:
-                writer.writerow(
-                    [
-                        student.id,
-                        _anonymize_name_to_initials(student.full_name) if anonymized else student.full_name,
-                        student.school.name,
-                        status_data['status'],
-                        status_data['ageMonths'],
-                        pending['vaccineCode'],
-                        pending['vaccineName'],
-                        pending['doseNumber'],
-                        pending['status'],
-                    ]
-                )
 
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def _iter_file_range(path, start, length):
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = handle.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _ranged_file_response(request, path, content_type, filename):
+    size = path.stat().st_size
+    match = RANGE_PATTERN.match(request.headers.get('Range', '').strip())
+    if not match or not any(match.groups()):
+        response = FileResponse(open(path, 'rb'), content_type=content_type, as_attachment=True, filename=filename)
+        response['Accept-Ranges'] = 'bytes'
         return response
+
+    start_raw, end_raw = match.groups()
+    if start_raw:
+        start = int(start_raw)
+        end = min(int(end_raw), size - 1) if end_raw else size - 1
+    else:
+        start = max(size - int(end_raw), 0)
+        end = size - 1
+    if start >= size or start > end:
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    length = end - start + 1
+    response = StreamingHttpResponse(_iter_file_range(path, start, length), status=status.HTTP_206_PARTIAL_CONTENT, content_type=content_type)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+class ExportJobViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    serializer_class = ExportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        if not (is_admin(user) or is_health_user(user) or is_school_user(user)):
+            raise PermissionDenied('Sem permissao para exportacao.')
+        queryset = ExportJob.objects.all()
+        if is_admin(user):
+            return queryset
+        return queryset.filter(scope_role=user.role, scope_school_id=user.school_id)
+
+    def create(self, request):
+        self.get_queryset()
+        filters = parse_export_filters(request.data)
+        job, created = request_export_job(request.user, filters, as_of=parse_as_of(request.data))
+        serializer = self.get_serializer(job)
+        return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], url_path='download')
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != ExportJob.StatusChoices.CONCLUIDO:
+            return Response({'detail': 'Exportacao ainda nao concluida.'}, status=status.HTTP_409_CONFLICT)
+        path = export_job_path(job)
+        if not path.exists():
+            return Response({'detail': 'Arquivo de exportacao nao encontrado.'}, status=status.HTTP_410_GONE)
+        return _ranged_file_response(request, path, 'application/gzip', path.name)
@@ -0,0 +1,68 @@
+import random
+
+import pytest
+from django.core.cache import caches
+
+from accounts.models import User
+from analytics_app.cache import DASHBOARD_CACHE_ALIAS
+from analytics_app.models import DashboardPreference
+from analytics_app.services import (
+    _add_to_age_histogram,
+    age_histogram_prefix_sums,
+    apply_age_buckets,
+    new_age_histogram,
+    normalize_age_buckets,
+)
+from tests.factories import StudentFactory, UserFactory
+
+
+def _scan_label(age_months, age_buckets):
+    for bucket in age_buckets:
+        if bucket['minMonths'] <= age_months <= bucket['maxMonths']:
+            return bucket['label']
+    return age_buckets[-1]['label']
+
+
+def test_prefix_sum_buckets_match_linear_scan():
+    rng = random.Random(7)
+    for _ in range(200):
+        buckets = normalize_age_buckets(
+            [
+                {'label': rng.choice('abcdef'), 'minMonths': low, 'maxMonths': low + rng.randint(0, 700)}
+                for low in (rng.randint(0, 400) for _ in range(rng.randint(1, 6)))
+            ]
+        )
+        histogram = new_age_histogram()
+        expected = {bucket['label']: {'ageBucket': bucket['label'], 'pendingCount': 0, 'overdueCount': 0, 'upToDateCount': 0} for bucket in buckets}
+        for _ in range(100):
+            age, up_to_date, pending, overdue = rng.choice([rng.randint(0, 999), 1000]), rng.randint(0, 1), rng.randint(0, 3), rng.randint(0, 3)
+            _add_to_age_histogram(histogram, age, up_to_date, pending, overdue)
+            entry = expected[_scan_label(age, buckets)]
+            entry['upToDateCount'] += up_to_date
+            entry['pendingCount'] += pending
+            entry['overdueCount'] += overdue
+
+        assert apply_age_buckets(age_histogram_prefix_sums(histogram), buckets) == list(expected.values())
+
+
+@pytest.mark.django_db
+def test_users_with_different_buckets_share_one_computation(api_client):
+    StudentFactory.create_batch(3)
+    first_user = UserFactory(role=User.RoleChoices.SAUDE, school=None)
+    second_user = UserFactory(role=User.RoleChoices.SAUDE, school=None)
+    DashboardPreference.objects.create(
+        user=second_user,
+        age_buckets_json=[{'label': 'Ate 2 anos', 'minMonths': 0, 'maxMonths': 23}, {'label': 'Demais', 'minMonths': 24, 'maxMonths': 999}],
+    )
+
+    api_client.force_authenticate(user=first_user)
+    default_layout = api_client.get('/api/dashboards/age-distribution/')
+    api_client.force_authenticate(user=second_user)
+    custom_layout = api_client.get('/api/dashboards/age-distribution/')
+
+    assert len(default_layout.data['items']) == 6
+    assert [item['ageBucket'] for item in custom_layout.data['items']] == ['Ate 2 anos', 'Demais']
+    assert sum(item['pendingCount'] for item in custom_layout.data['items']) == sum(item['pendingCount'] for item in default_layout.data['items'])
+    stats = caches[DASHBOARD_CACHE_ALIAS]
+    assert stats.get('dashboard:stats:misses') == 1
+    assert stats.get('dashboard:stats:hits') == 1
@@ -251,13 +251,13 @@ def test_export_csv_semicolon_and_anonymized(api_client, api_setup):
 
     response = api_client.get(f"/api/exports/students-pending.csv?vaccineId={api_setup['vaccine_hpv'].id}")
     assert response.status_code == 200
-    content = response.content.decode('utf-8')
+    content = b''.join(response.streaming_content).decode('utf-8')
     assert 'student_id;student_name;school;status' in content
     assert ';HPV;' in content
 
     anonymized = api_client.get('/api/exports/students-pending.csv?sex=F&anonymized=true')
     assert anonymized.status_code == 200
-    anonymized_content = anonymized.content.decode('utf-8')
+    anonymized_content = b''.join(anonymized.streaming_content).decode('utf-8')
     assert 'M.S.S' in anonymized_content
 
 
@@ -281,7 +281,7 @@ def test_duplicate_rule_returns_friendly_error(api_client, api_setup):
 
 
 @pytest.mark.django_db
-def test_audit_and_error_logs_admin_only(api_client, api_setup):
+def test_audit_and_error_logs_admin_only(api_client, api_setup, django_capture_on_commit_callbacks):
     api_client.force_authenticate(user=api_setup['school_user'])
     forbidden_audit = api_client.get('/api/audit-logs/')
     forbidden_error = api_client.get('/api/error-logs/')
@@ -289,16 +289,17 @@ def test_audit_and_error_logs_admin_only(api_client, api_setup):
     assert forbidden_error.status_code == 403
 
     api_client.force_authenticate(user=api_setup['admin'])
-    create_student = api_client.post(
-        '/api/students/',
-        {
-            'school': api_setup['school_a'].id,
-            'full_name': 'Audit Student',
-            'birth_date': str(timezone.localdate() - datetime.timedelta(days=365 * 10)),
-            'sex': 'F',
-        },
-        format='json',
-    )
+    with django_capture_on_commit_callbacks(execute=True):
+        create_student = api_client.post(
+            '/api/students/',
+            {
+                'school': api_setup['school_a'].id,
+                'full_name': 'Audit Student',
+                'birth_date': str(timezone.localdate() - datetime.timedelta(days=365 * 10)),
+                'sex': 'F',
+            },
+            format='json',
+        )
     assert create_student.status_code == 201
 
     assert AuditLog.objects.filter(action='student_created', entity_type='Student').exists()
@@ -0,0 +1,136 @@
+import time
+
+import pytest
+from django.db import transaction
+
+from accounts.models import User
+from audit.buffer import audit_buffer
+from audit.models import AuditLog
+from audit.services import create_audit_log
+from tests.factories import UserFactory
+
+
+@pytest.fixture
+def admin():
+    return UserFactory(role=User.RoleChoices.ADMIN)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_events_are_flushed_in_bulk_when_buffer_is_full(settings, admin):
+    settings.AUDIT_BUFFER_MAX_SIZE = 3
+
+    create_audit_log(admin, 'teste', 'School', 1)
+    create_audit_log(admin, 'teste', 'School', 2)
+    assert AuditLog.objects.count() == 0
+    assert audit_buffer.pending() == 2
+
+    create_audit_log(admin, 'teste', 'School', 3)
+    assert audit_buffer.pending() == 0
+    assert sorted(AuditLog.objects.values_list('entity_id', flat=True)) == ['1', '2', '3']
+
+
+@pytest.mark.django_db(transaction=True)
+def test_shutdown_writes_every_pending_event_with_original_timestamp(admin):
+    created = [create_audit_log(admin, 'teste', 'Student', index, {'n': index}) for index in range(25)]
+    assert AuditLog.objects.count() == 0
+
+    time.sleep(0.01)
+    assert audit_buffer.shutdown() == 25
+
+    stored = {log.entity_id: log for log in AuditLog.objects.all()}
+    assert len(stored) == 25
+    for entry in created:
+        assert stored[entry.entity_id].timestamp == entry.timestamp
+        assert stored[entry.entity_id].details_json == entry.details_json
+
+
+@pytest.mark.django_db(transaction=True)
+def test_events_inside_transaction_are_written_at_commit_only(admin):
+    with transaction.atomic():
+        create_audit_log(admin, 'confirmado', 'Student', 1)
+        assert audit_buffer.pending() == 0
+    assert AuditLog.objects.filter(action='confirmado').count() == 1
+
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            create_audit_log(admin, 'desfeito', 'Student', 2)
+            raise RuntimeError
+    audit_buffer.flush()
+    assert not AuditLog.objects.filter(action='desfeito').exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_failed_rows_go_back_to_the_queue_and_are_written_on_a_later_flush(admin, monkeypatch, caplog):
+    for index in range(1, 4):
+        create_audit_log(admin, 'teste', 'School', index)
+
+    original = AuditLog.objects.bulk_create
+    rejecting = {'2'}
+
+    def rejecting_bulk_create(entries, *args, **kwargs):
+        if any(entry.entity_id in rejecting for entry in entries):
+            raise RuntimeError('banco indisponivel')
+        return original(entries, *args, **kwargs)
+
+    monkeypatch.setattr(AuditLog.objects, 'bulk_create', rejecting_bulk_create)
+    assert audit_buffer.flush() == 2
+    assert audit_buffer.pending() == 1
+    assert sorted(AuditLog.objects.values_list('entity_id', flat=True)) == ['1', '3']
+    assert 'School #2 (tentativa 1 de 5)' in caplog.text
+
+    # Enquanto espera para tentar de novo, eventos novos nao disparam flush na requisicao.
+    create_audit_log(admin, 'teste', 'School', 4)
+    assert audit_buffer.pending() == 2
+
+    rejecting.clear()
+    assert audit_buffer.flush() == 2
+    assert audit_buffer.pending() == 0
+    assert sorted(AuditLog.objects.values_list('entity_id', flat=True)) == ['1', '2', '3', '4']
+
+
+@pytest.mark.django_db(transaction=True)
+def test_event_is_given_up_loudly_after_max_retries(settings, admin, monkeypatch, caplog):
+    settings.AUDIT_BUFFER_MAX_RETRIES = 3
+    create_audit_log(admin, 'teste', 'School', 9, {'motivo': 'x'})
+
+    def failing_bulk_create(entries, *args, **kwargs):
+        raise RuntimeError('linha invalida')
+
+    monkeypatch.setattr(AuditLog.objects, 'bulk_create', failing_bulk_create)
+    for _ in range(2):
+        assert audit_buffer.flush() == 0
+        assert audit_buffer.pending() == 1
+    assert 'PERDIDO' not in caplog.text
+
+    assert audit_buffer.flush() == 0
+    assert audit_buffer.pending() == 0
+    lost = [record for record in caplog.records if record.levelname == 'CRITICAL']
+    assert len(lost) == 1
+    assert 'School #9' in lost[0].getMessage()
+    assert "'motivo': 'x'" in lost[0].getMessage()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_background_thread_flushes_on_interval(settings, admin):
+    settings.AUDIT_BUFFER_FLUSH_INTERVAL = 0.05
+    audit_buffer.background_enabled = True
+
+    create_audit_log(admin, 'teste', 'School', 1)
+    deadline = time.monotonic() + 5
+    while audit_buffer.pending() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    audit_buffer.stop()
+
+    assert audit_buffer.pending() == 0
+    assert AuditLog.objects.count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_audit_log_endpoint_flushes_pending_events(api_client, admin):
+    create_audit_log(admin, 'teste', 'School', 7)
+    api_client.force_authenticate(user=admin)
+
+    response = api_client.get('/api/audit-logs/')
+
+    assert response.status_code == 200
+    assert [item['entity_id'] for item in response.data['results']] == ['7']
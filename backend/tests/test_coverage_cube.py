@@ -0,0 +1,203 @@
+import datetime
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from accounts.models import User
+from analytics_app.cube import build_coverage_cube, prune_coverage_cube, stale_cube_school_ids
+from analytics_app.models import CoverageCube, CoverageCubeSlice, CoverageSnapshot
+from analytics_app.services import aggregate_dashboard, filter_students_for_dashboard, summarize_dashboard_from_cube, with_age_buckets
+from core.models import Student
+from tests.factories import (
+    SchoolFactory,
+    StudentFactory,
+    UserFactory,
+    VaccinationRecordFactory,
+    VaccineDoseRuleFactory,
+    VaccineFactory,
+    VaccineScheduleVersionFactory,
+)
+
+
+@pytest.fixture
+def cube_data():
+    schedule = VaccineScheduleVersionFactory(is_active=True)
+    dtp = VaccineFactory(code='DTP', name='DTP')
+    bcg = VaccineFactory(code='BCG', name='BCG')
+    VaccineDoseRuleFactory(schedule_version=schedule, vaccine=dtp, dose_number=1, recommended_min_age_months=2, recommended_max_age_months=3)
+    VaccineDoseRuleFactory(schedule_version=schedule, vaccine=bcg, dose_number=1, recommended_min_age_months=0, recommended_max_age_months=1)
+    schools = [SchoolFactory(name='Escola Norte', territory_ref='T1'), SchoolFactory(name='Escola Sul', territory_ref='T2')]
+    today = timezone.localdate()
+    students = [
+        StudentFactory(
+            school=schools[index % 2],
+            sex=Student.SexChoices.FEMALE if index % 3 else Student.SexChoices.MALE,
+            birth_date=today - datetime.timedelta(days=30 * (1 + index * 7)),
+        )
+        for index in range(8)
+    ]
+    VaccinationRecordFactory(student=students[1], vaccine=dtp, dose_number=1)
+    VaccinationRecordFactory(student=students[2], vaccine=bcg, dose_number=1)
+    VaccinationRecordFactory(student=students[3], vaccine=dtp, dose_number=1)
+    VaccinationRecordFactory(student=students[3], vaccine=bcg, dose_number=1)
+    return {'schools': schools, 'students': students, 'dtp': dtp, 'bcg': bcg}
+
+
+def _live(filters):
+    students = filter_students_for_dashboard(
+        Student.objects.select_related('school'),
+        school_id=filters.get('schoolId'),
+        status=filters.get('status'),
+        age_min=filters.get('ageMin'),
+        age_max=filters.get('ageMax'),
+        sex=filters.get('sex'),
+        vaccine_id=filters.get('vaccineId'),
+    )
+    return aggregate_dashboard(students, vaccine_id=filters.get('vaccineId'))
+
+
+def _normalized(data):
+    if 'ageHistogram' in data:
+        data = with_age_buckets(data)
+    return {
+        'coverage': sorted(data['coverage'], key=lambda item: item['schoolId']),
+        'ranking': sorted(data['ranking'], key=lambda item: item['schoolId']),
+        'ageDistribution': data['ageDistribution'],
+    }
+
+
+@pytest.mark.django_db
+def test_cube_matches_live_aggregation_across_filters(cube_data):
+    build_coverage_cube()
+    admin = UserFactory(role=User.RoleChoices.ADMIN)
+    dtp_id = str(cube_data['dtp'].id)
+    filter_sets = [
+        {},
+        {'vaccineId': dtp_id},
+        {'status': 'ATRASADO'},
+        {'status': 'EM_DIA', 'vaccineId': dtp_id},
+        {'sex': Student.SexChoices.MALE},
+        {'ageMin': '10', 'ageMax': '40'},
+        {'schoolId': str(cube_data['schools'][1].id)},
+    ]
+
+    for filters in filter_sets:
+        from_cube = summarize_dashboard_from_cube(admin, filters)
+        assert from_cube is not None
+        assert _normalized(from_cube) == _normalized(_live(filters)), filters
+
+
+@pytest.mark.django_db
+def test_schools_with_the_same_name_stay_separate_on_both_paths(cube_data):
+    twin = SchoolFactory(name='Escola Norte', territory_ref='T3')
+    StudentFactory(school=twin, birth_date=timezone.localdate() - datetime.timedelta(days=30 * 12))
+    build_coverage_cube()
+    admin = UserFactory(role=User.RoleChoices.ADMIN)
+
+    live = _live({})
+    from_cube = with_age_buckets(summarize_dashboard_from_cube(admin, {}))
+
+    north = cube_data['schools'][0]
+    expected_order = [north.id, twin.id, cube_data['schools'][1].id]
+    assert [item['schoolId'] for item in live['coverage']] == expected_order
+    assert live['coverage'] == from_cube['coverage']
+    assert [item['totalStudents'] for item in live['coverage']] == [4, 1, 4]
+
+
+@pytest.mark.django_db
+def test_writes_mark_school_dirty_and_are_merged_live(cube_data):
+    build_coverage_cube()
+    admin = UserFactory(role=User.RoleChoices.ADMIN)
+    north, south = cube_data['schools']
+    assert stale_cube_school_ids() == []
+
+    VaccinationRecordFactory(student=cube_data['students'][0], vaccine=cube_data['dtp'], dose_number=1)
+    StudentFactory(school=north)
+
+    assert stale_cube_school_ids() == [north.id]
+    assert _normalized(summarize_dashboard_from_cube(admin, {})) == _normalized(_live({}))
+
+    StudentFactory(school=south)
+    assert summarize_dashboard_from_cube(admin, {}) is None
+
+    call_command('build_coverage_cube', '--stale')
+    assert stale_cube_school_ids() == []
+    assert _normalized(summarize_dashboard_from_cube(admin, {})) == _normalized(_live({}))
+
+
+@pytest.mark.django_db
+def test_writes_only_stamp_slices_and_bulk_deletes_are_caught_by_signals(cube_data, django_capture_on_commit_callbacks):
+    build_coverage_cube()
+    north, south = cube_data['schools']
+    built_rows = CoverageCube.objects.count()
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        VaccinationRecordFactory(student=cube_data['students'][0], vaccine=cube_data['bcg'], dose_number=1)
+    assert callbacks == []
+    assert stale_cube_school_ids() == [north.id]
+    assert CoverageCube.objects.count() == built_rows
+
+    Student.objects.filter(school=south).delete()
+    assert stale_cube_school_ids() == [north.id, south.id]
+
+
+@pytest.mark.django_db
+def test_cube_rows_are_pruned_once_past_dates_are_snapshotted(cube_data):
+    today = timezone.localdate()
+    yesterday = today - datetime.timedelta(days=1)
+    build_coverage_cube(as_of=yesterday)
+    build_coverage_cube(as_of=today)
+    assert prune_coverage_cube() == 0
+
+    call_command('snapshot_coverage', '--date', yesterday.isoformat())
+
+    assert CoverageSnapshot.objects.filter(snapshot_date=yesterday).exists()
+    assert not CoverageCube.objects.filter(snapshot_date=yesterday).exists()
+    assert not CoverageCubeSlice.objects.filter(snapshot_date=yesterday).exists()
+    assert CoverageCube.objects.filter(snapshot_date=today).exists()
+
+
+@pytest.mark.django_db
+def test_stale_rebuild_only_touches_dirty_schools(cube_data):
+    build_coverage_cube()
+    north, south = cube_data['schools']
+    untouched_ids = set(CoverageCube.objects.filter(school=south).values_list('id', flat=True))
+
+    cube_data['students'][0].delete()
+    call_command('build_coverage_cube', '--stale')
+
+    assert set(CoverageCube.objects.filter(school=south).values_list('id', flat=True)) == untouched_ids
+    assert CoverageCubeSlice.objects.get(school=north).dirty_at < CoverageCubeSlice.objects.get(school=north).built_at
+
+
+@pytest.mark.django_db
+def test_cube_is_skipped_for_text_search_scope_and_schedule_changes(cube_data):
+    build_coverage_cube()
+    admin = UserFactory(role=User.RoleChoices.ADMIN)
+    assert summarize_dashboard_from_cube(admin, {'q': 'aluno'}) is None
+
+    school_user = UserFactory(role=User.RoleChoices.ESCOLA, school=cube_data['schools'][0])
+    scoped = summarize_dashboard_from_cube(school_user, {})
+    assert [item['schoolId'] for item in scoped['coverage']] == [cube_data['schools'][0].id]
+
+    VaccineDoseRuleFactory(
+        schedule_version=cube_data['dtp'].dose_rules.get().schedule_version,
+        vaccine=cube_data['dtp'],
+        dose_number=2,
+        recommended_min_age_months=4,
+        recommended_max_age_months=5,
+    )
+    assert summarize_dashboard_from_cube(admin, {}) is None
+
+
+@pytest.mark.django_db
+def test_dashboard_endpoint_serves_cube_results(api_client, cube_data):
+    build_coverage_cube()
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.SAUDE, school=None))
+
+    response = api_client.get('/api/dashboards/schools/coverage/', {'vaccineId': cube_data['dtp'].id})
+
+    assert response.status_code == 200
+    assert sorted(response.data['items'], key=lambda item: item['schoolId']) == _normalized(_live({'vaccineId': str(cube_data['dtp'].id)}))['coverage']
+    assert api_client.get('/api/dashboards/schools/coverage/', {'ageMin': 'x'}).status_code == 400
@@ -0,0 +1,114 @@
+import datetime
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from accounts.models import User
+from analytics_app.models import CoverageSnapshot
+from analytics_app.trends import build_coverage_snapshot
+from tests.factories import (
+    SchoolFactory,
+    StudentFactory,
+    UserFactory,
+    VaccinationRecordFactory,
+    VaccineDoseRuleFactory,
+    VaccineFactory,
+    VaccineScheduleVersionFactory,
+)
+
+
+@pytest.fixture
+def trend_data():
+    schedule = VaccineScheduleVersionFactory(is_active=True)
+    dtp = VaccineFactory(code='DTP', name='DTP')
+    VaccineDoseRuleFactory(schedule_version=schedule, vaccine=dtp, dose_number=1, recommended_min_age_months=2, recommended_max_age_months=3)
+    schools = [SchoolFactory(name='Escola Norte'), SchoolFactory(name='Escola Sul')]
+    birth_date = timezone.localdate() - datetime.timedelta(days=30 * 20)
+    students = [StudentFactory(school=schools[index % 2], birth_date=birth_date) for index in range(4)]
+    VaccinationRecordFactory(student=students[0], vaccine=dtp, dose_number=1)
+    return {'schools': schools, 'students': students, 'dtp': dtp}
+
+
+def _seed_snapshot(day, school, up_to_date, delayed, vaccine=None):
+    CoverageSnapshot.objects.create(
+        snapshot_date=day,
+        school=school,
+        vaccine=vaccine,
+        total_students=up_to_date + delayed,
+        up_to_date_count=up_to_date,
+        delayed_count=delayed,
+    )
+
+
+@pytest.mark.django_db
+def test_snapshot_command_is_idempotent_per_day(trend_data):
+    call_command('snapshot_coverage')
+    today = timezone.localdate()
+    ids = set(CoverageSnapshot.objects.filter(snapshot_date=today).values_list('id', flat=True))
+    call_command('snapshot_coverage')
+
+    overall = CoverageSnapshot.objects.filter(snapshot_date=today, vaccine__isnull=True)
+    assert overall.count() == 2
+    north = overall.get(school=trend_data['schools'][0])
+    assert (north.total_students, north.up_to_date_count) == (2, 1)
+    assert CoverageSnapshot.objects.filter(snapshot_date=today, vaccine=trend_data['dtp']).count() == 2
+
+    VaccinationRecordFactory(student=trend_data['students'][2], vaccine=trend_data['dtp'], dose_number=1)
+    assert build_coverage_snapshot() == 4
+    assert overall.get(school=trend_data['schools'][0]).up_to_date_count == 2
+    # Reexecucao atualiza as linhas existentes no lugar.
+    assert set(CoverageSnapshot.objects.filter(snapshot_date=today).values_list('id', flat=True)) == ids
+
+    trend_data['students'][1].delete()
+    trend_data['students'][3].delete()
+    assert build_coverage_snapshot() == 2
+    assert not CoverageSnapshot.objects.filter(snapshot_date=today, school=trend_data['schools'][1]).exists()
+
+
+@pytest.mark.django_db
+def test_trends_endpoint_sums_schools_and_downsamples(api_client, trend_data):
+    north, south = trend_data['schools']
+    start = datetime.date(2024, 1, 1)
+    for offset in range(0, 200):
+        day = start + datetime.timedelta(days=offset)
+        _seed_snapshot(day, north, up_to_date=offset % 5, delayed=1)
+        _seed_snapshot(day, south, up_to_date=1, delayed=1)
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.SAUDE, school=None))
+
+    daily = api_client.get('/api/dashboards/trends/', {'dateFrom': '2024-01-01', 'dateTo': '2024-01-10'})
+    assert daily.status_code == 200
+    assert daily.data['granularity'] == 'day'
+    assert len(daily.data['items']) == 10
+    assert daily.data['items'][2]['EM_DIA'] == 3
+    assert daily.data['items'][2]['totalStudents'] == 5
+
+    weekly = api_client.get('/api/dashboards/trends/', {'dateFrom': '2024-01-01', 'dateTo': '2024-06-30'})
+    assert weekly.data['granularity'] == 'week'
+    assert weekly.data['items'][0]['periodStart'] == datetime.date(2024, 1, 1)
+    assert weekly.data['items'][0]['snapshotDate'] == datetime.date(2024, 1, 7)
+
+    monthly = api_client.get('/api/dashboards/trends/', {'dateFrom': '2024-01-01', 'dateTo': '2024-07-18', 'granularity': 'month'})
+    assert [item['periodStart'].month for item in monthly.data['items']] == [1, 2, 3, 4, 5, 6, 7]
+    assert monthly.data['items'][0]['snapshotDate'] == datetime.date(2024, 1, 31)
+
+
+@pytest.mark.django_db
+def test_trends_respect_school_scope_and_validate_params(api_client, trend_data):
+    north, south = trend_data['schools']
+    day = datetime.date(2024, 3, 1)
+    _seed_snapshot(day, north, up_to_date=2, delayed=0)
+    _seed_snapshot(day, south, up_to_date=0, delayed=3)
+    _seed_snapshot(day, north, up_to_date=1, delayed=1, vaccine=trend_data['dtp'])
+
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.ESCOLA, school=north))
+    response = api_client.get('/api/dashboards/trends/', {'dateFrom': '2024-03-01', 'dateTo': '2024-03-01'})
+    assert response.data['items'][0]['totalStudents'] == 2
+    assert response.data['items'][0]['coveragePercent'] == 100.0
+    by_vaccine = api_client.get('/api/dashboards/trends/', {'dateFrom': '2024-03-01', 'dateTo': '2024-03-01', 'vaccineId': trend_data['dtp'].id})
+    assert by_vaccine.data['items'][0]['EM_DIA'] == 1
+    assert api_client.get('/api/dashboards/trends/', {'schoolId': south.id}).status_code == 403
+
+    assert api_client.get('/api/dashboards/trends/', {'dateFrom': '2024-03-02', 'dateTo': '2024-03-01'}).status_code == 400
+    assert api_client.get('/api/dashboards/trends/', {'dateFrom': 'ontem'}).status_code == 400
+    assert api_client.get('/api/dashboards/trends/', {'granularity': 'year'}).status_code == 400
@@ -0,0 +1,66 @@
+import datetime
+
+import pytest
+from django.utils import timezone
+
+from accounts.models import User
+from audit.models import AuditLog
+from immunization.models import VaccinationRecord
+from tests.factories import SchoolFactory, StudentFactory, UserFactory, VaccinationRecordFactory, VaccineFactory
+
+
+def _walk(api_client, url, params):
+    seen = []
+    response = api_client.get(url, params)
+    while True:
+        assert response.status_code == 200
+        assert 'count' not in response.data
+        seen.extend(row['id'] for row in response.data['results'])
+        if not response.data['next']:
+            return seen
+        response = api_client.get(response.data['next'])
+
+
+@pytest.mark.django_db
+def test_student_cursor_pages_follow_name_and_id_order(api_client):
+    school = SchoolFactory()
+    for index in range(7):
+        StudentFactory(school=school, full_name=f'Aluno {index % 3}')
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.ADMIN))
+
+    seen = _walk(api_client, '/api/students/', {'cursor': '', 'pageSize': 2})
+
+    expected = sorted(school.students.values_list('full_name', 'id'))
+    assert seen == [student_id for _, student_id in expected]
+
+    page_mode = api_client.get('/api/students/', {'pageSize': 3})
+    assert page_mode.data['count'] == 7
+    assert len(page_mode.data['results']) == 3
+
+
+@pytest.mark.django_db
+def test_vaccination_cursor_handles_ties_on_application_date(api_client):
+    vaccine = VaccineFactory()
+    day = timezone.localdate()
+    for index in range(5):
+        VaccinationRecordFactory(vaccine=vaccine, application_date=day - datetime.timedelta(days=index % 2))
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.ADMIN))
+
+    seen = _walk(api_client, '/api/vaccinations/', {'cursor': '', 'pageSize': 2})
+
+    assert seen == list(VaccinationRecord.objects.order_by('-application_date', 'id').values_list('id', flat=True))
+
+
+@pytest.mark.django_db
+def test_audit_log_cursor_caps_page_size_and_rejects_invalid_cursor(api_client, settings):
+    settings.MAX_PAGE_SIZE = 3
+    admin = UserFactory(role=User.RoleChoices.ADMIN)
+    for index in range(5):
+        AuditLog.objects.create(actor=admin, action='teste', entity_type='School', entity_id=str(index))
+    api_client.force_authenticate(user=admin)
+
+    first = api_client.get('/api/audit-logs/', {'cursor': '', 'pageSize': 50})
+    assert len(first.data['results']) == 3
+    assert len(_walk(api_client, '/api/audit-logs/', {'cursor': '', 'pageSize': 50})) == 5
+
+    assert api_client.get('/api/audit-logs/', {'cursor': 'nao-e-um-cursor'}).status_code == 404
@@ -0,0 +1,120 @@
+import datetime
+
+import pytest
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from analytics_app.cache import DASHBOARD_CACHE_ALIAS, normalize_dashboard_filters
+from core.models import SchoolDataVersion, Student
+from core.services import filter_students_queryset
+from tests.factories import (
+    SchoolFactory,
+    StudentFactory,
+    UserFactory,
+    VaccinationRecordFactory,
+    VaccineDoseRuleFactory,
+    VaccineFactory,
+    VaccineScheduleVersionFactory,
+)
+
+
+@pytest.fixture
+def dashboard_data():
+    schedule = VaccineScheduleVersionFactory(is_active=True)
+    dtp = VaccineFactory(code='DTP', name='DTP')
+    VaccineDoseRuleFactory(schedule_version=schedule, vaccine=dtp, dose_number=1, recommended_min_age_months=2, recommended_max_age_months=3)
+    schools = [SchoolFactory(name='Escola Leste'), SchoolFactory(name='Escola Oeste')]
+    students = [
+        StudentFactory(school=schools[index % 2], full_name=f'Aluno {index}', birth_date=timezone.localdate() - datetime.timedelta(days=30 * 20))
+        for index in range(4)
+    ]
+    return {'schedule': schedule, 'schools': schools, 'students': students, 'dtp': dtp}
+
+
+def _coverage_by_school(response):
+    return {item['schoolId']: item for item in response.data['items']}
+
+
+@pytest.mark.django_db
+def test_dashboard_results_are_cached_until_data_changes(api_client, dashboard_data, django_assert_max_num_queries):
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.SAUDE, school=None))
+    first = api_client.get('/api/dashboards/schools/coverage/', {'q': ' ÁLU '})
+    assert first.status_code == 200
+    assert normalize_dashboard_filters({'q': ' ÁLU '}) == normalize_dashboard_filters({'q': 'alu'})
+
+    with django_assert_max_num_queries(4):
+        cached = api_client.get('/api/dashboards/schools/coverage/', {'q': 'alu'})
+    assert cached.data == first.data
+    assert set(filter_students_queryset(Student.objects.all(), q=' ÁLU ')) == set(filter_students_queryset(Student.objects.all(), q='alu'))
+    assert normalize_dashboard_filters({'q': 'alu'}) != normalize_dashboard_filters({'q': 'alu no'})
+
+    student = dashboard_data['students'][0]
+    VaccinationRecordFactory(student=student, vaccine=dashboard_data['dtp'], dose_number=1)
+    refreshed = api_client.get('/api/dashboards/schools/coverage/', {'q': 'alu'})
+    assert _coverage_by_school(refreshed)[student.school_id]['EM_DIA'] == 1
+
+    rule = dashboard_data['schedule'].rules.get()
+    rule.recommended_min_age_months = 30
+    rule.save()
+    after_schedule_change = api_client.get('/api/dashboards/schools/coverage/', {'q': 'alu'})
+    assert _coverage_by_school(after_schedule_change)[student.school_id]['SEM_DADOS'] == 1
+
+    stats = caches[DASHBOARD_CACHE_ALIAS]
+    assert stats.get('dashboard:stats:hits') == 1
+    assert stats.get('dashboard:stats:misses') == 3
+
+
+@pytest.mark.django_db
+def test_dashboard_cache_is_scoped_per_school_user(api_client, dashboard_data):
+    school_a, school_b = dashboard_data['schools']
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.ESCOLA, school=school_a))
+    assert set(_coverage_by_school(api_client.get('/api/dashboards/schools/coverage/'))) == {school_a.id}
+
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.ESCOLA, school=school_b))
+    assert set(_coverage_by_school(api_client.get('/api/dashboards/schools/coverage/'))) == {school_b.id}
+    assert api_client.get('/api/dashboards/schools/coverage/', {'schoolId': school_a.id}).status_code == 403
+
+
+@pytest.mark.django_db
+def test_cache_stats_endpoint_is_admin_only(api_client, dashboard_data):
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.SAUDE, school=None))
+    api_client.get('/api/dashboards/schools/ranking/')
+    api_client.get('/api/dashboards/schools/ranking/')
+    assert api_client.get('/api/dashboards/cache-stats/').status_code == 403
+
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.ADMIN))
+    response = api_client.get('/api/dashboards/cache-stats/')
+    assert response.status_code == 200
+    assert response.data['hits'] == 1
+    assert response.data['misses'] == 1
+    assert response.data['hitRate'] == 0.5
+
+
+@pytest.mark.django_db(transaction=True)
+def test_database_cache_backend_is_shared(api_client, dashboard_data):
+    database_caches = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'dashboard': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'dashboard_cache'},
+    }
+    with override_settings(CACHES=database_caches):
+        call_command('createcachetable', verbosity=0)
+        api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.SAUDE, school=None))
+        first = api_client.get('/api/dashboards/schools/coverage/')
+        assert api_client.get('/api/dashboards/schools/coverage/').data == first.data
+        assert caches[DASHBOARD_CACHE_ALIAS].get('dashboard:stats:hits') == 1
+        caches[DASHBOARD_CACHE_ALIAS].clear()
+
+
+@pytest.mark.django_db
+def test_writes_only_bump_the_version_of_their_school(api_client, dashboard_data):
+    school_a, school_b = dashboard_data['schools']
+    before_a, before_b, before_all = SchoolDataVersion.current(school_a.id), SchoolDataVersion.current(school_b.id), SchoolDataVersion.current()
+
+    VaccinationRecordFactory(student=dashboard_data['students'][0], vaccine=dashboard_data['dtp'], dose_number=1)
+
+    assert SchoolDataVersion.current(school_a.id) != before_a
+    assert SchoolDataVersion.current(school_b.id) == before_b
+    assert SchoolDataVersion.current() != before_all
@@ -0,0 +1,72 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import User
+from analytics_app.models import DEFAULT_AGE_BUCKETS, DashboardPreference
+from analytics_app.services import LEGACY_AGE_BUCKETS, resolve_age_buckets
+from tests.factories import UserFactory
+
+CUSTOM_BUCKETS = [
+    {'label': 'Ate 2 anos', 'minMonths': 0, 'maxMonths': 23},
+    {'label': 'Demais', 'minMonths': 24, 'maxMonths': 999},
+]
+
+
+def _write_queries(captured):
+    return [query['sql'] for query in captured.captured_queries if query['sql'].split()[0].upper() in ('INSERT', 'UPDATE', 'DELETE')]
+
+
+def test_resolve_age_buckets_migrates_legacy_and_invalid_layouts():
+    assert resolve_age_buckets(LEGACY_AGE_BUCKETS) == DEFAULT_AGE_BUCKETS
+    assert resolve_age_buckets(None) == DEFAULT_AGE_BUCKETS
+    assert resolve_age_buckets(list(reversed(CUSTOM_BUCKETS))) == CUSTOM_BUCKETS
+
+
+@pytest.mark.django_db
+def test_preference_reads_do_not_write_and_are_cached(api_client):
+    user = UserFactory(role=User.RoleChoices.SAUDE, school=None)
+    DashboardPreference.objects.create(user=user, age_buckets_json=LEGACY_AGE_BUCKETS)
+    api_client.force_authenticate(user=user)
+
+    with CaptureQueriesContext(connection) as captured:
+        first = api_client.get('/api/dashboards/preferences/age-buckets/')
+        api_client.get('/api/dashboards/age-distribution/')
+    assert first.data['ageBuckets'] == DEFAULT_AGE_BUCKETS
+    assert _write_queries(captured) == []
+    assert DashboardPreference.objects.get(user=user).age_buckets_json == LEGACY_AGE_BUCKETS
+
+    with CaptureQueriesContext(connection) as captured:
+        api_client.get('/api/dashboards/preferences/age-buckets/')
+    assert [query for query in captured.captured_queries if 'dashboardpreference' in query['sql']] == []
+
+    other = UserFactory(role=User.RoleChoices.SAUDE, school=None)
+    api_client.force_authenticate(user=other)
+    assert api_client.get('/api/dashboards/preferences/age-buckets/').data['ageBuckets'] == DEFAULT_AGE_BUCKETS
+    assert not DashboardPreference.objects.filter(user=other).exists()
+
+
+@pytest.mark.django_db
+def test_put_invalidates_cached_buckets(api_client):
+    user = UserFactory(role=User.RoleChoices.SAUDE, school=None)
+    api_client.force_authenticate(user=user)
+    assert api_client.get('/api/dashboards/preferences/age-buckets/').data['ageBuckets'] == DEFAULT_AGE_BUCKETS
+
+    assert api_client.put('/api/dashboards/preferences/age-buckets/', {'ageBuckets': CUSTOM_BUCKETS}, format='json').status_code == 200
+
+    assert api_client.get('/api/dashboards/preferences/age-buckets/').data['ageBuckets'] == CUSTOM_BUCKETS
+    assert [item['ageBucket'] for item in api_client.get('/api/dashboards/age-distribution/').data['items']] == ['Ate 2 anos', 'Demais']
+
+
+@pytest.mark.django_db
+def test_cached_buckets_expire_for_writes_from_other_workers(api_client, settings):
+    settings.DASHBOARD_PREFERENCE_CACHE_TIMEOUT = 0
+    user = UserFactory(role=User.RoleChoices.SAUDE, school=None)
+    DashboardPreference.objects.create(user=user, age_buckets_json=[])
+    api_client.force_authenticate(user=user)
+    assert api_client.get('/api/dashboards/preferences/age-buckets/').data['ageBuckets'] == DEFAULT_AGE_BUCKETS
+
+    # update() nao passa por save(): simula a escrita atendida por outro worker, sem invalidar este cache.
+    DashboardPreference.objects.filter(user=user).update(age_buckets_json=CUSTOM_BUCKETS)
+
+    assert api_client.get('/api/dashboards/preferences/age-buckets/').data['ageBuckets'] == CUSTOM_BUCKETS
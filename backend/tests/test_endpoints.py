@@ -73,3 +73,42 @@ def test_coverage_dashboard_returns_aggregated_data(api_client, schedule_data):
     assert response.status_code == 200
     assert len(response.data['items']) >= 1
     assert any(item['schoolName'] == 'Escola Cobertura' for item in response.data['items'])
+
+
+@pytest.mark.django_db
+def test_dashboard_summary_matches_individual_panels_in_one_pass(api_client, schedule_data, monkeypatch):
+    from analytics_app import services as analytics_services
+
+    schools = [SchoolFactory(name='Escola Norte'), SchoolFactory(name='Escola Sul')]
+    dtp = Vaccine.objects.get(code='DTP')
+    for index in range(6):
+        student = StudentFactory(school=schools[index % 2], birth_date=timezone.localdate() - datetime.timedelta(days=30 * (4 + index * 5)))
+        if index % 3:
+            VaccinationRecordFactory(student=student, vaccine=dtp, dose_number=1)
+
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.SAUDE, school=None))
+    evaluations = []
+    original = analytics_services.summarize_population
+
+    def counting_summarize_population(*args, **kwargs):
+        evaluations.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(analytics_services, 'summarize_population', counting_summarize_population)
+
+    summary = api_client.get('/api/dashboards/summary/', {'sex': 'F'})
+    assert summary.status_code == 200
+    assert len(evaluations) == 1
+
+    assert summary.data['coverage'] == api_client.get('/api/dashboards/schools/coverage/', {'sex': 'F'}).data['items']
+    assert summary.data['ranking'] == api_client.get('/api/dashboards/schools/ranking/', {'sex': 'F'}).data['items']
+    age_distribution = api_client.get('/api/dashboards/age-distribution/', {'sex': 'F'}).data
+    assert summary.data['ageDistribution'] == age_distribution['items']
+    assert summary.data['ageBuckets'] == age_distribution['ageBuckets']
+
+    school_user = UserFactory(role=User.RoleChoices.ESCOLA, school=schools[0])
+    api_client.force_authenticate(user=school_user)
+    school_summary = api_client.get('/api/dashboards/summary/')
+    assert school_summary.status_code == 200
+    assert set(school_summary.data) == {'coverage'}
+    assert [item['schoolId'] for item in school_summary.data['coverage']] == [schools[0].id]
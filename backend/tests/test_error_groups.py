@@ -0,0 +1,75 @@
+import pytest
+
+from accounts.models import User
+from audit.fingerprint import error_fingerprint, message_template, normalize_path
+from audit.models import ErrorGroup, ErrorLog
+from audit.services import create_error_log
+from tests.factories import UserFactory
+
+
+def test_fingerprint_ignores_ids_and_values():
+    assert normalize_path('/api/students/42/immunization-status/') == '/api/students/{id}/immunization-status/'
+    assert normalize_path('/api/exports/jobs/3f2b8c1e-0000-4000-8000-000000000000/') == '/api/exports/jobs/{uuid}/'
+    assert message_template('Estudante 42 nao encontrado "Ana"') == 'Estudante {n} nao encontrado {valor}'
+    assert error_fingerprint(404, 'get', '/api/students/1/', 'Nao encontrado.')[0] == error_fingerprint(404, 'GET', '/api/students/2/', 'Nao encontrado.')[0]
+    assert error_fingerprint(404, 'GET', '/api/students/1/', 'x')[0] != error_fingerprint(401, 'GET', '/api/students/1/', 'x')[0]
+
+
+@pytest.mark.django_db
+def test_repeated_errors_increment_group_and_keep_samples(settings):
+    settings.ERROR_SAMPLE_FIRST = 2
+    settings.ERROR_SAMPLE_EVERY = 5
+
+    for index in range(12):
+        create_error_log(None, 'GET', f'/api/students/{index}/', 401, 'Token invalido.', f'trace-{index}', {'response': {}})
+
+    group = ErrorGroup.objects.get()
+    assert group.occurrence_count == 12
+    assert group.path_template == '/api/students/{id}/'
+    assert group.last_trace_id == 'trace-11'
+    assert group.first_seen <= group.last_seen
+    assert sorted(group.occurrences.values_list('trace_id', flat=True)) == ['trace-0', 'trace-1', 'trace-4', 'trace-9']
+
+
+@pytest.mark.django_db
+def test_server_errors_are_always_sampled(settings):
+    settings.ERROR_SAMPLE_FIRST = 1
+    settings.ERROR_SAMPLE_EVERY = 1000
+
+    for index in range(4):
+        create_error_log(None, 'POST', '/api/students/', 500, 'boom', f'trace-{index}')
+
+    assert ErrorLog.objects.count() == 4
+    assert ErrorGroup.objects.get().occurrence_count == 4
+
+
+@pytest.mark.django_db
+def test_error_log_endpoint_exposes_groups_and_occurrences(api_client, settings):
+    settings.ERROR_SAMPLE_FIRST = 1
+    settings.ERROR_SAMPLE_EVERY = 1000
+    admin = UserFactory(role=User.RoleChoices.ADMIN)
+    api_client.force_authenticate(user=admin)
+
+    for _ in range(3):
+        assert api_client.get('/api/students/999999/').status_code == 404
+    create_error_log(None, 'GET', '/api/other/', 400, 'Filtro invalido.', 'trace-x')
+
+    groups = api_client.get('/api/error-logs/groups/', {'statusCode': 404})
+    assert groups.status_code == 200
+    assert groups.data['count'] == 1
+    group = groups.data['results'][0]
+    assert group['path_template'] == '/api/students/{id}/'
+    assert group['occurrence_count'] == 3
+    assert group['sample_count'] == 1
+
+    occurrences = api_client.get('/api/error-logs/', {'groupId': group['id']})
+    assert occurrences.data['count'] == 1
+    assert occurrences.data['results'][0]['group'] == group['id']
+
+    first_page = api_client.get('/api/error-logs/groups/', {'cursor': '', 'pageSize': 1})
+    assert len(first_page.data['results']) == 1
+    second_page = api_client.get(first_page.data['next'])
+    assert second_page.data['results'][0]['id'] != first_page.data['results'][0]['id']
+
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.SAUDE))
+    assert api_client.get('/api/error-logs/groups/').status_code == 403
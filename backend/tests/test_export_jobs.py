@@ -0,0 +1,181 @@
+import datetime
+import gzip
+import os
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from accounts.models import User
+from immunization.export_jobs import claim_next_job, export_job_path, run_export_job
+from immunization.exports import export_students_queryset, iter_pending_export_csv, parse_export_filters
+from immunization.models import ExportJob
+from tests.factories import (
+    SchoolFactory,
+    StudentFactory,
+    UserFactory,
+    VaccineDoseRuleFactory,
+    VaccineFactory,
+    VaccineScheduleVersionFactory,
+)
+
+
+@pytest.fixture
+def export_setup(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    schedule = VaccineScheduleVersionFactory(is_active=True)
+    dtp = VaccineFactory(code='DTP', name='DTP')
+    VaccineDoseRuleFactory(schedule_version=schedule, vaccine=dtp, dose_number=1, recommended_min_age_months=2, recommended_max_age_months=3)
+    VaccineDoseRuleFactory(schedule_version=schedule, vaccine=dtp, dose_number=2, recommended_min_age_months=4, recommended_max_age_months=30)
+    school = SchoolFactory()
+    other_school = SchoolFactory()
+    for months in (5, 10, 20, 40):
+        StudentFactory(school=school, birth_date=timezone.localdate() - datetime.timedelta(days=30 * months + 5))
+    StudentFactory(school=other_school, birth_date=timezone.localdate() - datetime.timedelta(days=30 * 10))
+    return {
+        'school': school,
+        'school_user': UserFactory(role=User.RoleChoices.ESCOLA, school=school),
+        'other_school_user': UserFactory(role=User.RoleChoices.ESCOLA, school=other_school),
+    }
+
+
+@pytest.mark.django_db
+def test_export_job_is_processed_by_worker_and_downloadable_with_range(api_client, export_setup):
+    user = export_setup['school_user']
+    api_client.force_authenticate(user=user)
+
+    created = api_client.post('/api/exports/jobs/', {'sex': 'F'}, format='json')
+    assert created.status_code == 201
+    assert created.data['status'] == 'PENDENTE'
+    assert created.data['download_url'] is None
+    job_id = created.data['id']
+    assert api_client.get(f'/api/exports/jobs/{job_id}/download/').status_code == 409
+
+    call_command('run_export_worker', '--once', chunk_size=2, stdout=None)
+
+    job = api_client.get(f'/api/exports/jobs/{job_id}/')
+    assert job.data['status'] == 'CONCLUIDO'
+    assert job.data['progress_percent'] == 100
+    assert job.data['total_students'] == job.data['processed_students'] == 4
+    assert job.data['download_url'].endswith(f'/api/exports/jobs/{job_id}/download/')
+
+    download = api_client.get(f'/api/exports/jobs/{job_id}/download/')
+    assert download.status_code == 200
+    assert download['Accept-Ranges'] == 'bytes'
+    payload = b''.join(download.streaming_content)
+    filters = parse_export_filters({'sex': 'F'})
+    expected = ''.join(iter_pending_export_csv(export_students_queryset(user, filters, timezone.localdate()), filters))
+    assert gzip.decompress(payload).decode('utf-8') == expected
+    assert job.data['rows_written'] == expected.count('\r\n') - 1
+
+    partial = api_client.get(f'/api/exports/jobs/{job_id}/download/', HTTP_RANGE='bytes=10-')
+    assert partial.status_code == 206
+    assert partial['Content-Range'] == f'bytes 10-{len(payload) - 1}/{len(payload)}'
+    assert b''.join(partial.streaming_content) == payload[10:]
+
+    suffix = api_client.get(f'/api/exports/jobs/{job_id}/download/', HTTP_RANGE='bytes=-5')
+    assert b''.join(suffix.streaming_content) == payload[-5:]
+    assert api_client.get(f'/api/exports/jobs/{job_id}/download/', HTTP_RANGE=f'bytes={len(payload)}-').status_code == 416
+
+
+@pytest.mark.django_db
+def test_identical_export_requests_reuse_job_within_window(api_client, export_setup, settings):
+    api_client.force_authenticate(user=export_setup['school_user'])
+    first = api_client.post('/api/exports/jobs/', {'ageMin': 6}, format='json')
+    second = api_client.post('/api/exports/jobs/', {'ageMin': '6'}, format='json')
+    assert second.status_code == 200
+    assert second.data['id'] == first.data['id']
+
+    different = api_client.post('/api/exports/jobs/', {'ageMin': 7}, format='json')
+    assert different.status_code == 201
+
+    settings.EXPORT_JOB_REUSE_SECONDS = 0
+    expired = api_client.post('/api/exports/jobs/', {'ageMin': 6}, format='json')
+    assert expired.status_code == 201
+    assert ExportJob.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_export_jobs_are_visible_only_within_scope(api_client, export_setup):
+    api_client.force_authenticate(user=export_setup['school_user'])
+    job_id = api_client.post('/api/exports/jobs/', {}, format='json').data['id']
+
+    api_client.force_authenticate(user=export_setup['other_school_user'])
+    assert api_client.get(f'/api/exports/jobs/{job_id}/').status_code == 404
+    assert api_client.get('/api/exports/jobs/').data['results'] == []
+
+
+@pytest.mark.django_db
+def test_stale_processing_job_is_not_reused(api_client, export_setup, settings):
+    api_client.force_authenticate(user=export_setup['school_user'])
+    first = api_client.post('/api/exports/jobs/', {}, format='json')
+    claim_next_job()
+    assert api_client.post('/api/exports/jobs/', {}, format='json').data['id'] == first.data['id']
+
+    ExportJob.objects.filter(pk=first.data['id']).update(heartbeat_at=timezone.now() - datetime.timedelta(seconds=settings.EXPORT_JOB_STALE_SECONDS + 1))
+    retried = api_client.post('/api/exports/jobs/', {}, format='json')
+    assert retried.status_code == 201
+    assert retried.data['id'] != first.data['id']
+
+
+@pytest.mark.django_db
+def test_export_job_failing_before_writing_is_marked_as_error(api_client, export_setup, monkeypatch):
+    api_client.force_authenticate(user=export_setup['school_user'])
+    api_client.post('/api/exports/jobs/', {}, format='json')
+    job = claim_next_job()
+
+    def broken_queryset(*args, **kwargs):
+        raise RuntimeError('banco indisponivel')
+
+    monkeypatch.setattr('immunization.export_jobs.export_students_queryset', broken_queryset)
+    with pytest.raises(RuntimeError):
+        run_export_job(job)
+
+    job.refresh_from_db()
+    assert job.status == ExportJob.StatusChoices.ERRO
+    assert job.error_message == 'banco indisponivel'
+
+
+@pytest.mark.django_db
+def test_worker_marks_orphaned_processing_jobs_as_error(api_client, export_setup, settings):
+    api_client.force_authenticate(user=export_setup['school_user'])
+    job_id = api_client.post('/api/exports/jobs/', {}, format='json').data['id']
+    claim_next_job()
+    temp_path = settings.MEDIA_ROOT / 'exports' / f'students_pending_{job_id}.csv.gz.tmp'
+    temp_path.parent.mkdir(parents=True)
+    temp_path.write_bytes(b'parcial')
+
+    call_command('run_export_worker', '--once', stdout=None)
+    assert ExportJob.objects.get(pk=job_id).status == ExportJob.StatusChoices.PROCESSANDO
+
+    ExportJob.objects.filter(pk=job_id).update(heartbeat_at=timezone.now() - datetime.timedelta(seconds=settings.EXPORT_JOB_STALE_SECONDS + 1))
+    call_command('run_export_worker', '--once', stdout=None, stderr=None)
+
+    job = ExportJob.objects.get(pk=job_id)
+    assert job.status == ExportJob.StatusChoices.ERRO
+    assert job.finished_at is not None
+    assert not temp_path.exists()
+
+
+@pytest.mark.django_db
+def test_worker_purges_expired_jobs_and_orphan_files(api_client, export_setup, settings):
+    api_client.force_authenticate(user=export_setup['school_user'])
+    job_id = api_client.post('/api/exports/jobs/', {}, format='json').data['id']
+    call_command('run_export_worker', '--once', stdout=None)
+    job = ExportJob.objects.get(pk=job_id)
+    path = export_job_path(job)
+    orphan = path.with_name('students_pending_999.csv.gz.tmp')
+    orphan.write_bytes(b'parcial')
+    assert path.exists()
+
+    call_command('run_export_worker', '--once', stdout=None)
+    assert path.exists() and orphan.exists()
+
+    expired = timezone.now() - datetime.timedelta(hours=settings.EXPORT_JOB_RETENTION_HOURS, minutes=1)
+    ExportJob.objects.filter(pk=job_id).update(finished_at=expired)
+    os.utime(orphan, (expired.timestamp(), expired.timestamp()))
+    call_command('run_export_worker', '--once', stdout=None)
+
+    assert not ExportJob.objects.filter(pk=job_id).exists()
+    assert not path.exists()
+    assert not orphan.exists()
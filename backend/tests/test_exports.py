@@ -0,0 +1,118 @@
+import datetime
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from django.utils import timezone
+
+from accounts.models import User
+from core.models import Student
+from immunization.exports import (
+    EXPORT_COLUMNS,
+    export_students_queryset,
+    iter_pending_export_csv,
+    iter_pending_export_rows,
+    parse_export_filters,
+    write_pending_export_parquet,
+)
+from immunization.services import build_statuses_for_students
+from tests.factories import (
+    StudentFactory,
+    UserFactory,
+    VaccinationRecordFactory,
+    VaccineDoseRuleFactory,
+    VaccineFactory,
+    VaccineScheduleVersionFactory,
+)
+
+
+@pytest.fixture
+def export_data():
+    schedule = VaccineScheduleVersionFactory(is_active=True)
+    dtp = VaccineFactory(code='DTP', name='DTP')
+    hpv = VaccineFactory(code='HPV', name='HPV')
+    VaccineDoseRuleFactory(schedule_version=schedule, vaccine=dtp, dose_number=1, recommended_min_age_months=2, recommended_max_age_months=3)
+    VaccineDoseRuleFactory(schedule_version=schedule, vaccine=dtp, dose_number=2, recommended_min_age_months=4, recommended_max_age_months=30)
+    VaccineDoseRuleFactory(schedule_version=schedule, vaccine=hpv, dose_number=1, recommended_min_age_months=108, recommended_max_age_months=179)
+
+    students = [
+        StudentFactory(birth_date=timezone.localdate() - datetime.timedelta(days=30 * months + 5))
+        for months in (1, 5, 20, 40, 120, 200)
+    ]
+    VaccinationRecordFactory(student=students[2], vaccine=dtp, dose_number=1)
+    return {'admin': UserFactory(role=User.RoleChoices.ADMIN), 'dtp': dtp, 'hpv': hpv}
+
+
+@pytest.mark.django_db
+def test_export_rows_are_identical_across_chunk_sizes(export_data):
+    filters = parse_export_filters({})
+    students = export_students_queryset(export_data['admin'], filters, timezone.localdate())
+
+    single_batch = ''.join(iter_pending_export_csv(students, filters, chunk_size=1000))
+    chunked = ''.join(iter_pending_export_csv(students, filters, chunk_size=2))
+
+    assert chunked == single_batch
+    expected_rows = sum(len(data['pending']) for data in build_statuses_for_students(Student.objects.all()).values())
+    assert chunked.count('\r\n') == 1 + expected_rows
+
+
+@pytest.mark.django_db
+def test_export_endpoint_streams_csv(api_client, export_data):
+    api_client.force_authenticate(user=export_data['admin'])
+    response = api_client.get('/api/exports/students-pending.csv', {'vaccineId': export_data['hpv'].id})
+
+    assert response.status_code == 200
+    assert response.streaming
+    lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+    assert lines[0].startswith('student_id;student_name')
+    assert all(';HPV;' in line for line in lines[1:])
+    assert len(lines) == 3
+
+    assert api_client.get('/api/exports/students-pending.csv', {'ageMin': 'x'}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_parquet_export_matches_rows_with_typed_columns(export_data):
+    filters = parse_export_filters({'anonymized': 'true'})
+    students = export_students_queryset(export_data['admin'], filters, timezone.localdate())
+    expected = list(iter_pending_export_rows(students, filters))
+
+    buffer = io.BytesIO()
+    written = write_pending_export_parquet(students, filters, buffer, chunk_size=2, row_group_size=3)
+    parquet = pq.ParquetFile(io.BytesIO(buffer.getvalue()))
+    table = parquet.read()
+
+    assert written == len(expected)
+    assert parquet.metadata.num_row_groups == -(-len(expected) // 3)
+    assert table.column_names == EXPORT_COLUMNS
+    assert [list(row.values()) for row in table.to_pylist()] == expected
+    assert all('.' in row[1] or len(row[1]) == 1 for row in expected)
+    for name in ('school', 'status', 'vaccine_code', 'pending_status'):
+        assert pa.types.is_dictionary(table.schema.field(name).type)
+    assert table.schema.field('age_months').type == pa.int16()
+    assert table.schema.field('dose_number').type == pa.int16()
+
+
+@pytest.mark.django_db
+def test_export_endpoint_serves_parquet(api_client, export_data):
+    api_client.force_authenticate(user=export_data['admin'])
+    response = api_client.get('/api/exports/students-pending.csv', {'format': 'parquet', 'vaccineId': export_data['hpv'].id})
+
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/vnd.apache.parquet'
+    assert 'students_pending.parquet' in response['Content-Disposition']
+    table = pq.read_table(io.BytesIO(b''.join(response.streaming_content)))
+    assert table.num_rows == 2
+    assert set(table.column('vaccine_code').to_pylist()) == {'HPV'}
+
+    invalid = api_client.get('/api/exports/students-pending.csv', {'format': 'xlsx'})
+    assert invalid.status_code == 400
+    assert invalid['Content-Type'] == 'application/json'
+    assert 'format' in invalid.json()
+
+    negotiated = api_client.get('/api/exports/students-pending.csv', HTTP_ACCEPT='application/vnd.apache.parquet')
+    assert negotiated['Content-Type'] == 'application/vnd.apache.parquet'
+    error = api_client.get('/api/exports/students-pending.csv', {'format': 'parquet', 'ageMin': 'x'})
+    assert error.status_code == 400
+    assert error['Content-Type'] == 'application/json'
@@ -3,11 +3,16 @@ import datetime
 import pytest
 from django.utils import timezone
 
+from accounts.models import User
 from core.models import Student
-from immunization.services import build_student_immunization_status
+from core.services import age_in_months_from_birth_date
+from immunization.models import Vaccine
+from immunization.schedule import get_active_compiled_schedule
+from immunization.services import build_statuses_for_students, build_student_immunization_status
 from tests.factories import (
     SchoolFactory,
     StudentFactory,
+    UserFactory,
     VaccinationRecordFactory,
     VaccineDoseRuleFactory,
     VaccineFactory,
@@ -43,6 +48,46 @@ def base_schedule():
     return schedule
 
 
+def _reference_status(student, schedule):
+    # Logica original, aluno a aluno e direto no ORM: referencia independente do motor em lote.
+    age_months = age_in_months_from_birth_date(student.birth_date)
+    records = set(student.vaccination_records.values_list('vaccine_id', 'dose_number'))
+    pending, future = [], []
+    for rule in schedule.rules.select_related('vaccine'):
+        if (rule.vaccine_id, rule.dose_number) in records:
+            continue
+        item = {
+            'vaccineCode': rule.vaccine.code,
+            'vaccineName': rule.vaccine.name,
+            'doseNumber': rule.dose_number,
+            'recommendedMinAgeMonths': rule.recommended_min_age_months,
+            'recommendedMaxAgeMonths': rule.recommended_max_age_months,
+        }
+        if age_months < rule.recommended_min_age_months:
+            future.append({**item, 'monthsUntilDue': rule.recommended_min_age_months - age_months, 'status': 'FUTURA'})
+        else:
+            pending.append({**item, 'status': 'ATRASADA' if age_months > rule.recommended_max_age_months else 'PENDENTE'})
+
+    if not records:
+        status = 'SEM_DADOS'
+    elif not pending:
+        status = 'EM_DIA'
+    elif any(item['status'] == 'ATRASADA' for item in pending):
+        status = 'ATRASADO'
+    else:
+        status = 'INCOMPLETO'
+    return {
+        'studentId': student.id,
+        'studentName': student.full_name,
+        'ageMonths': age_months,
+        'status': status,
+        'asOfDate': timezone.localdate(),
+        'activeScheduleCode': schedule.code,
+        'pending': pending,
+        'future': future,
+    }
+
+
 @pytest.mark.django_db
 def test_status_sem_dados_e_atraso(base_schedule):
     school = SchoolFactory()
@@ -117,3 +162,93 @@ def test_status_atrasado(base_schedule):
     result = build_student_immunization_status(student)
     assert result['status'] == 'ATRASADO'
     assert any(item['status'] == 'ATRASADA' for item in result['pending'])
+
+
+@pytest.mark.django_db
+def test_batch_statuses_match_single_student_engine(base_schedule, django_assert_max_num_queries):
+    students = [
+        StudentFactory(birth_date=timezone.localdate() - datetime.timedelta(days=30 * months))
+        for months in (1, 5, 13, 21, 120)
+    ]
+    for student in students[1:3]:
+        for rule in base_schedule.rules.filter(vaccine__code='DTP'):
+            VaccinationRecordFactory(student=student, vaccine=rule.vaccine, dose_number=rule.dose_number)
+
+    expected = {student.id: _reference_status(student, base_schedule) for student in students}
+    get_active_compiled_schedule()
+    with django_assert_max_num_queries(5):
+        result = build_statuses_for_students(Student.objects.all())
+
+    assert {student_id: {key: value for key, value in data.items() if key != 'nextChangeDate'} for student_id, data in result.items()} == expected
+    assert {student.id: result[student.id]['status'] for student in students} == {
+        students[0].id: 'SEM_DADOS',
+        students[1].id: 'ATRASADO',
+        students[2].id: 'ATRASADO',
+        students[3].id: 'SEM_DADOS',
+        students[4].id: 'SEM_DADOS',
+    }
+
+
+@pytest.mark.django_db
+def test_batch_statuses_honor_vaccine_filter(base_schedule):
+    student = StudentFactory(birth_date=timezone.localdate() - datetime.timedelta(days=30 * 21))
+    dtp_rules = list(base_schedule.rules.filter(vaccine__code='DTP'))
+    VaccinationRecordFactory(student=student, vaccine=dtp_rules[0].vaccine, dose_number=1)
+
+    result = build_statuses_for_students([student], vaccine_ids={dtp_rules[0].vaccine_id})[student.id]
+
+    assert result['status'] == 'ATRASADO'
+    assert {item['vaccineCode'] for item in result['pending']} == {'DTP'}
+
+
+@pytest.mark.django_db
+def test_active_schedule_is_compiled_once_per_generation(base_schedule, django_assert_num_queries):
+    compiled = get_active_compiled_schedule()
+    assert compiled.code == base_schedule.code
+    assert list(compiled.min_ages) == sorted(compiled.min_ages)
+    assert compiled.rule_index[(Vaccine.objects.get(code='HPV').id, 1)].min_age_months == 108
+
+    with django_assert_num_queries(1):
+        assert get_active_compiled_schedule() is compiled
+
+
+@pytest.mark.django_db
+def test_rule_changes_invalidate_compiled_schedule(base_schedule):
+    student = StudentFactory(birth_date=timezone.localdate() - datetime.timedelta(days=30 * 24))
+    assert any(item['vaccineCode'] == 'HPV' for item in build_student_immunization_status(student)['future'])
+
+    hpv_rule = base_schedule.rules.get(vaccine__code='HPV')
+    hpv_rule.recommended_min_age_months = 12
+    hpv_rule.recommended_max_age_months = 20
+    hpv_rule.save()
+    assert any(item['vaccineCode'] == 'HPV' and item['status'] == 'ATRASADA' for item in build_student_immunization_status(student)['pending'])
+
+    hpv_rule.delete()
+    result = build_student_immunization_status(student)
+    assert all(item['vaccineCode'] != 'HPV' for item in result['pending'] + result['future'])
+
+
+@pytest.mark.django_db
+def test_immunization_status_endpoint_honors_as_of(api_client, base_schedule):
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.ADMIN))
+    student = StudentFactory(birth_date=timezone.localdate() - datetime.timedelta(days=30 * 21))
+    as_of = student.birth_date + datetime.timedelta(days=5)
+
+    response = api_client.get(f'/api/students/{student.id}/immunization-status/', {'asOf': as_of.isoformat()})
+    assert response.status_code == 200
+    assert response.data['ageMonths'] == 0
+    assert response.data['asOfDate'] == as_of
+    assert response.data == build_student_immunization_status(student, as_of=as_of)
+
+    invalid = api_client.get(f'/api/students/{student.id}/immunization-status/', {'asOf': '31/12/2024'})
+    assert invalid.status_code == 400
+    assert 'asOf' in invalid.data
+
+
+@pytest.mark.django_db
+def test_cached_batch_statuses_follow_data_version(base_schedule):
+    student = StudentFactory(birth_date=timezone.localdate() - datetime.timedelta(days=30 * 21))
+    assert build_statuses_for_students([student])[student.id]['status'] == 'SEM_DADOS'
+
+    VaccinationRecordFactory(student=student, vaccine=Vaccine.objects.get(code='DTP'), dose_number=1)
+    assert build_statuses_for_students([student])[student.id]['status'] == 'ATRASADO'
@@ -0,0 +1,132 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from accounts.models import User
+from config.metrics import _hostname, metrics_registry, render_prometheus
+from tests.factories import StudentFactory, UserFactory
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics_registry.reset()
+    yield
+    metrics_registry.reset()
+
+
+def _series(key):
+    return metrics_registry.snapshot()[key]
+
+
+@pytest.mark.django_db
+def test_middleware_records_requests_per_view_and_method(api_client):
+    admin = UserFactory(role=User.RoleChoices.ADMIN)
+    StudentFactory.create_batch(3)
+    api_client.force_authenticate(user=admin)
+
+    api_client.get('/api/students/')
+    api_client.get('/api/students/')
+    api_client.get('/api/students/999999/')
+
+    listing = _series('students-list GET')
+    assert listing['count'] == 2
+    assert listing['statusClasses'] == {'2xx': 2}
+    assert sum(listing['latencyBuckets']) == 2
+    assert listing['queries'] > 0
+    assert listing['dbSeconds'] > 0
+    assert listing['responseBytes'] > 0
+    assert _series('students-detail GET')['statusClasses'] == {'4xx': 1}
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_is_admin_only_prometheus_text(api_client):
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.SAUDE))
+    assert api_client.get('/api/metrics/').status_code == 403
+
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.ADMIN))
+    api_client.get('/api/schools/')
+    response = api_client.get('/api/metrics/', HTTP_ACCEPT='text/plain')
+
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    body = response.content.decode()
+    assert '# TYPE http_request_duration_seconds histogram' in body
+    assert 'http_requests_total{view="schools-list",method="GET",status_class="2xx"} 1' in body
+    assert 'http_request_duration_seconds_bucket{view="schools-list",method="GET",le="+Inf"} 1' in body
+    assert 'http_request_db_queries_total{view="schools-list",method="GET"}' in body
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics_registry.observe('v', 'GET', 200, 0.003, 1, 0.001, 10)
+    metrics_registry.observe('v', 'GET', 503, 0.2, 2, 0.01, 20)
+
+    body = render_prometheus(metrics_registry.snapshot())
+
+    assert 'http_request_duration_seconds_bucket{view="v",method="GET",le="0.005"} 1' in body
+    assert 'http_request_duration_seconds_bucket{view="v",method="GET",le="0.25"} 2' in body
+    assert 'http_requests_total{view="v",method="GET",status_class="5xx"} 1' in body
+    assert 'http_response_size_bytes_total{view="v",method="GET"} 30' in body
+
+
+def test_collect_merges_snapshots_from_other_processes(settings, tmp_path):
+    settings.METRICS_DIR = str(tmp_path)
+    other_process = {
+        'v GET': {
+            'count': 3,
+            'statusClasses': {'2xx': 3},
+            'latencyBuckets': [3] + [0] * 10,
+            'latencySum': 0.009,
+            'queries': 6,
+            'dbSeconds': 0.002,
+            'responseBytes': 300,
+        }
+    }
+    (tmp_path / f'metrics_outro-host_{os.getpid()}_1.json').write_text(json.dumps(other_process))
+
+    metrics_registry.observe('v', 'GET', 200, 0.003, 1, 0.001, 10)
+    merged = metrics_registry.collect()
+
+    assert merged['v GET']['count'] == 4
+    assert merged['v GET']['queries'] == 7
+    assert merged['v GET']['responseBytes'] == 310
+    assert len(list(tmp_path.glob(f'metrics_{_hostname()}_{os.getpid()}_*.json'))) == 1
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_snapshot_write_errors_are_logged_not_raised(settings, tmp_path, caplog):
+    blocker = tmp_path / 'arquivo'
+    blocker.write_text('')
+    settings.METRICS_DIR = str(blocker / 'metricas')
+    settings.METRICS_WRITE_INTERVAL = 0
+
+    metrics_registry.observe('v', 'GET', 200, 0.003, 1, 0.001, 10)
+
+    assert 'Falha ao gravar snapshot de metricas' in caplog.text
+    assert metrics_registry.snapshot()['v GET']['count'] == 1
+
+
+def test_snapshot_files_of_finished_processes_are_removed(settings, tmp_path):
+    settings.METRICS_DIR = str(tmp_path)
+    finished = subprocess.Popen([sys.executable, '-c', 'pass'])
+    finished.wait()
+    series = {'count': 5, 'statusClasses': {'2xx': 5}, 'latencyBuckets': [5] + [0] * 10,
+              'latencySum': 0.01, 'queries': 5, 'dbSeconds': 0.001, 'responseBytes': 50}
+    dead_local = tmp_path / f'metrics_{_hostname()}_{finished.pid}_1.json'
+    other_host = tmp_path / f'metrics_outro-host_{finished.pid}_1.json'
+    dead_local.write_text(json.dumps({'v GET': series}))
+    other_host.write_text(json.dumps({'v GET': series}))
+
+    metrics_registry.observe('v', 'GET', 200, 0.003, 1, 0.001, 10)
+    merged = metrics_registry.collect()
+
+    assert merged['v GET']['count'] == 6
+    assert not dead_local.exists()
+    assert other_host.exists()
+
+    own = list(tmp_path.glob(f'metrics_{_hostname()}_{os.getpid()}_*.json'))
+    assert len(own) == 1
+    metrics_registry.remove_snapshot()
+    assert not own[0].exists()
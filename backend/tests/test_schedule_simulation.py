@@ -0,0 +1,111 @@
+import datetime
+import functools
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from accounts.models import User
+from core.models import Student
+from immunization.services import summarize_statuses
+from immunization.simulation import iter_schedule_simulation, simulate_schedule_change
+from tests.factories import (
+    SchoolFactory,
+    StudentFactory,
+    UserFactory,
+    VaccinationRecordFactory,
+    VaccineDoseRuleFactory,
+    VaccineFactory,
+    VaccineScheduleVersionFactory,
+)
+
+
+@pytest.fixture
+def schedules():
+    dtp = VaccineFactory(code='DTP', name='DTP')
+    hpv = VaccineFactory(code='HPV', name='HPV')
+    active = VaccineScheduleVersionFactory(code='ATUAL', is_active=True)
+    candidate = VaccineScheduleVersionFactory(code='CANDIDATO', is_active=False)
+    VaccineDoseRuleFactory(schedule_version=active, vaccine=dtp, dose_number=1, recommended_min_age_months=2, recommended_max_age_months=3)
+    VaccineDoseRuleFactory(schedule_version=candidate, vaccine=dtp, dose_number=1, recommended_min_age_months=2, recommended_max_age_months=3)
+    VaccineDoseRuleFactory(schedule_version=candidate, vaccine=hpv, dose_number=1, recommended_min_age_months=12, recommended_max_age_months=200)
+    return {'active': active, 'candidate': candidate, 'dtp': dtp}
+
+
+@pytest.fixture
+def population(schedules):
+    schools = [SchoolFactory(name='Escola A'), SchoolFactory(name='Escola B')]
+    today = timezone.localdate()
+    for index in range(12):
+        student = StudentFactory(school=schools[index % 2], birth_date=today - datetime.timedelta(days=30 * (1 + index * 3)))
+        if index % 3:
+            VaccinationRecordFactory(student=student, vaccine=schedules['dtp'], dose_number=1)
+    return schools
+
+
+@pytest.mark.django_db
+def test_simulation_matches_engine_for_each_schedule(schedules, population):
+    students = Student.objects.all()
+    before = summarize_statuses(students)
+    after = summarize_statuses(students, schedule=schedules['candidate'])
+
+    result = simulate_schedule_change(students, schedules['candidate'], chunk_size=5)
+
+    assert result['totalStudents'] == 12
+    for source in result['transitions']:
+        for target, count in result['transitions'][source].items():
+            expected = sum(1 for student_id in before if before[student_id]['status'] == source and after[student_id]['status'] == target)
+            assert count == expected
+    assert result['transitions']['EM_DIA']['INCOMPLETO'] > 0
+
+    school_a = next(row for row in result['schools'] if row['schoolId'] == population[0].id)
+    school_a_ids = set(students.filter(school=population[0]).values_list('id', flat=True))
+    assert school_a['totalStudents'] == len(school_a_ids)
+    assert school_a['candidate']['EM_DIA'] == sum(1 for student_id in school_a_ids if after[student_id]['status'] == 'EM_DIA')
+    assert sum(school_a['delta'].values()) == 0
+
+
+@pytest.mark.django_db
+def test_simulation_endpoint_is_admin_only_and_rejects_active_schedule(api_client, schedules, population):
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.ADMIN))
+    response = api_client.get(f'/api/schedules/{schedules["candidate"].id}/simulation/', {'schoolId': population[1].id})
+    assert response.status_code == 200
+    assert response.data['candidateScheduleCode'] == 'CANDIDATO'
+    assert [row['schoolId'] for row in response.data['schools']] == [population[1].id]
+
+    assert api_client.get(f'/api/schedules/{schedules["active"].id}/simulation/').status_code == 400
+
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.SAUDE))
+    assert api_client.get(f'/api/schedules/{schedules["candidate"].id}/simulation/').status_code == 403
+
+
+@pytest.mark.django_db
+def test_simulate_schedule_command_outputs_json(schedules, population):
+    output = StringIO()
+    call_command('simulate_schedule', 'CANDIDATO', '--json', chunk_size=4, stdout=output, stderr=StringIO())
+    data = json.loads(output.getvalue())
+    assert data['totalStudents'] == 12
+    assert data['currentScheduleCode'] == 'ATUAL'
+
+
+@pytest.mark.django_db
+def test_simulation_endpoint_streams_chunks_as_ndjson(api_client, schedules, population, monkeypatch):
+    monkeypatch.setattr('immunization.views.iter_schedule_simulation', functools.partial(iter_schedule_simulation, chunk_size=5))
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.ADMIN))
+
+    response = api_client.get(f'/api/schedules/{schedules["candidate"].id}/simulation/', {'stream': 'true'})
+
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/x-ndjson'
+    events = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+    chunks, summary = events[:-1], events[-1]
+    assert [event['processed'] for event in chunks] == [5, 10, 12]
+    assert summary['type'] == 'summary'
+    assert summary['totalStudents'] == 12
+    for source, targets in summary['transitions'].items():
+        for target, count in targets.items():
+            assert count == sum(event['transitions'][source][target] for event in chunks)
+
+    assert api_client.get(f'/api/schedules/{schedules["candidate"].id}/simulation/', {'schoolId': 'abc'}).status_code == 400
@@ -0,0 +1,78 @@
+import pytest
+from django.db import connection
+
+from accounts.models import User
+from accounts.token import CustomTokenObtainPairSerializer
+from audit.models import SqlProfile
+from audit.profiling import SqlProfiler, normalize_sql
+from core.models import Student
+from tests.factories import StudentFactory, UserFactory
+
+
+def _bearer(user):
+    return {'HTTP_AUTHORIZATION': f'Bearer {CustomTokenObtainPairSerializer.get_token(user).access_token}'}
+
+
+def test_normalize_sql_collapses_placeholder_lists():
+    assert normalize_sql('SELECT * FROM t WHERE id IN (%s, %s, %s)') == normalize_sql('SELECT *  FROM t WHERE id IN (%s,%s)')
+
+
+@pytest.mark.django_db
+def test_profiler_groups_repeated_statements_and_flags_n_plus_one(settings):
+    settings.SQL_PROFILE_N_PLUS_ONE_THRESHOLD = 3
+    students = StudentFactory.create_batch(4)
+
+    profiler = SqlProfiler()
+    with connection.execute_wrapper(profiler):
+        for student in students:
+            Student.objects.filter(pk=student.pk).first()
+        Student.objects.count()
+
+    report = profiler.report()
+    assert len(report['statements']) == 5
+    repeated = report['groups'][0]
+    assert repeated['count'] == 4
+    assert repeated['nPlusOne'] is True
+    assert any('test_sql_profiler.py' in frame for frame in repeated['stack'])
+    assert [group['nPlusOne'] for group in report['groups'][1:]] == [False]
+
+
+@pytest.mark.django_db
+def test_admin_header_stores_profile_fetchable_by_server_id(api_client):
+    admin = UserFactory(role=User.RoleChoices.ADMIN)
+    StudentFactory.create_batch(2)
+
+    response = api_client.get('/api/students/', HTTP_X_SQL_PROFILE='1', HTTP_X_TRACE_ID='trace-profile-1', **_bearer(admin))
+    repeated = api_client.get('/api/schools/', HTTP_X_SQL_PROFILE='1', HTTP_X_TRACE_ID='trace-profile-1', **_bearer(admin))
+
+    assert response.status_code == 200
+    assert repeated['X-Sql-Profile'] != response['X-Sql-Profile']
+    by_trace = api_client.get('/api/sql-profiles/', {'traceId': 'trace-profile-1'}, **_bearer(admin))
+    assert {item['view_name'] for item in by_trace.data['results']} == {'students-list', 'schools-list'}
+    profile = api_client.get(f"/api/sql-profiles/{response['X-Sql-Profile']}/", **_bearer(admin))
+    assert profile.status_code == 200
+    assert profile.data['trace_id'] == 'trace-profile-1'
+    assert profile.data['view_name'] == 'students-list'
+    assert profile.data['query_count'] == len(profile.data['report_json']['statements'])
+    assert profile.data['query_count'] > 0
+    assert profile.data['actor'] == admin.id
+
+
+@pytest.mark.django_db
+def test_header_is_ignored_for_non_admin_and_sampling_is_opt_in(api_client, settings, monkeypatch):
+    health_user = UserFactory(role=User.RoleChoices.SAUDE)
+    monkeypatch.setattr('config.middleware.SqlProfiler', lambda: pytest.fail('profiler instalado sem ADMIN'))
+
+    for headers in ({}, _bearer(health_user), {'HTTP_AUTHORIZATION': 'Bearer invalido'}):
+        response = api_client.get('/api/students/', HTTP_X_SQL_PROFILE='1', **headers)
+        assert 'X-Sql-Profile' not in response
+    monkeypatch.undo()
+
+    api_client.force_authenticate(user=health_user)
+    api_client.get('/api/students/')
+    assert not SqlProfile.objects.exists()
+
+    settings.SQL_PROFILE_SAMPLE_RATE = 1.0
+    api_client.get('/api/students/', HTTP_X_TRACE_ID='trace-sampled')
+    assert SqlProfile.objects.get().trigger == 'sample'
+    assert api_client.get('/api/sql-profiles/').status_code == 403
@@ -0,0 +1,92 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from accounts.token import CustomTokenObtainPairSerializer
+from analytics_app.models import DashboardPreference
+from audit.models import AuditLog, ErrorLog
+from tests.factories import SchoolFactory, StudentFactory, UserFactory
+
+
+def _bearer(user):
+    return {'HTTP_AUTHORIZATION': f'Bearer {CustomTokenObtainPairSerializer.get_token(user).access_token}'}
+
+
+def _user_queries(captured):
+    return [query['sql'] for query in captured.captured_queries if 'accounts_user' in query['sql']]
+
+
+@pytest.mark.django_db
+def test_safe_requests_use_token_claims_without_user_lookup(api_client):
+    school = SchoolFactory()
+    StudentFactory(school=school)
+    StudentFactory()
+    user = UserFactory(role=User.RoleChoices.ESCOLA, school=school)
+    headers = _bearer(user)
+
+    api_client.get('/api/students/', **headers)
+    with CaptureQueriesContext(connection) as captured:
+        response = api_client.get('/api/students/', **headers)
+
+    assert response.status_code == 200
+    assert response.data['count'] == 1
+    assert _user_queries(captured) == []
+
+
+@pytest.mark.django_db
+def test_deactivated_user_is_rejected_on_next_request(api_client):
+    user = UserFactory(role=User.RoleChoices.ADMIN)
+    headers = _bearer(user)
+    assert api_client.get('/api/schools/', **headers).status_code == 200
+
+    user.is_active = False
+    user.save(update_fields=['is_active'])
+
+    assert api_client.get('/api/schools/', **headers).status_code == 401
+
+    user.delete()
+    assert api_client.get('/api/schools/', **headers).status_code == 401
+
+
+@pytest.mark.django_db
+def test_changed_role_falls_back_to_database_user(api_client):
+    user = UserFactory(role=User.RoleChoices.ADMIN)
+    headers = _bearer(user)
+    assert api_client.get('/api/audit-logs/', **headers).status_code == 200
+
+    user.role = User.RoleChoices.SAUDE
+    user.save(update_fields=['role'])
+
+    assert api_client.get('/api/audit-logs/', **headers).status_code == 403
+
+
+@pytest.mark.django_db
+def test_unsafe_requests_and_logs_work_with_token_users(api_client, django_capture_on_commit_callbacks):
+    admin = UserFactory(role=User.RoleChoices.ADMIN)
+    health = UserFactory(role=User.RoleChoices.SAUDE)
+    school = SchoolFactory()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        created = api_client.patch(f'/api/schools/{school.id}/', {'name': 'Escola Nova'}, format='json', **_bearer(admin))
+    assert created.status_code == 200
+    assert AuditLog.objects.get(action='school_updated').actor_id == admin.id
+
+    assert api_client.get('/api/students/999999/', **_bearer(admin)).status_code == 404
+    assert ErrorLog.objects.get(status_code=404).actor_id == admin.id
+
+    buckets = [{'label': 'Todos', 'minMonths': 0, 'maxMonths': 999}]
+    saved = api_client.put('/api/dashboards/preferences/age-buckets/', {'ageBuckets': buckets}, format='json', **_bearer(health))
+    assert saved.status_code == 200
+    assert DashboardPreference.objects.get(user_id=health.id).age_buckets_json == buckets
+
+
+@pytest.mark.django_db
+def test_tokens_without_profile_claims_load_the_user(api_client):
+    user = UserFactory(role=User.RoleChoices.ADMIN)
+    token = AccessToken.for_user(user)
+
+    response = api_client.get('/api/schools/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    assert response.status_code == 200
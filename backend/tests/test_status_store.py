@@ -0,0 +1,186 @@
+import datetime
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import User
+from core.models import Student
+from core.services import age_in_months_from_birth_date
+from immunization.models import StudentImmunizationStatus
+from immunization.services import build_student_immunization_status, build_statuses_for_students, date_when_age_reaches
+from immunization.status_store import filter_students_by_status, get_materialized_statuses, refresh_student_statuses, stale_student_ids
+from tests.factories import (
+    StudentFactory,
+    UserFactory,
+    VaccinationRecordFactory,
+    VaccineDoseRuleFactory,
+    VaccineFactory,
+    VaccineScheduleVersionFactory,
+)
+
+
+@pytest.fixture
+def store_schedule():
+    schedule = VaccineScheduleVersionFactory(is_active=True)
+    dtp = VaccineFactory(code='DTP', name='DTP')
+    hpv = VaccineFactory(code='HPV', name='HPV')
+    VaccineDoseRuleFactory(schedule_version=schedule, vaccine=dtp, dose_number=1, recommended_min_age_months=2, recommended_max_age_months=3)
+    VaccineDoseRuleFactory(schedule_version=schedule, vaccine=dtp, dose_number=2, recommended_min_age_months=4, recommended_max_age_months=30)
+    VaccineDoseRuleFactory(schedule_version=schedule, vaccine=hpv, dose_number=1, recommended_min_age_months=108, recommended_max_age_months=179)
+    return {'schedule': schedule, 'dtp': dtp, 'hpv': hpv}
+
+
+def _student(months):
+    return StudentFactory(birth_date=timezone.localdate() - datetime.timedelta(days=30 * months + 5))
+
+
+@pytest.mark.django_db
+def test_materialized_status_filters_match_engine(store_schedule):
+    dtp = store_schedule['dtp']
+    hpv = store_schedule['hpv']
+    no_data = _student(20)
+    up_to_date = _student(20)
+    incomplete = _student(20)
+    teenager = _student(120)
+    VaccinationRecordFactory(student=up_to_date, vaccine=dtp, dose_number=1)
+    VaccinationRecordFactory(student=up_to_date, vaccine=dtp, dose_number=2)
+    VaccinationRecordFactory(student=incomplete, vaccine=dtp, dose_number=1)
+    VaccinationRecordFactory(student=teenager, vaccine=hpv, dose_number=1)
+
+    students = Student.objects.all()
+    for vaccine_id in (None, dtp.id, hpv.id):
+        expected = build_statuses_for_students(students, vaccine_ids={vaccine_id} if vaccine_id else None)
+        for status in ('EM_DIA', 'INCOMPLETO', 'ATRASADO', 'SEM_DADOS'):
+            matched = set(filter_students_by_status(students, status, vaccine_id).values_list('id', flat=True))
+            assert matched == {student_id for student_id, data in expected.items() if data['status'] == status}
+
+    assert StudentImmunizationStatus.objects.get(student=no_data).status == 'SEM_DADOS'
+    assert StudentImmunizationStatus.objects.get(student=incomplete).pending_count == 1
+
+
+@pytest.mark.django_db
+def test_vaccination_write_refreshes_materialized_status(api_client, store_schedule):
+    student = _student(20)
+    refresh_student_statuses([student.id])
+    assert StudentImmunizationStatus.objects.get(student=student).status == 'SEM_DADOS'
+
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.ADMIN))
+    for dose_number in (1, 2):
+        response = api_client.post(
+            f'/api/students/{student.id}/vaccinations/',
+            {
+                'vaccine': store_schedule['dtp'].id,
+                'dose_number': dose_number,
+                'application_date': str(timezone.localdate()),
+                'source': 'INFORMADO_ESCOLA',
+            },
+            format='json',
+        )
+        assert response.status_code == 201
+
+    assert StudentImmunizationStatus.objects.get(student=student).status == 'EM_DIA'
+    listed = api_client.get('/api/students/?status=EM_DIA')
+    assert [row['id'] for row in listed.data['results']] == [student.id]
+    assert listed.data['results'][0]['current_status'] == 'EM_DIA'
+
+
+@pytest.mark.django_db
+def test_rebuild_command_recomputes_stale_rows(store_schedule):
+    student = _student(20)
+    refresh_student_statuses([student.id])
+    StudentImmunizationStatus.objects.filter(student=student).update(status='EM_DIA', pending_count=0)
+
+    call_command('rebuild_immunization_statuses', chunk_size=1)
+
+    row = StudentImmunizationStatus.objects.get(student=student)
+    assert row.status == 'SEM_DADOS'
+    assert row.pending_count == 2
+
+
+def test_date_when_age_reaches_matches_age_calculation():
+    birth_dates = [datetime.date(2020, 1, 31), datetime.date(2019, 2, 28), datetime.date(2020, 2, 29), datetime.date(2021, 7, 1)]
+    for birth_date in birth_dates:
+        for months in range(0, 40):
+            reached = date_when_age_reaches(birth_date, months)
+            assert age_in_months_from_birth_date(birth_date, reached) == months
+            if months:
+                assert age_in_months_from_birth_date(birth_date, reached - datetime.timedelta(days=1)) == months - 1
+
+
+@pytest.mark.django_db
+def test_rollover_only_recomputes_students_whose_status_changed(store_schedule):
+    today = timezone.localdate()
+    baby = StudentFactory(birth_date=today - datetime.timedelta(days=40))
+    teenager = _student(200)
+    refresh_student_statuses([baby.id, teenager.id])
+
+    baby_row = StudentImmunizationStatus.objects.get(student=baby)
+    assert baby_row.next_change_date == date_when_age_reaches(baby.birth_date, 2)
+    assert StudentImmunizationStatus.objects.get(student=teenager).next_change_date is None
+
+    change_date = baby_row.next_change_date
+    assert stale_student_ids(change_date - datetime.timedelta(days=1)) == []
+    assert stale_student_ids(change_date) == [baby.id]
+
+    call_command('rollover_immunization_statuses', date=change_date.isoformat())
+    baby_row.refresh_from_db()
+    assert baby_row.computed_for == change_date
+    assert baby_row.pending_count == 1
+    assert baby_row.next_change_date == date_when_age_reaches(baby.birth_date, 4)
+
+
+@pytest.mark.django_db
+def test_status_reads_recompute_missing_and_stale_rows(store_schedule):
+    stale = _student(20)
+    refresh_student_statuses([stale.id])
+    StudentImmunizationStatus.objects.filter(student=stale).update(status='EM_DIA', next_change_date=timezone.localdate())
+    missing = _student(20)
+    StudentImmunizationStatus.objects.filter(student=missing).delete()
+
+    assert not filter_students_by_status(Student.objects.all(), 'EM_DIA').exists()
+    assert StudentImmunizationStatus.objects.get(student=stale).status == 'SEM_DADOS'
+    assert StudentImmunizationStatus.objects.get(student=missing).status == 'SEM_DADOS'
+    assert stale_student_ids() == []
+
+
+@pytest.mark.django_db
+def test_schedule_edit_is_visible_to_filters_and_list_on_next_request(api_client, store_schedule):
+    student = _student(20)
+    VaccinationRecordFactory(student=student, vaccine=store_schedule['dtp'], dose_number=1)
+    VaccinationRecordFactory(student=student, vaccine=store_schedule['dtp'], dose_number=2)
+    assert get_materialized_statuses([student.id]) == {student.id: 'EM_DIA'}
+
+    VaccineDoseRuleFactory(
+        schedule_version=store_schedule['schedule'],
+        vaccine=store_schedule['dtp'],
+        dose_number=3,
+        recommended_min_age_months=6,
+        recommended_max_age_months=12,
+    )
+
+    assert build_student_immunization_status(student)['status'] == 'ATRASADO'
+    assert get_materialized_statuses([student.id]) == {student.id: 'ATRASADO'}
+    assert list(filter_students_by_status(Student.objects.all(), 'ATRASADO')) == [student]
+    assert not filter_students_by_status(Student.objects.all(), 'EM_DIA').exists()
+
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.ADMIN))
+    assert api_client.get('/api/students/').data['results'][0]['current_status'] == 'ATRASADO'
+
+
+@pytest.mark.django_db
+def test_past_date_status_filter_is_computed_in_memory_without_writes(store_schedule, settings, monkeypatch):
+    monkeypatch.setattr('immunization.status_store.REFRESH_CHUNK_SIZE', 2)
+    students = [_student(20) for _ in range(5)]
+    VaccinationRecordFactory(student=students[0], vaccine=store_schedule['dtp'], dose_number=1)
+    as_of = timezone.localdate() - datetime.timedelta(days=3)
+
+    with CaptureQueriesContext(connection) as captured:
+        matched_ids = set(filter_students_by_status(Student.objects.all(), 'SEM_DADOS', as_of=as_of).values_list('id', flat=True))
+
+    expected = build_statuses_for_students(Student.objects.all(), as_of=as_of)
+    assert matched_ids == {student_id for student_id, data in expected.items() if data['status'] == 'SEM_DADOS'}
+    assert len(matched_ids) == 4
+    assert not [query['sql'] for query in captured.captured_queries if query['sql'].split()[0].upper() in {'INSERT', 'UPDATE', 'DELETE'}]
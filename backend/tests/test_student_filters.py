@@ -0,0 +1,56 @@
+import datetime
+
+import pytest
+from django.utils import timezone
+
+from accounts.models import User
+from core.models import Student
+from core.services import age_in_months_from_birth_date, filter_students_queryset
+from immunization.status_store import refresh_student_statuses
+from tests.factories import SchoolFactory, StudentFactory, UserFactory, VaccineDoseRuleFactory, VaccineScheduleVersionFactory
+
+
+@pytest.mark.django_db
+def test_age_filters_match_python_age_calculation():
+    school = SchoolFactory()
+    as_of = datetime.date(2024, 3, 31)
+    birth_dates = [as_of - datetime.timedelta(days=days) for days in range(0, 800, 7)]
+    birth_dates += [datetime.date(2023, 2, 28), datetime.date(2022, 12, 31), datetime.date(2024, 2, 29), as_of + datetime.timedelta(days=3)]
+    for birth_date in birth_dates:
+        StudentFactory(school=school, birth_date=birth_date)
+
+    students = Student.objects.all()
+    for age_min, age_max in [(0, 0), (1, 1), (11, 13), (None, 5), (24, None), (-3, 2)]:
+        matched = set(filter_students_queryset(students, age_min=age_min, age_max=age_max, as_of=as_of).values_list('birth_date', flat=True))
+        expected = {
+            birth_date
+            for birth_date in birth_dates
+            if (age_min is None or age_in_months_from_birth_date(birth_date, as_of) >= age_min)
+            and (age_max is None or age_in_months_from_birth_date(birth_date, as_of) <= age_max)
+        }
+        assert matched == expected, (age_min, age_max)
+
+
+@pytest.mark.django_db
+def test_student_list_queries_do_not_grow_with_population(api_client, django_assert_max_num_queries):
+    VaccineDoseRuleFactory(schedule_version=VaccineScheduleVersionFactory(is_active=True), recommended_min_age_months=2, recommended_max_age_months=3)
+    school = SchoolFactory()
+    for index in range(30):
+        StudentFactory(school=school, full_name=f'Aluno {index:02d}', birth_date=timezone.localdate() - datetime.timedelta(days=30 * (index + 1)))
+    StudentFactory(school=school, full_name='Outra Pessoa', birth_date=timezone.localdate() - datetime.timedelta(days=400))
+
+    refresh_student_statuses(Student.objects.values_list('id', flat=True))
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.ADMIN))
+
+    with django_assert_max_num_queries(5):
+        response = api_client.get('/api/students/', {'q': 'aluno', 'schoolId': school.id, 'ageMin': 3, 'ageMax': 20, 'sex': 'F'})
+
+    assert response.status_code == 200
+    expected = [
+        student.full_name
+        for student in Student.objects.filter(full_name__startswith='Aluno').order_by('full_name')
+        if 3 <= age_in_months_from_birth_date(student.birth_date) <= 20
+    ]
+    assert response.data['count'] == len(expected)
+    assert [row['full_name'] for row in response.data['results']] == expected[:10]
+    assert all(row['current_status'] for row in response.data['results'])
@@ -0,0 +1,66 @@
+import pytest
+from django.core.management import call_command
+
+from accounts.models import User
+from core.models import Student, StudentNameTrigram
+from core.search import name_trigrams, normalize_name
+from tests.factories import SchoolFactory, StudentFactory, UserFactory
+
+
+def test_normalize_name_strips_accents_and_casefolds():
+    assert normalize_name('  Maria da CONCEIÇÃO  Araújo ') == 'maria da conceicao araujo'
+    assert normalize_name('Strauß') == 'strauss'
+
+
+@pytest.mark.django_db
+def test_trigram_side_table_follows_name_changes():
+    student = StudentFactory(full_name='João Lima')
+    assert set(student.name_trigrams.values_list('trigram', flat=True)) == name_trigrams('joao lima')
+
+    student.full_name = 'Joana Souza'
+    student.save()
+    assert Student.objects.get(pk=student.pk).normalized_name == 'joana souza'
+    assert set(student.name_trigrams.values_list('trigram', flat=True)) == name_trigrams('joana souza')
+
+
+@pytest.mark.django_db
+def test_student_list_q_filter_is_accent_insensitive(api_client):
+    school = SchoolFactory()
+    accented = StudentFactory(school=school, full_name='Maria da Conceição')
+    StudentFactory(school=school, full_name='Mariana Souza')
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.ADMIN))
+
+    for query in ('conceicao', 'CONCEIÇÃO', 'da conc', 'ia da'):
+        response = api_client.get('/api/students/', {'q': query})
+        assert [row['id'] for row in response.data['results']] == [accented.id], query
+
+
+@pytest.mark.django_db
+def test_search_endpoint_ranks_prefix_matches_first_and_respects_scope(api_client):
+    school_a = SchoolFactory()
+    school_b = SchoolFactory()
+    inner = StudentFactory(school=school_a, full_name='Ana Clara Antunes')
+    prefix = StudentFactory(school=school_a, full_name='Antônio Pereira')
+    word_prefix = StudentFactory(school=school_a, full_name='Bruno Antonelli')
+    StudentFactory(school=school_b, full_name='Antonia Ribeiro')
+
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.ESCOLA, school=school_a))
+    response = api_client.get('/api/students/search/', {'q': 'anto'})
+    assert response.status_code == 200
+    assert [row['id'] for row in response.data['results']] == [prefix.id, word_prefix.id]
+
+    response = api_client.get('/api/students/search/', {'q': 'an', 'limit': 2})
+    assert [row['id'] for row in response.data['results']] == [prefix.id, inner.id]
+    assert api_client.get('/api/students/search/', {'q': ''}).data['results'] == []
+
+
+@pytest.mark.django_db
+def test_rebuild_search_index_command_restores_side_table():
+    student = StudentFactory(full_name='Conceição')
+    StudentNameTrigram.objects.all().delete()
+    Student.objects.filter(pk=student.pk).update(normalized_name='')
+
+    call_command('rebuild_student_search_index', chunk_size=1, stdout=None)
+
+    assert Student.objects.get(pk=student.pk).normalized_name == 'conceicao'
+    assert StudentNameTrigram.objects.filter(student=student).count() == len(name_trigrams('conceicao'))
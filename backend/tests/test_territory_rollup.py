@@ -0,0 +1,104 @@
+import datetime
+
+import pytest
+from django.core.cache import caches
+from django.utils import timezone
+
+from accounts.models import User
+from analytics_app.cache import DASHBOARD_CACHE_ALIAS
+from tests.factories import (
+    SchoolFactory,
+    StudentFactory,
+    UserFactory,
+    VaccinationRecordFactory,
+    VaccineDoseRuleFactory,
+    VaccineFactory,
+    VaccineScheduleVersionFactory,
+)
+
+
+@pytest.fixture
+def territory_data():
+    schedule = VaccineScheduleVersionFactory(is_active=True)
+    dtp = VaccineFactory(code='DTP', name='DTP')
+    VaccineDoseRuleFactory(schedule_version=schedule, vaccine=dtp, dose_number=1, recommended_min_age_months=2, recommended_max_age_months=3)
+    schools = [
+        SchoolFactory(name='Escola A', territory_ref='Distrito Norte'),
+        SchoolFactory(name='Escola B', territory_ref='Distrito Norte'),
+        SchoolFactory(name='Escola C', territory_ref='Distrito Sul'),
+        SchoolFactory(name='Escola D', territory_ref=''),
+    ]
+    birth_date = timezone.localdate() - datetime.timedelta(days=30 * 20)
+    students = [StudentFactory(school=schools[index % 4], birth_date=birth_date) for index in range(8)]
+    VaccinationRecordFactory(student=students[0], vaccine=dtp, dose_number=1)
+    VaccinationRecordFactory(student=students[1], vaccine=dtp, dose_number=1)
+    return {'schools': schools}
+
+
+@pytest.mark.django_db
+def test_territory_level_rolls_up_school_coverage(api_client, territory_data):
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.SAUDE, school=None))
+
+    response = api_client.get('/api/dashboards/territories/')
+
+    assert response.status_code == 200
+    assert response.data['groupBy'] == 'territory'
+    items = {item['territory']: item for item in response.data['items']}
+    assert [item['territory'] for item in response.data['items']] == ['Distrito Norte', 'Distrito Sul', '']
+    assert (items['Distrito Norte']['schoolCount'], items['Distrito Norte']['totalStudents'], items['Distrito Norte']['EM_DIA']) == (2, 4, 2)
+    assert items['Distrito Norte']['coveragePercent'] == 50.0
+    assert items['Distrito Sul']['EM_DIA'] == 0
+
+
+@pytest.mark.django_db
+def test_drill_down_to_schools_of_a_territory_is_cached_per_level(api_client, territory_data):
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.SAUDE, school=None))
+
+    schools = api_client.get('/api/dashboards/territories/', {'groupBy': 'school', 'territory': 'Distrito Norte'})
+    assert [item['schoolName'] for item in schools.data['items']] == ['Escola A', 'Escola B']
+    assert all(item['territory'] == 'Distrito Norte' for item in schools.data['items'])
+    assert [item['schoolName'] for item in api_client.get('/api/dashboards/territories/', {'groupBy': 'school', 'territory': ''}).data['items']] == ['Escola D']
+
+    stats = caches[DASHBOARD_CACHE_ALIAS]
+    hits = stats.get('dashboard:stats:hits', 0)
+    assert api_client.get('/api/dashboards/territories/', {'groupBy': 'school', 'territory': 'Distrito Norte'}).data == schools.data
+    assert stats.get('dashboard:stats:hits') == hits + 1
+
+    school = territory_data['schools'][2]
+    school.territory_ref = 'Distrito Norte'
+    school.save()
+    refreshed = api_client.get('/api/dashboards/territories/', {'groupBy': 'school', 'territory': 'Distrito Norte'})
+    assert [item['schoolName'] for item in refreshed.data['items']] == ['Escola A', 'Escola B', 'Escola C']
+
+
+@pytest.mark.django_db
+def test_rollup_requires_health_access_and_valid_level(api_client, territory_data):
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.ESCOLA, school=territory_data['schools'][0]))
+    assert api_client.get('/api/dashboards/territories/').status_code == 403
+
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.ADMIN))
+    assert api_client.get('/api/dashboards/territories/', {'groupBy': 'class'}).status_code == 400
+    assert api_client.get('/api/dashboards/territories/', {'groupBy': 'student'}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_drill_down_to_students_of_a_school_is_paginated(api_client, territory_data):
+    api_client.force_authenticate(user=UserFactory(role=User.RoleChoices.SAUDE, school=None))
+    school = territory_data['schools'][0]
+    StudentFactory(school=school, full_name='Aluno Extra', birth_date=timezone.localdate() - datetime.timedelta(days=30 * 20))
+    params = {'groupBy': 'student', 'territory': 'Distrito Norte', 'schoolId': school.id, 'pageSize': 2}
+
+    first = api_client.get('/api/dashboards/territories/', params)
+
+    assert first.status_code == 200
+    assert first.data['count'] == 3
+    assert first.data['next'] is not None
+    assert len(first.data['items']) == 2
+    assert all(item['schoolId'] == school.id and item['territory'] == 'Distrito Norte' for item in first.data['items'])
+    second = api_client.get('/api/dashboards/territories/', {**params, 'page': 2})
+    names = [item['fullName'] for item in first.data['items'] + second.data['items']]
+    assert names == sorted(names)
+    assert sorted(item['status'] for item in first.data['items'] + second.data['items']) == ['EM_DIA', 'SEM_DADOS', 'SEM_DADOS']
+
+    other_territory = api_client.get('/api/dashboards/territories/', {**params, 'territory': 'Distrito Sul'})
+    assert other_territory.data['count'] == 0
@@ -0,0 +1,95 @@
+import datetime
+import random
+
+import pytest
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+
+from analytics_app.services import build_coverage_by_school, build_pending_age_distribution
+from core.models import Student
+from immunization.services import summarize_statuses
+from immunization.vectorized import summarize_statuses_vectorized
+from tests.factories import (
+    SchoolFactory,
+    StudentFactory,
+    VaccinationRecordFactory,
+    VaccineDoseRuleFactory,
+    VaccineFactory,
+    VaccineScheduleVersionFactory,
+)
+
+
+@pytest.fixture
+def random_population():
+    rng = random.Random(20240501)
+    schedule = VaccineScheduleVersionFactory(is_active=True)
+    vaccines = [VaccineFactory() for _ in range(4)]
+    rules = []
+    for vaccine in vaccines:
+        for dose_number in range(1, rng.randint(2, 4)):
+            min_age = rng.randint(0, 150)
+            rules.append(
+                VaccineDoseRuleFactory(
+                    schedule_version=schedule,
+                    vaccine=vaccine,
+                    dose_number=dose_number,
+                    recommended_min_age_months=min_age,
+                    recommended_max_age_months=min_age + rng.randint(0, 30),
+                )
+            )
+    off_schedule_vaccine = VaccineFactory()
+
+    schools = [SchoolFactory() for _ in range(3)]
+    today = timezone.localdate()
+    for _ in range(80):
+        student = StudentFactory(
+            school=rng.choice(schools),
+            birth_date=today - datetime.timedelta(days=rng.randint(0, 200 * 30)),
+        )
+        for rule in rng.sample(rules, rng.randint(0, len(rules))):
+            VaccinationRecordFactory(student=student, vaccine=rule.vaccine, dose_number=rule.dose_number)
+        if rng.random() < 0.1:
+            VaccinationRecordFactory(student=student, vaccine=off_schedule_vaccine, dose_number=1)
+
+    return {'vaccines': vaccines + [off_schedule_vaccine]}
+
+
+@pytest.mark.django_db
+def test_vectorized_engine_matches_scalar_engine(random_population):
+    students = list(Student.objects.all())
+    as_of_dates = [timezone.localdate(), timezone.localdate() + datetime.timedelta(days=400)]
+    vaccine_filters = [None] + [{vaccine.id} for vaccine in random_population['vaccines']]
+
+    for as_of in as_of_dates:
+        for vaccine_ids in vaccine_filters:
+            expected = summarize_statuses(students, vaccine_ids=vaccine_ids, as_of=as_of)
+            assert summarize_statuses_vectorized(students, vaccine_ids=vaccine_ids, as_of=as_of) == expected
+
+
+@pytest.mark.django_db
+def test_analytics_switch_to_vectorized_engine_above_threshold(random_population, monkeypatch):
+    students = list(Student.objects.select_related('school'))
+    vaccine_id = random_population['vaccines'][0].id
+    calls = {'scalar': 0, 'vectorized': 0}
+
+    def counting(name, function):
+        def wrapper(*args, **kwargs):
+            calls[name] += 1
+            return function(*args, **kwargs)
+
+        return wrapper
+
+    monkeypatch.setattr('analytics_app.services.summarize_statuses', counting('scalar', summarize_statuses))
+    monkeypatch.setattr('analytics_app.services.summarize_statuses_vectorized', counting('vectorized', summarize_statuses_vectorized))
+
+    scalar = (build_coverage_by_school(students, vaccine_id), build_pending_age_distribution(students, vaccine_id=vaccine_id))
+    assert calls['scalar'] > 0 and calls['vectorized'] == 0
+
+    # O resultado escalar fica no cache de populacao: limpar para que o segundo calculo rode de fato.
+    cache.clear()
+    with override_settings(VECTORIZED_STATUS_THRESHOLD=1):
+        vectorized = (build_coverage_by_school(students, vaccine_id), build_pending_age_distribution(students, vaccine_id=vaccine_id))
+
+    assert calls['vectorized'] > 0
+    assert vectorized == scalar